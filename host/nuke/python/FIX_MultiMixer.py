@@ -31,13 +31,12 @@ import os
 import re
 import tempfile
 
+import graph_query
 
-def find_read(node):
-    inputs = {node}
-    reads = set()
-    while inputs:
-        reads |= {n for n in inputs if n.Class() == 'Read'}
-        inputs = {n.input(i) for n in inputs for i in range(n.inputs())}
+
+def find_read(node, memo=None):
+    # memo keeps the reads found above each node, to share between the nodes of a selection
+    reads = graph_query.upstream_by_root([node], 'Read', memo)[node]
     if len(reads) == 1:
         read = list(reads)[-1]
         file_path = read['file'].value()
@@ -113,7 +112,8 @@ def MultiMixer():
         nuke.message('Select at least one Read node.')
         return
 
-    valid_inputs = [(n, find_read(n)) for n in valid_inputs]
+    memo = {}
+    valid_inputs = [(n, find_read(n, memo)) for n in valid_inputs]
     valid_inputs.sort(key=lambda n: n[1]['name'])  # sort by name of read if there is one, or name of input node
 
     formats = [r['format'].value() for n in valid_inputs for r in n[1]['reads'] if r.knob('format')]
@@ -11,6 +11,8 @@ import nuke
 import random
 import colorsys
 
+import backdrop_index
+
 
 def nodeIsInside(node, backdropNode):
     '''
@@ -74,11 +76,10 @@ def autoBackdrop():
     else:
         # otherwise (no backdrop in selection) find the nearest backdrop
         # if exists and set the new one in front of it
-        nonSelectedBackdropNodes = nuke.allNodes("BackdropNode")
+        index = backdrop_index.get_index()
         for nonBackdrop in sel:
-            for backdrop in nonSelectedBackdropNodes:
-                if nodeIsInside(nonBackdrop, backdrop):
-                    zOrder = max(zOrder, backdrop.knob("z_order").value() + 1)
+            for backdrop in index.containing_node(nonBackdrop):
+                zOrder = max(zOrder, backdrop.knob("z_order").value() + 1)
 
     # Expand the bounds to leave a little border.
     # Elements are offsets for left, top, right and bottom edges respectively
@@ -23,6 +23,12 @@
 import nuke
 import nukescripts
 import os,sys
+import json
+import multiprocessing
+import shutil
+import subprocess
+import tempfile
+import time
 
 def getUniqueChannelLayerList(readNode):
     '''
@@ -54,6 +60,169 @@ def createFolders(path):
             print("could not created dir at %s" % path)
             return False
 
+def getAutoCropBox(readNode, first, last):
+    '''
+    run one curvetool auto crop over the frame range, shared by all the layers
+    return: dict frame -> [x, y, r, t]
+    '''
+    curveNode = nuke.nodes.CurveTool(name="Autocrop_Master", inputs = [readNode], operation="Auto Crop")
+    curveNode["channels"].setValue("rgba")
+    curveNode.knob("ROI").setValue([0,0,readNode.width(),readNode.height()])
+    try:
+        nuke.execute(curveNode, first, last)
+        cropData = curveNode.knob("autocropdata")
+        box = dict((frame, [cropData.valueAt(frame, i) for i in range(4)]) for frame in range(first, last+1))
+    finally:
+        nuke.delete(curveNode)
+    return box
+
+def setCropBox(cropNode, box):
+    '''
+    key the box of a crop node on every frame of an auto crop box, one curve at a time
+    '''
+    boxKnob = cropNode.knob("box")
+    boxKnob.setAnimated()
+    frames = sorted(box, key=int)
+    for i in range(4):
+        boxKnob.animation(i).addKey([nuke.AnimationKey(int(frame), box[frame][i]) for frame in frames])
+
+def createLayerWrite(channelLayer, inputNode, renderTo):
+    '''
+    create the write node of a layer, rendering to its own folder
+    return: write node
+    '''
+    write = nuke.nodes.Write()
+    write.knob("file_type").setValue("exr")
+    write.knob("file").setValue(renderTo+channelLayer+"/"+channelLayer+"_%04d.exr")
+    write.knob("compression").setValue("Zip (16 scanlines)")
+    write.knob("channels").setValue("rgba")
+    write.setInput(0,inputNode)
+    return write
+
+def openJobScript(job):
+    '''
+    open the copy of the script written by renderLayersHeadless, under the name of the original script so
+    expressions and relative paths resolve like in the gui
+    return: read node to split, node graph it is in
+    '''
+    nuke.scriptOpen(job["script"])
+    if job["scriptName"]:
+        nuke.root().knob("name").setValue(job["scriptName"])
+    groupName = job["read"].rpartition(".")[0]
+    return nuke.toNode(job["read"]), nuke.toNode("root."+groupName) if groupName else nuke.root()
+
+def renderLayerJob(jobPath):
+    '''
+    run one job written by renderLayersHeadless, in a nuke -t process
+    without a layer, compute the auto crop box of the read and write it to the box file of the job,
+    otherwise render the layer, cropped by the box file if there is one
+    '''
+    with open(jobPath) as jobFile:
+        job = json.load(jobFile)
+
+    readNode, group = openJobScript(job)
+    if job["layer"] is None:
+        box = getAutoCropBox(readNode, job["first"], job["last"])
+        with open(job["box"], "w") as boxFile:
+            json.dump(box, boxFile)
+        return
+
+    with group:
+        shuffleNode = nuke.nodes.Shuffle(inputs = [readNode])
+        shuffleNode.knob("in").setValue(job["layer"])
+        lastNode = shuffleNode
+        if job["box"]:
+            with open(job["box"]) as boxFile:
+                box = json.load(boxFile)
+            lastNode = nuke.nodes.Crop(inputs = [shuffleNode])
+            setCropBox(lastNode, box)
+        write = createLayerWrite(job["layer"], lastNode, job["renderTo"])
+    nuke.execute(write, job["first"], job["last"])
+
+def renderLayersHeadless(readNode, layers, renderTo, autoCrop=False, processes=None):
+    '''
+    render every layer to its own folder with a pool of nuke -t processes, one layer each,
+    without adding any node to the script. the processes open a copy of the script, so they get its root settings
+    and everything the read depends on. with auto crop, the box is computed once by a first process, before the layers.
+    return: list of the layers that failed or were cancelled
+    '''
+    first = int(readNode.knob("first").value())
+    last = int(readNode.knob("last").value())
+
+    cpus = multiprocessing.cpu_count()
+    processes = max(1, min(processes or cpus, len(layers)))
+    threads = max(1, cpus // processes)
+    script = os.path.splitext(os.path.realpath(__file__))[0] + ".py"
+
+    #copy of the script for the processes, the script keeps its name and its modified state
+    jobFolder = tempfile.mkdtemp(prefix="MultiChannelSplit_")
+    scriptCopy = os.path.join(jobFolder, "script.nk")
+    modified = nuke.modified()
+    nuke.scriptSave(scriptCopy)
+    nuke.modified(modified)
+
+    def writeJob(name, layer, box):
+        jobPath = os.path.join(jobFolder, name+".json")
+        with open(jobPath, "w") as jobFile:
+            json.dump({"script": scriptCopy, "scriptName": nuke.root().knob("name").value(),
+                       "read": readNode.fullName(), "layer": layer, "renderTo": renderTo,
+                       "first": first, "last": last, "box": box}, jobFile)
+        return jobPath
+
+    #one job file per layer, and one for the auto crop box they read
+    box = os.path.join(jobFolder, "autocrop_box.json") if autoCrop else None
+    pending = []
+    for channelLayer in layers:
+        createFolders(renderTo+"/"+channelLayer)
+        pending.append((channelLayer, writeJob("layer_"+channelLayer, channelLayer, box)))
+
+    task = nuke.ProgressTask("MultiChannelSplit")
+    cropping = None
+    if autoCrop:
+        cropping = subprocess.Popen([nuke.EXE_PATH, "-t", "-m", str(cpus), script, writeJob("autocrop", None, box)])
+    running = {}
+    failed = []
+    done = 0
+    try:
+        while cropping is not None or pending or running:
+            if cropping is not None and cropping.poll() is not None:
+                #the layers can't be cropped without the box
+                if cropping.returncode != 0:
+                    failed.extend(channelLayer for channelLayer, jobPath in pending)
+                    del pending[:]
+                cropping = None
+
+            while cropping is None and pending and len(running) < processes:
+                channelLayer, jobPath = pending.pop(0)
+                running[channelLayer] = subprocess.Popen([nuke.EXE_PATH, "-t", "-m", str(threads), script, jobPath])
+
+            for channelLayer, process in list(running.items()):
+                if process.poll() is None:
+                    continue
+                del running[channelLayer]
+                done += 1
+                if process.returncode != 0:
+                    failed.append(channelLayer)
+            task.setProgress(int(100.0 * done / len(layers)))
+            if cropping is not None:
+                task.setMessage("computing the auto crop box of frames %d-%d" % (first, last))
+            else:
+                task.setMessage("%d/%d layers, rendering %s" % (done, len(layers), ", ".join(sorted(running))))
+
+            if task.isCancelled():
+                for process in ([cropping] if cropping is not None else []) + list(running.values()):
+                    process.kill()
+                    process.wait()
+                failed.extend(running)
+                failed.extend(channelLayer for channelLayer, jobPath in pending)
+                break
+            time.sleep(0.1)
+    finally:
+        del task
+        shutil.rmtree(jobFolder, ignore_errors=True)
+
+    return failed
+
 class MultiChannelSplitPanel(nukescripts.PythonPanel):
     '''
     MultiChannelSplitPanel
@@ -77,11 +246,19 @@ class MultiChannelSplitPanel(nukescripts.PythonPanel):
             self.prepareForOutput.setFlag(nuke.STARTLINE)
             self.outputPath = nuke.File_Knob('outputPath', 'output path')
             self.outputPath.setVisible(False)
+            self.headless = nuke.Boolean_Knob("headless","render in background processes",0.0)
+            self.headless.setFlag(nuke.STARTLINE)
+            self.headless.setVisible(False)
+            self.processes = nuke.Int_Knob("processes","processes")
+            self.processes.setValue(multiprocessing.cpu_count())
+            self.processes.setVisible(False)
             self.div=nuke.Text_Knob("","","")
             self.which=nuke.Enumeration_Knob("which","",["all AOVs","individual AOVs"])
             self.addKnob(self.autoCrop)
             self.addKnob(self.prepareForOutput)
             self.addKnob(self.outputPath)
+            self.addKnob(self.headless)
+            self.addKnob(self.processes)
             self.addKnob(self.div)
             self.addKnob(self.which)
 
@@ -124,36 +301,25 @@ class MultiChannelSplitPanel(nukescripts.PythonPanel):
 
                 shuffles=[]
                 renderTo=""
-                autocropNodeRGB_exists=False
                 cropNode=None
                 dot=None
 
                 if sel != None:
 
                     #main procedure
-                    #create shuffle, shuffle channel in, curvetool crop, create cropnode and paste that information in, delete crop node
+                    #create shuffle, shuffle channel in, curvetool crop once, key the same box on a crop node per layer
 
                     o=0;
 
                     if self.autoCrop.getValue()==1.0:
-                        curveNode = nuke.nodes.CurveTool(name="Autocrop_Master", inputs = [sel], operation="Auto Crop")
-                        curveNode["channels"].setValue("rgba")
-                        curveNode.knob("ROI").setValue([0,0,sel.width(),sel.height()])
-                        nuke.execute(curveNode, sel.knob("first").value(), sel.knob("last").value())
-
-                    layersToProcess=[]
+                        box = getAutoCropBox(sel, int(sel.knob("first").value()), int(sel.knob("last").value()))
 
-                    if self.which.getValue()== 0.0:
-                        layersToProcess = uniqueLayers
-                    else:
-                        for layer in layerCheckboxes:
-                            if layer.getValue()==True:
-                                layersToProcess.append(layer.name())
+                    layers = layersToProcess()
 
-                    if len(layersToProcess)>0:
+                    if len(layers)>0:
                         dot = nuke.createNode("Dot", inpanel=False)
 
-                        for channelLayer in layersToProcess:
+                        for channelLayer in layers:
                             shuffleNode = nuke.nodes.Shuffle(name="Shuffle_"+channelLayer)
                             shuffles.append(shuffleNode.name())
                             shuffleNode.knob("in").setValue(channelLayer)
@@ -166,28 +332,13 @@ class MultiChannelSplitPanel(nukescripts.PythonPanel):
 
                             #auto crop if selected
                             if self.autoCrop.getValue()==1.0:
-                                if autocropNodeRGB_exists==False:
-                                    cropNode = nuke.nodes.Crop(name=channelLayer, inputs = [shuffleNode])
-                                    cropNode.knob("hide_input").setValue(True)
-                                    cropNode.knob("box").copyAnimations(curveNode.knob("autocropdata").animations())
-                                    nuke.delete(curveNode)
-                                    cropNode.knob("postage_stamp").setValue(True)
-                                    cropNode.setXpos(int(shuffleNode["xpos"].getValue()))
-                                    cropNode.setYpos(int(shuffleNode["ypos"].getValue()+80))
-                                    shuffleNode["hide_input"].setValue(False)
-                                    cropNode["hide_input"].setValue(True)
-                                    nukescripts.clear_selection_recursive()
-                                    cropNode["selected"].setValue(True)
-                                    nuke.nodeCopy("%clipboard%")
-                                    autocropNodeRGB_exists=True
-                                    shuffleNode["postage_stamp"].setValue(False)
-                                    cropNode["postage_stamp"].setValue(True)
-                                else:
-                                    cropCopy = nuke.nodePaste("%clipboard%")
-                                    cropCopy["name"].setValue(channelLayer)
-                                    cropCopy.setInput(0,shuffleNode)
-                                    cropCopy.setXpos(int(shuffleNode["xpos"].getValue()))
-                                    cropCopy.setYpos(int(shuffleNode["ypos"].getValue()+80))
+                                cropNode = nuke.nodes.Crop(name=channelLayer, inputs = [shuffleNode])
+                                setCropBox(cropNode, box)
+                                cropNode.setXpos(int(shuffleNode["xpos"].getValue()))
+                                cropNode.setYpos(int(shuffleNode["ypos"].getValue()+80))
+                                cropNode["hide_input"].setValue(True)
+                                cropNode["postage_stamp"].setValue(True)
+                                shuffleNode["postage_stamp"].setValue(False)
 
                             #create folders for all layer and create write node for every shuffle
                             if self.outputPath.getValue()!="":
@@ -195,19 +346,13 @@ class MultiChannelSplitPanel(nukescripts.PythonPanel):
                                 #createFolder
                                 createFolders(renderTo+"/"+channelLayer)
                                 #create write node
-                                write = nuke.nodes.Write()
-                                write.knob("file_type").setValue("exr")
-                                write.knob("file").setValue(renderTo+channelLayer+"/"+channelLayer+"_%04d.exr")
-                                write.knob("compression").setValue("Zip (16 scanlines)")
-                                write.knob("channels").setValue("rgba")
-
                                 if self.autoCrop.getValue()==True:
-                                    write.setInput(0,cropNode)
+                                    createLayerWrite(channelLayer, cropNode, renderTo)
                                 else:
-                                    write.setInput(0,shuffleNode)
+                                    createLayerWrite(channelLayer, shuffleNode, renderTo)
                             o+=1
 
-                    if len(layersToProcess)>0:
+                    if len(layers)>0:
                         nuke.delete(dot)
 
                     #hide all created shuffle inputs
@@ -219,7 +364,24 @@ class MultiChannelSplitPanel(nukescripts.PythonPanel):
                 else:
                     pass
 
-            multiChannelSplit()
+            def layersToProcess():
+                '''
+                layers checked in the panel
+                '''
+                if self.which.getValue()== 0.0:
+                    return uniqueLayers
+                return [layer.name() for layer in layerCheckboxes if layer.getValue()==True]
+
+            if self.headless.getValue()==1.0 and self.outputPath.getValue()!="" and nuke.selectedNode() != None:
+                #render without building the node graph
+                layers = layersToProcess()
+                if len(layers)>0:
+                    failed = renderLayersHeadless(nuke.selectedNode(), layers, self.outputPath.getValue(),
+                                                  self.autoCrop.getValue()==1.0, int(self.processes.getValue()))
+                    if failed:
+                        nuke.message("could not render layers:\n%s" % "\n".join(failed))
+            else:
+                multiChannelSplit()
 
     def knobChanged( self, knob ):
         '''
@@ -228,9 +390,13 @@ class MultiChannelSplitPanel(nukescripts.PythonPanel):
         if knob.name() == "prepareForOutput":
             if self.prepareForOutput.getValue() == 1.0:
                 self.outputPath.setVisible(True)
-                self.setMinimumSize(450,panelHeight+50)
+                self.headless.setVisible(True)
+                self.processes.setVisible(True)
+                self.setMinimumSize(450,panelHeight+100)
             else:
                 self.outputPath.setVisible(False)
+                self.headless.setVisible(False)
+                self.processes.setVisible(False)
                 self.setMaximumSize(450,panelHeight)
 
         if knob.name() == "allLayer":
@@ -264,4 +430,6 @@ def MultiChannelSplit():
     '''
     MultiChannelSplitPanel().show()
 
-
+if __name__ == "__main__":
+    #nuke -t MultiChannelSplit.py job.json, started by renderLayersHeadless
+    renderLayerJob(sys.argv[-1])
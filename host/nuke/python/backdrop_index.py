@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+"""
+Spatial index of the backdrop nodes of a node graph.
+
+Backdrop rectangles are stored in a uniform grid, so finding the backdrops around a node only tests the
+backdrops of the grid cells it touches instead of every backdrop of the script.
+Indexes are built lazily for each node graph (root or group) and dropped whenever a backdrop is created,
+deleted, moved or resized.
+"""
+
+import nuke
+
+# Size of the grid cells, in node graph units
+CELL_SIZE = 500
+# Knobs changing the rectangle of a backdrop
+RECT_KNOBS = ('xpos', 'ypos', 'bdwidth', 'bdheight')
+
+_indexes = {}
+_callbacks_installed = False
+
+
+def get_backdrop_rect(backdrop):
+    """Get the rectangle covered by a backdrop, from its knobs so it works in terminal mode too
+    :param backdrop: the backdrop node
+    :type backdrop: Node
+    :returns: xmin, ymin, xmax, ymax
+    :rtype: tuple
+    """
+    xmin = int(backdrop.knob('xpos').value())
+    ymin = int(backdrop.knob('ypos').value())
+    return (
+        xmin,
+        ymin,
+        xmin + int(backdrop.knob('bdwidth').value()),
+        ymin + int(backdrop.knob('bdheight').value()))
+
+
+def get_node_rect(node, node_size=None):
+    """Get the rectangle covered by a node
+    :param node: the node
+    :type node: Node
+    :param node_size: function returning the (width, height) of a node, screenWidth()/screenHeight() if None
+    :type node_size: callable
+    :returns: xmin, ymin, xmax, ymax
+    :rtype: tuple
+    """
+    xmin = node.xpos()
+    ymin = node.ypos()
+    if node_size is None:
+        width, height = node.screenWidth(), node.screenHeight()
+    else:
+        width, height = node_size(node)
+    return xmin, ymin, xmin + width, ymin + height
+
+
+def rect_contains(outer, inner):
+    """Check if a rectangle is inside another one
+    :param tuple outer: xmin, ymin, xmax, ymax of the containing rectangle
+    :param tuple inner: xmin, ymin, xmax, ymax of the contained rectangle
+    :rtype: bool
+    """
+    return (
+        inner[0] >= outer[0] and inner[1] >= outer[1] and
+        inner[2] <= outer[2] and inner[3] <= outer[3])
+
+
+def rect_overlaps(rect_a, rect_b):
+    """Check if two rectangles overlap
+    :param tuple rect_a: xmin, ymin, xmax, ymax of the first rectangle
+    :param tuple rect_b: xmin, ymin, xmax, ymax of the second rectangle
+    :rtype: bool
+    """
+    return (
+        rect_a[0] <= rect_b[2] and rect_b[0] <= rect_a[2] and
+        rect_a[1] <= rect_b[3] and rect_b[1] <= rect_a[3])
+
+
+class BackdropIndex(object):
+    """Uniform grid of backdrop rectangles"""
+
+    def __init__(self, backdrops, cell_size=CELL_SIZE):
+        """
+        :param list backdrops: the backdrop nodes to index
+        :param int cell_size: size of the grid cells
+        """
+        self.cell_size = cell_size
+        # backdrop name -> (backdrop, rect)
+        self.backdrops = {}
+        # (column, row) -> [backdrop names]
+        self.cells = {}
+        # backdrop name -> position in the given list, so queries keep its order
+        self.order = {}
+        for backdrop in backdrops:
+            name = backdrop.name()
+            rect = get_backdrop_rect(backdrop)
+            self.backdrops[name] = (backdrop, rect)
+            self.order[name] = len(self.order)
+            for cell in self._cells(rect):
+                self.cells.setdefault(cell, []).append(name)
+
+    def _cells(self, rect):
+        """Iterate over the grid cells touched by a rectangle"""
+        for column in range(int(rect[0] // self.cell_size), int(rect[2] // self.cell_size) + 1):
+            for row in range(int(rect[1] // self.cell_size), int(rect[3] // self.cell_size) + 1):
+                yield column, row
+
+    def _candidates(self, rect):
+        """Get the names of the backdrops sharing a grid cell with a rectangle"""
+        names = set()
+        for cell in self._cells(rect):
+            names.update(self.cells.get(cell, ()))
+        return sorted(names, key=self.order.get)
+
+    def get_rect(self, backdrop):
+        """Get the indexed rectangle of a backdrop, reading its knobs if it isn't indexed
+        :param backdrop: the backdrop node
+        :type backdrop: Node
+        :rtype: tuple
+        """
+        entry = self.backdrops.get(backdrop.name())
+        return entry[1] if entry else get_backdrop_rect(backdrop)
+
+    def at_point(self, x, y):
+        """Get the backdrops under a point
+        :param int x: x position in the node graph
+        :param int y: y position in the node graph
+        :rtype: list
+        """
+        return self.overlapping((x, y, x, y))
+
+    def overlapping(self, rect):
+        """Get the backdrops overlapping a rectangle
+        :param tuple rect: xmin, ymin, xmax, ymax
+        :rtype: list
+        """
+        return [
+            self.backdrops[name][0] for name in self._candidates(rect)
+            if rect_overlaps(self.backdrops[name][1], rect)]
+
+    def containing(self, rect):
+        """Get the backdrops containing a whole rectangle
+        :param tuple rect: xmin, ymin, xmax, ymax
+        :rtype: list
+        """
+        return [
+            self.backdrops[name][0] for name in self._candidates(rect)
+            if rect_contains(self.backdrops[name][1], rect)]
+
+    def containing_node(self, node, node_size=None):
+        """Get the backdrops containing a node
+        :param node: the node
+        :type node: Node
+        :param node_size: function returning the (width, height) of a node, screenWidth()/screenHeight() if None
+        :type node_size: callable
+        :rtype: list
+        """
+        return [
+            backdrop for backdrop in self.containing(get_node_rect(node, node_size))
+            if backdrop.name() != node.name()]
+
+    def nodes_inside(self, backdrop, nodes=None, node_size=None):
+        """Get the nodes located inside a backdrop
+        :param backdrop: the backdrop node
+        :type backdrop: Node
+        :param list nodes: the nodes to test, all the nodes of the current node graph if None
+        :param node_size: function returning the (width, height) of a node, screenWidth()/screenHeight() if None
+        :type node_size: callable
+        :rtype: list
+        """
+        if nodes is None:
+            nodes = nuke.allNodes()
+        rect = self.get_rect(backdrop)
+        name = backdrop.name()
+        return [
+            node for node in nodes
+            if node.name() != name and rect_contains(rect, get_node_rect(node, node_size))]
+
+    def group_nodes(self, nodes, node_size=None):
+        """Sort nodes by the backdrops containing them, testing each node once against the grid
+        :param list nodes: the nodes to sort
+        :param node_size: function returning the (width, height) of a node, screenWidth()/screenHeight() if None
+        :type node_size: callable
+        :returns: backdrop name -> list of nodes inside
+        :rtype: dict
+        """
+        grouped = {}
+        for node in nodes:
+            for backdrop in self.containing_node(node, node_size):
+                grouped.setdefault(backdrop.name(), []).append(node)
+        return grouped
+
+
+def _group_key():
+    """Get the full name of the current node graph, '' for the root"""
+    group = nuke.thisGroup()
+    if group.Class() == 'Root':
+        return ''
+    return group.fullName()
+
+
+def get_index():
+    """Get the backdrop index of the current node graph, building it if needed
+    :rtype: BackdropIndex
+    """
+    install_callbacks()
+    key = _group_key()
+    index = _indexes.get(key)
+    # Without GUI nothing tells us that backdrops moved, so we don't keep the index
+    if index is None or not nuke.GUI:
+        index = BackdropIndex(nuke.allNodes('BackdropNode'))
+        _indexes[key] = index
+    return index
+
+
+def invalidate():
+    """Drop all the backdrop indexes, they will be rebuilt on their next query"""
+    _indexes.clear()
+
+
+def _backdrop_knob_changed():
+    if nuke.thisKnob().name() in RECT_KNOBS:
+        invalidate()
+
+
+def install_callbacks():
+    """Drop the indexes whenever a backdrop is created, deleted, moved or resized"""
+    global _callbacks_installed
+    if _callbacks_installed:
+        return
+    _callbacks_installed = True
+    nuke.addOnCreate(invalidate, nodeClass='BackdropNode')
+    nuke.addOnDestroy(invalidate, nodeClass='BackdropNode')
+    nuke.addKnobChanged(_backdrop_knob_changed, nodeClass='BackdropNode')
+    nuke.addOnScriptClose(invalidate)
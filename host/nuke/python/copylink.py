@@ -12,6 +12,8 @@
 import nuke
 import nukescripts
 
+import node_serializer
+
 
 def delete_temp(node):
     """Delete temporary knob
@@ -32,24 +34,24 @@ def run():
 
     nodes_to_copy = nuke.selectedNodes()
 
-    # copy paste each node one by one
-    pasted_nodes = []
-
     for copy_node in nodes_to_copy:
 
         # remove temp_tab if exists
         if copy_node.knob('temp_tab'):
             delete_temp(copy_node)
 
-        # deselect all
-        nukescripts.misc.clear_selection_recursive()
+    # deselect all
+    nukescripts.misc.clear_selection_recursive()
 
-        copy_node.setSelected(True)
-        nukescripts.node_copypaste()
-        pasted_nodes.append(nuke.selectedNode())
+    # copy paste each node on its own, in a single paste
+    pasted_nodes = node_serializer.duplicate_nodes(nodes_to_copy)
 
+    for copy_node, pasted_node in zip(nodes_to_copy, pasted_nodes):
         # move node with an offset.
-        nuke.selectedNode().setXYpos(copy_node.xpos()-80, copy_node.ypos()-80)
+        pasted_node.setXYpos(copy_node.xpos()-80, copy_node.ypos()-80)
+
+    # index of each copied node
+    copied_indices = dict((copy_node.fullName(), i) for i, copy_node in enumerate(nodes_to_copy))
 
     # set nodes connections
     for i, node in enumerate(pasted_nodes):
@@ -61,11 +63,9 @@ def run():
 
             input_node = from_node.input(input_index)
 
-            if input_node not in nodes_to_copy:
-                # get parent nodes tha wasn't copied
-                input_node = input_node
-            else:
-                input_node = pasted_nodes[nodes_to_copy.index(input_node)]
+            if input_node is not None and input_node.fullName() in copied_indices:
+                input_node = pasted_nodes[copied_indices[input_node.fullName()]]
+            # else keep the parent node that wasn't copied
 
             # for locked node only
             locked_node = False
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Queries over the inputs of nodes, to find the nodes upstream of others.
+
+Walks are iterative, so long chains don't reach the recursion limit, and visit each node once per query even when
+several paths or roots lead to it. Empty inputs are skipped.
+A memo, a dict given to several queries, keeps what was found upstream of each visited node so the part of the graph
+shared by the queries is only walked once.
+"""
+
+
+def _classes(node_class):
+    """Get the classes to match as a tuple, None to match every node"""
+    if node_class is None or isinstance(node_class, tuple):
+        return node_class
+    if isinstance(node_class, list):
+        return tuple(node_class)
+    return (node_class,)
+
+
+def node_inputs(node, first_only=False):
+    """Get the nodes connected to the inputs of a node
+    :param node: the node
+    :type node: Node
+    :param bool first_only: only follow the first input, like the topnode tcl command
+    :rtype: list
+    """
+    if first_only:
+        top = node.input(0) if node.inputs() else None
+        return [] if top is None else [top]
+    return [input_node for input_node in (node.input(index) for index in range(node.inputs())) if input_node]
+
+
+def upstream_nodes(roots, node_class=None, include_roots=False, first_only=False):
+    """Get all the nodes upstream of some nodes, each of them once
+    :param list roots: the nodes to start from
+    :param node_class: class or classes of the nodes to get, every node if None
+    :type node_class: str or tuple
+    :param bool include_roots: also get the roots, if they match node_class
+    :param bool first_only: only follow the first inputs
+    :returns: the nodes, depth first from the first root
+    :rtype: list
+    """
+    classes = _classes(node_class)
+    found = []
+    visited = set()
+    stack = [(root, True) for root in reversed(list(roots))]
+    while stack:
+        node, is_root = stack.pop()
+        if node in visited:
+            continue
+        visited.add(node)
+        if (include_roots or not is_root) and (classes is None or node.Class() in classes):
+            found.append(node)
+        stack.extend((input_node, False) for input_node in reversed(node_inputs(node, first_only)))
+    return found
+
+
+def upstream_by_root(roots, node_class=None, memo=None, first_only=False):
+    """Get the nodes of a class upstream of each root, the root included if it matches
+    Each node is visited once, its result being reused by all the nodes downstream of it.
+    :param list roots: the nodes to start from
+    :param node_class: class or classes of the nodes to get, every node if None
+    :type node_class: str or tuple
+    :param dict memo: results of the previous queries for the same node_class, to share between calls
+    :param bool first_only: only follow the first inputs
+    :returns: root -> frozenset of the nodes found
+    :rtype: dict
+    """
+    classes = _classes(node_class)
+    if memo is None:
+        memo = {}
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in memo:
+                continue
+            inputs = node_inputs(node, first_only)
+            if not expanded:
+                # Come back to the node once all its inputs are known
+                stack.append((node, True))
+                stack.extend((input_node, False) for input_node in inputs if input_node not in memo)
+                continue
+            found = set()
+            if classes is None or node.Class() in classes:
+                found.add(node)
+            for input_node in inputs:
+                found.update(memo.get(input_node, ()))
+            memo[node] = frozenset(found)
+    return dict((root, memo[root]) for root in roots)
+
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Remove the keys of animation curves that can be interpolated from the others, within a tolerance.
+
+Keys are picked with the Ramer-Douglas-Peucker algorithm, measuring the distance between the original keys and the
+linear interpolation of the kept ones. Curves keyed on the same frames, like the x and y of a solved track or all the
+curves of a baked node, are simplified together with NumPy: a key is kept when any of them needs it. Each curve is
+then rewritten with one removeKey call, and its kept keys are made linear so it stays within tolerance of every key.
+Given a frame range, like the one just solved, only the keys inside it are reduced and made linear.
+"""
+
+import numpy
+
+import nuke
+
+
+def simplify(frames, values, tolerance):
+    """Pick the keys to keep so the linear interpolation of the kept keys stays within tolerance of all the others
+    :param frames: the frames of the keys, in increasing order
+    :type frames: numpy.ndarray or list
+    :param values: the values of the curves on these frames, of shape (curves, frames)
+    :type values: numpy.ndarray or list
+    :param tolerance: maximum distance between a removed key and the interpolated curve, or one per curve
+    :type tolerance: float or list
+    :returns: the mask of the kept keys, always keeping the first and the last one
+    :rtype: numpy.ndarray
+    """
+    frames = numpy.asarray(frames, dtype=float)
+    keep = numpy.zeros(len(frames), dtype=bool)
+    if not len(frames):
+        return keep
+    values = numpy.asarray(values, dtype=float).reshape(-1, len(frames))
+    tolerance = numpy.broadcast_to(numpy.asarray(tolerance, dtype=float).reshape(-1, 1), (len(values), 1))
+    keep[[0, -1]] = True
+
+    # Segments still to check, instead of recursion so long curves have no depth limit
+    segments = [(0, len(frames) - 1)]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+        ratio = (frames[start + 1:end] - frames[start]) / (frames[end] - frames[start])
+        interpolated = values[:, start, None] + (values[:, end] - values[:, start])[:, None] * ratio
+        excess = (numpy.abs(values[:, start + 1:end] - interpolated) - tolerance).max(axis=0)
+        worst = int(numpy.argmax(excess))
+        if excess[worst] > 0:
+            split = start + 1 + worst
+            keep[split] = True
+            segments.append((start, split))
+            segments.append((split, end))
+    return keep
+
+
+def _keys_in_range(curve, first=None, last=None):
+    """Get the keys of a curve from first to last, all of them without a range"""
+    return [key for key in curve.keys() if (first is None or key.x >= first) and (last is None or key.x <= last)]
+
+
+def reduce_curves(curves, tolerance, linear=True, first=None, last=None):
+    """Remove the keys of animation curves that can be interpolated from the others
+    Curves keyed on the same frames are simplified together, curves with an expression are left untouched.
+    Only the keys from first to last are reduced, the others and their interpolation are kept as they are.
+    :param list curves: the AnimationCurves
+    :param float tolerance: maximum distance between a removed key and the reduced curve
+    :param bool linear: make the kept keys linear, so the reduced curves stay within tolerance
+    :param float first: first frame of the keys to reduce, like the first solved frame, None for no limit
+    :param float last: last frame of the keys to reduce, None for no limit
+    :returns: the number of removed keys
+    :rtype: int
+    """
+    # Group the curves by the frames of their keys in the range, reading the keys of each curve once
+    groups = {}
+    for curve in curves:
+        if curve is None or not curve.noExpression():
+            continue
+        keys = _keys_in_range(curve, first, last)
+        if len(keys) > 2:
+            groups.setdefault(tuple(key.x for key in keys), []).append((curve, keys))
+
+    removed = 0
+    for frames, group in groups.items():
+        keep = simplify(frames, [[key.y for key in keys] for _, keys in group], tolerance)
+        for curve, keys in group:
+            dropped = [key for key, kept in zip(keys, keep) if not kept]
+            if not dropped:
+                continue
+            curve.removeKey(dropped)
+            removed += len(dropped)
+            if linear:
+                curve.changeInterpolation(_keys_in_range(curve, frames[0], frames[-1]), nuke.LINEAR)
+    return removed
+
+
+def reduce_knob(knob, tolerance, linear=True, first=None, last=None):
+    """Remove the keys of the curves of a knob that can be interpolated from the others, see reduce_curves
+    :param knob: the animated knob
+    :type knob: nuke.Array_Knob
+    :param float tolerance: maximum distance between a removed key and the reduced curve
+    :param bool linear: make the kept keys linear
+    :param float first: first frame of the keys to reduce, None for no limit
+    :param float last: last frame of the keys to reduce, None for no limit
+    :returns: the number of removed keys
+    :rtype: int
+    """
+    if not knob.isAnimated():
+        return 0
+    return reduce_curves(knob.animations(), tolerance, linear, first, last)
+
+
+def reduce_node(node, tolerance, knob_names=None, linear=True, first=None, last=None):
+    """Remove the keys of all the curves of a node that can be interpolated from the others, see reduce_curves
+    :param node: the node, like a solved Transform or a baked CornerPin2D
+    :type node: Node
+    :param float tolerance: maximum distance between a removed key and the reduced curve
+    :param list knob_names: the knobs to reduce, all the animated knobs if None
+    :param bool linear: make the kept keys linear
+    :param float first: first frame of the keys to reduce, None for no limit
+    :param float last: last frame of the keys to reduce, None for no limit
+    :returns: the number of removed keys
+    :rtype: int
+    """
+    if knob_names is None:
+        knobs = node.knobs().values()
+    else:
+        knobs = [node[name] for name in knob_names]
+    curves = []
+    for knob in knobs:
+        if hasattr(knob, 'isAnimated') and knob.isAnimated():
+            curves.extend(knob.animations())
+    return reduce_curves(curves, tolerance, linear, first, last)
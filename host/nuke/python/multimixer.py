@@ -21,28 +21,105 @@
 
 """
 
+import io
 import os
 import re
 import tempfile
 import nuke
 
 
-def write_script(end_lines):
-    """retun this script as a string
+# Set MULTIMIXER_EMBED_SCRIPT=0 to have the buttons import this module instead of holding all of it
+EMBED_SCRIPT = os.environ.get("MULTIMIXER_EMBED_SCRIPT", "1") != "0"
+CALLBACK_MODULE = "multimixer"
+
+_script_template = None
+
+
+def get_script_template():
+    """read this script once, and keep it as text
+
+    Returns:
+        string -- all the script
+    """
+
+    global _script_template
+
+    if _script_template is None:
+        file_path = os.path.splitext(os.path.realpath(__file__))[0] + '.py'
+
+        with io.open(file_path, encoding='utf-8') as script:
+            template = script.read()
+
+        # Python 2 knobs want a str, not unicode
+        if not isinstance(template, str):
+            template = template.encode('utf-8')
+
+        _script_template = template
+
+    return _script_template
+
+
+def write_script(end_lines, embed=None):
+    """return the script of a button calling a function of this script
 
     Arguments:
         end_lines {string} -- command line you want to add after the script
+    Keyword Arguments:
+        embed {bool} -- hold all this script in the button, so the multimixer works without
+            this module, else import it (default: {None}, see EMBED_SCRIPT)
     Returns:
         string -- all the script
     """
 
-    file_path = os.path.splitext(os.path.realpath(__file__))[0] + '.py'
+    if embed is None:
+        embed = EMBED_SCRIPT
+
+    if not embed:
+        return "import %s\n%s.%s" % (CALLBACK_MODULE, CALLBACK_MODULE, end_lines)
+
+    return "%s\n%s" % (get_script_template(), end_lines)
+
 
-    with open(file_path, 'rb') as script:
-        all_script = script.read()
-        all_script += "\n%s" % end_lines
+# Version parts of the read file names, compiled once for every read
+VERSION_NAME_RE = re.compile(r'_v\d+[\w]*')
+VERSION_RE = re.compile(r'_v\d+_')
 
-        return "%s" % all_script
+# Solo knobs of the inputs, and the number of an input node inside the multimixer
+SOLO_KNOB_RE = re.compile(r'solo_\d+$')
+MERGE_INDEX_RE = re.compile(r'^Merge(\d+)$')
+
+
+def get_top_nodes(nodes, memo=None):
+    """Find the top node of each node, like the topnode tcl command, walking up their first inputs once
+
+    Arguments:
+        nodes {list} -- nodes to start from
+    Keyword Arguments:
+        memo {dict} -- top nodes already found, shared between calls (default: {None})
+    Returns:
+        dict -- As key the node and value, his top node or himself if his first input is empty
+    """
+
+    if memo is None:
+        memo = {}
+
+    for node in nodes:
+        # nodes up to one whose top node is known, they all share the same one
+        path = []
+        on_path = set()
+        current = node
+        while current not in memo:
+            path.append(current)
+            on_path.add(current)
+            parent = current.input(0) if current.inputs() else None
+            if parent is None or parent in on_path:
+                memo[current] = current
+                break
+            current = parent
+        for path_node in path:
+            memo[path_node] = memo[current]
+
+    return dict((node, memo[node]) for node in nodes)
 
 
 def get_valid_nodes(selection=None):
@@ -58,15 +135,18 @@ def get_valid_nodes(selection=None):
 
     valid_nodes = {}
 
-    for node in selection:
+    # top nodes of all the selected nodes, in one walk
+    top_nodes = get_top_nodes([node for node in selection if node.Class() not in ignore])
+
+    for node, topnode in top_nodes.items():
         # Si c'est un read, on recupere le nom du fichier
         if node.Class() == 'Read':
             file_name = os.path.splitext(os.path.basename(node['file'].getValue()))[0]
 
             # Clean file name
             try:
-                name = re.findall(r'_v\d+[\w]*', file_name)[0]
-                version = re.findall(r'_v\d+_', name)[0]
+                name = VERSION_NAME_RE.findall(file_name)[0]
+                version = VERSION_RE.findall(name)[0]
                 name = name.replace(version, "")
                 name += " (%s)" % version.replace("_", "")
             except Exception:
@@ -74,12 +154,9 @@ def get_valid_nodes(selection=None):
 
             valid_nodes[node] = name
 
-        # sinon, on cherche le read pour verifier que le node a une image
-        elif node.Class not in ignore:
-            topnode_name = nuke.tcl("full_name [topnode %s]" % node.name())
-            topnode = nuke.toNode(topnode_name)
-            if topnode.Class() == "Read":
-                valid_nodes[node] = node.name()
+        # sinon, on verifie que le read du node a une image
+        elif topnode.Class() == "Read":
+            valid_nodes[node] = node.name()
 
     return valid_nodes
 
@@ -105,8 +182,8 @@ def get_frame_range(input_nodes):
         tuple -- the most common frame range as (start, end)
     """
 
-    ranges = [(node["first"].value(), node["last"].value()) for node in input_nodes.keys()
-              if node.Class() == "Read"]
+    reads = [node for node in get_top_nodes(input_nodes.keys()).values() if node.Class() == "Read"]
+    ranges = [(node["first"].value(), node["last"].value()) for node in reads]
     if ranges:
         most_common = max(set(ranges), key=ranges.count)
     else:
@@ -144,7 +221,8 @@ def get_common_format(input_nodes):
         string -- the largest input format as "width height pixel_aspect name"
     """
 
-    all_formats = [node["format"].value() for node in input_nodes.keys() if node.knob("format")]
+    top_nodes = get_top_nodes(input_nodes.keys()).values()
+    all_formats = [node["format"].value() for node in top_nodes if node.knob("format")]
 
     if all_formats:
         common_format = max(set(all_formats), key=lambda f: [g.width() for g in all_formats].count(f.width()))
@@ -203,7 +281,7 @@ def create_inputs(multimix_node, input_nodes, node_merge, start_index=1):
     first_input = None
     all_inputs_relations = []
 
-    for index, (node, node_name) in enumerate(input_nodes.iteritems()):
+    for index, (node, node_name) in enumerate(input_nodes.items()):
         index += start_index
         node_input = nuke.nodes.Input(name="Input%s" % index)
         # set a dict with all input relationship
@@ -229,12 +307,53 @@ def create_inputs(multimix_node, input_nodes, node_merge, start_index=1):
 
         # set expression for merge
         node_merge['operation'].setExpression("%s.operation" % multimix_node.name())
-        solomode = " + ".join("[value solo_{}]".format(i) for i in range(1, len(input_nodes) + 1))
-        node_merge["disable"].setExpression("max((({0}) ? 1 - [value solo_{1}] : [value mute_{1}]), ![value mult_{1}])".format(solomode, index))
+        set_merge_disable(node_merge, index)
+
+    update_any_solo(multimix_node)
 
     return first_input, all_inputs_relations, node_merge
 
 
+def set_merge_disable(node_merge, index):
+    """disable a merge when its input is muted, or not soloed while another one is
+
+    Arguments:
+        node_merge {Node} -- the merge of the input, inside the multimixer
+        index {int} -- the number of the input
+    """
+
+    node_merge["disable"].setExpression(
+        "max((parent.any_solo ? 1 - parent.solo_{0} : parent.mute_{0}), !parent.mult_{0})".format(index)
+    )
+
+
+def update_any_solo(multimix_node):
+    """set the any_solo knob, on if any input is soloed, from the solo knobs of all inputs
+
+    Every merge reads this knob instead of all the solo knobs, so adding or removing
+    inputs only changes this expression, not the merges of the other inputs.
+    Multimixers made before this knob existed get it, and their merges are updated to use it.
+
+    Arguments:
+        multimix_node {Node} -- Multimixer node
+    """
+
+    any_solo_knob = multimix_node.knob("any_solo")
+    if not any_solo_knob:
+        any_solo_knob = nuke.Int_Knob("any_solo", "any solo")
+        any_solo_knob.setFlag(nuke.INVISIBLE)
+        multimix_node.addKnob(any_solo_knob)
+
+        for node in nuke.allNodes("Merge2", group=multimix_node):
+            index = MERGE_INDEX_RE.findall(node.name())
+            if index:
+                set_merge_disable(node, index[0])
+
+    solo_knobs = sorted((knob for knob in multimix_node.knobs() if SOLO_KNOB_RE.match(knob)),
+                        key=lambda knob: int(knob.split("_")[-1]))
+    any_solo_knob.setExpression(" + ".join(solo_knobs) or "0")
+
+
 def connect_inputs(all_inputs_relations, multimix_node):
     """connect and set the inputs to the multimixer
 
@@ -581,6 +700,9 @@ def remove_inputs(multimix):
         # disconnect input
         multimix.setInput(index - 1, None)
 
+    # only the merges of the removed inputs were deleted, the others read the new any_solo
+    update_any_solo(multimix)
+
 ####################################################################################################
 
 
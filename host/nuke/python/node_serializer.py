@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""
+Serialize nodes to nuke script strings and paste them back, without going through the clipboard.
+
+Nodes are copied to a temporary file with nuke.nodeCopy(path), and scripts are pasted from one with
+nuke.nodePaste(path). Several scripts are pasted in a single call. The scripts of single nodes are kept in
+a least recently used cache, so copying a node that didn't change doesn't touch the selection again.
+"""
+
+import os
+import re
+import tempfile
+import random
+from collections import OrderedDict
+
+import nuke
+
+# Number of serialized nodes kept in the cache
+TEMPLATE_CACHE_SIZE = 64
+
+_CUT_PASTE_INPUT = re.compile(r"^set cut_paste_input \[stack 0\]\n", re.M)
+_NODE_NAME = re.compile(r"^( *name ).*$", re.M)
+
+
+class ScriptCache(object):
+    """Least recently used cache of node scripts"""
+
+    def __init__(self, maxsize=TEMPLATE_CACHE_SIZE):
+        """
+        :param int maxsize: number of scripts kept
+        """
+        self.maxsize = maxsize
+        self._scripts = OrderedDict()
+
+    def get(self, key):
+        """Get a cached script, marking it as recently used
+        :param key: the key of the script
+        :returns: the script, or None if it isn't cached
+        :rtype: str
+        """
+        script = self._scripts.pop(key, None)
+        if script is not None:
+            self._scripts[key] = script
+        return script
+
+    def put(self, key, script):
+        """Cache a script, dropping the least recently used one if the cache is full
+        :param key: the key of the script
+        :param str script: the script
+        """
+        self._scripts.pop(key, None)
+        self._scripts[key] = script
+        while len(self._scripts) > self.maxsize:
+            self._scripts.popitem(last=False)
+
+    def clear(self):
+        """Empty the cache"""
+        self._scripts.clear()
+
+
+template_cache = ScriptCache()
+
+
+def _temp_path():
+    """Make an empty temporary .nk file
+    :returns: its path, with forward slashes for nuke
+    :rtype: str
+    """
+    handle, path = tempfile.mkstemp(suffix='.nk', prefix='node_serializer_')
+    os.close(handle)
+    return path.replace('\\', '/')
+
+
+def _node_signature(node):
+    """Get the knobs of a node as a string, to tell if it changed since it was cached
+    :rtype: str
+    """
+    try:
+        return node.writeKnobs(nuke.WRITE_USER_KNOB_DEFS | nuke.WRITE_NON_DEFAULT_ONLY | nuke.TO_SCRIPT)
+    except (AttributeError, RuntimeError):
+        return None
+
+
+def _copy_to_scripts(node_lists):
+    """Copy each list of nodes to its own script, through a temporary file
+    The selection is only saved and restored once for all of them.
+    :param list node_lists: lists of nodes
+    :rtype: list
+    """
+    scripts = []
+    selection = nuke.selectedNodes()
+    path = _temp_path()
+    try:
+        for node in selection:
+            node.setSelected(False)
+        for nodes in node_lists:
+            for node in nodes:
+                node.setSelected(True)
+            nuke.nodeCopy(path)
+            for node in nodes:
+                node.setSelected(False)
+            with open(path) as script_file:
+                scripts.append(script_file.read())
+    finally:
+        for node in selection:
+            node.setSelected(True)
+        os.remove(path)
+    return scripts
+
+
+def nodes_to_script(nodes, use_cache=True):
+    """Serialize nodes to a nuke script, like copying them but without touching the clipboard
+    The selection is restored afterwards.
+    :param list nodes: the nodes to serialize
+    :param bool use_cache: look for single nodes in the cache of templates first
+    :returns: the nuke script
+    :rtype: str
+    """
+    if not nodes:
+        return ''
+    if len(nodes) == 1:
+        return each_node_to_script(nodes, use_cache)[0]
+    return _copy_to_scripts([nodes])[0]
+
+
+def each_node_to_script(nodes, use_cache=True):
+    """Serialize each node to its own nuke script, without touching the clipboard
+    Nodes found in the cache of templates are not copied again, the others are all copied in one go.
+    :param list nodes: the nodes to serialize
+    :param bool use_cache: look for the nodes in the cache of templates first
+    :returns: one script per node
+    :rtype: list
+    """
+    scripts = [None] * len(nodes)
+    keys = [None] * len(nodes)
+    if use_cache:
+        for index, node in enumerate(nodes):
+            signature = _node_signature(node)
+            if signature is not None:
+                keys[index] = (node.fullName(), node.Class(), signature)
+                scripts[index] = template_cache.get(keys[index])
+
+    missing = [index for index, script in enumerate(scripts) if script is None]
+    if missing:
+        copied = _copy_to_scripts([[nodes[index]] for index in missing])
+        for index, script in zip(missing, copied):
+            scripts[index] = script
+            if keys[index] is not None:
+                template_cache.put(keys[index], script)
+    return scripts
+
+
+def nodes_from_script(scripts):
+    """Paste one or several nuke scripts in a single paste, without touching the clipboard
+    Like a paste, the first nodes of each script get connected to the selected node.
+    :param scripts: a nuke script, or a list of them
+    :type scripts: str or list
+    :returns: the pasted nodes, which are now selected
+    :rtype: list
+    """
+    if not isinstance(scripts, (list, tuple)):
+        scripts = [scripts]
+    scripts = [script for script in scripts if script]
+    if not scripts:
+        return []
+    # Each script would take the last node of the previous one as its input otherwise
+    scripts = scripts[:1] + [_CUT_PASTE_INPUT.sub('', script) for script in scripts[1:]]
+
+    path = _temp_path()
+    try:
+        with open(path, 'w') as script_file:
+            script_file.write('\n'.join(scripts))
+        nuke.nodePaste(path)
+    finally:
+        os.remove(path)
+    return nuke.selectedNodes()
+
+
+def duplicate_nodes(nodes):
+    """Duplicate nodes in a single paste, each one on its own
+    Duplicates are not connected, and get their original's name made unique, like a copy paste.
+    :param list nodes: the nodes to duplicate
+    :returns: the duplicates, in the order of the nodes given, which are now the only selected nodes
+    :rtype: list
+    """
+    # Temporary names to find each duplicate after the paste
+    token = '%06x' % random.randrange(16 ** 6)
+    temp_names = ['node_serializer_%s_%d' % (token, index) for index in range(len(nodes))]
+    scripts = [
+        _NODE_NAME.sub(r'\g<1>' + temp_name, script, count=1)
+        for script, temp_name in zip(each_node_to_script(nodes), temp_names)]
+
+    for node in nuke.selectedNodes():
+        node.setSelected(False)
+    nodes_from_script(scripts)
+
+    duplicates = []
+    for node, temp_name in zip(nodes, temp_names):
+        duplicate = nuke.toNode(temp_name)
+        duplicate.setName(node.name(), uncollide=True)
+        duplicates.append(duplicate)
+    return duplicates
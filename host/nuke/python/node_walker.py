@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cached walk of the nodes of a script, through its groups and gizmos.
+
+The nodes of each node graph (root, group or gizmo) are listed once with nodes(), then kept until a node is created
+or deleted anywhere. Walks are generators, so a search can stop before the whole script was listed, and they can
+filter the nodes by class on the way.
+"""
+
+import nuke
+
+_children = {}
+_callbacks_installed = False
+
+
+def _group_key(group):
+    """Get the full name of a node graph, '' for the root"""
+    if group.Class() == 'Root':
+        return ''
+    return group.fullName()
+
+
+def _classes(node_class):
+    """Get the classes to match as a tuple, None to match every node"""
+    if node_class is None or isinstance(node_class, tuple):
+        return node_class
+    if isinstance(node_class, list):
+        return tuple(node_class)
+    return (node_class,)
+
+
+def group_nodes(group=None):
+    """Get the nodes directly inside a node graph, listing them only once
+    :param group: the root, group or gizmo, the current node graph if None
+    :type group: Node
+    :rtype: list
+    """
+    install_callbacks()
+    if group is None:
+        group = nuke.thisGroup()
+    key = _group_key(group)
+    nodes = _children.get(key)
+    if nodes is None:
+        nodes = group.nodes()
+        _children[key] = nodes
+    return nodes
+
+
+def walk_nodes(node_class=None, group=None, recursive=True):
+    """Iterate over the nodes of a node graph, and of the groups and gizmos inside it
+    Nodes are yielded depth first, each group before its own nodes.
+    :param node_class: class or classes of the nodes to yield, every node if None
+    :type node_class: str or tuple
+    :param group: the node graph to walk, the current one if None like nuke.allNodes()
+    :type group: Node
+    :param bool recursive: also walk the groups and gizmos
+    :rtype: generator
+    """
+    classes = _classes(node_class)
+    # Iterators of the node graphs being walked, instead of recursion, so nesting has no limit
+    stack = [iter(group_nodes(group))]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            continue
+        if classes is None or node.Class() in classes:
+            yield node
+        if recursive and isinstance(node, nuke.Group):
+            stack.append(iter(group_nodes(node)))
+
+
+def all_nodes(node_class=None, group=None, recursive=True):
+    """Get the nodes of a node graph and of the groups and gizmos inside it, see walk_nodes
+    :param node_class: class or classes of the nodes to get, every node if None
+    :type node_class: str or tuple
+    :param group: the node graph, the current one if None
+    :type group: Node
+    :param bool recursive: also get the nodes of the groups and gizmos
+    :rtype: list
+    """
+    return list(walk_nodes(node_class, group, recursive))
+
+
+def invalidate():
+    """Forget the nodes of every node graph, they will be listed again on their next walk"""
+    _children.clear()
+
+
+def install_callbacks():
+    """Forget the listed nodes whenever a node is created or deleted"""
+    global _callbacks_installed
+    if _callbacks_installed:
+        return
+    _callbacks_installed = True
+    nuke.addOnCreate(invalidate)
+    nuke.addOnDestroy(invalidate)
+    nuke.addOnScriptClose(invalidate)
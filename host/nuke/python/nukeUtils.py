@@ -8,6 +8,9 @@ import os
 import nuke
 import random
 
+import backdrop_index
+import node_walker
+
 # the default size of a node in the node graph.
 # can't read it from the preferences so we set it here.
 # WARGNING : for read nodes use DEFAULT_READ_NODE_SIZE
@@ -83,22 +86,8 @@ def terminal_get_nodes_in_backdrop(node):
     :returns: the nodes in the backdrop
     :rtype: list
     """
-    nodes = []
-    xmin = node.knob('xpos').value()
-    xmax = xmin + node.knob('bdwidth').value()
-    ymin = node.knob('ypos').value()
-    ymax = ymin + node.knob('bdheight').value()
     node.knob('selected').setValue(True)
-    for i in [i for i in nuke.allNodes() if i is not node]:
-        node_size = terminal_get_node_size(node)
-        ixmin = i.knob('xpos').value()
-        ixmax = ixmin + node_size[0]
-        iymin = i.knob('ypos').value()
-        iymax = iymin + node_size[1]
-
-        if (ixmin >= xmin and ixmax < xmax) and (iymin >= ymin and iymax < ymax):
-            nodes.append(i)
-    return nodes
+    return backdrop_index.get_index().nodes_inside(node, node_size=terminal_get_node_size)
 
 
 # ==========
@@ -111,24 +100,8 @@ def get_nodes_in_backdrop(node):
     get all the nodes located in the backdrop node specified
     :param BackdropNode node: the backdrop node where to look
     """
-    nodes = []
-
-    xmin = node.knob('xpos').value()
-    xmax = xmin + node.knob('bdwidth').value()
-    ymin = node.knob('ypos').value()
-    ymax = ymin + node.knob('bdheight').value()
     node.knob('selected').setValue(True)
-    for i in [i for i in nuke.allNodes() if i is not node]:
-        ixmin = i.knob('xpos').value()
-        ixmax = ixmin + i.screenWidth()
-        iymin = i.knob('ypos').value()
-        iymax = iymin + i.screenHeight()
-
-        if (ixmin >= xmin and ixmax < xmax) and (iymin >= ymin and
-        iymax < ymax):
-            nodes.append(i)
-
-    return nodes
+    return backdrop_index.get_index().nodes_inside(node)
 
 
 def deselectAllNodes():
@@ -137,10 +110,11 @@ def deselectAllNodes():
         n.knob('selected').setValue(False)
 
 
-def get_nodes_by_class(class_name):
+def get_nodes_by_class(class_name, recursive=False):
     """Get nodes of a class in selection if there is one or entire script
     :param class_name: the name of the class of nodes to search
     :type class_name: str
+    :param bool recursive: without selection, also search inside groups and gizmos
     :returns: all nodes of the class specified
     :rtype: list
     """
@@ -148,7 +122,7 @@ def get_nodes_by_class(class_name):
     if len(nuke.selectedNodes()) > 0:
         nodes = nuke.selectedNodes(class_name)
     else:
-        nodes = nuke.allNodes(class_name)
+        nodes = node_walker.all_nodes(class_name, recursive=recursive)
     return nodes
 
 
@@ -6,11 +6,18 @@ All utils functions for Nuke
 
 import nuke
 
+import graph_query
+import node_walker
 
-def unlock_all():
-    """Unlock all knob for every node in the scene"""
 
-    for node in nuke.allNodes():
+def unlock_all(recursive=False):
+    """Unlock all knob for every node in the scene
+
+    Keyword Arguments:
+        recursive {bool} -- also unlock the nodes inside groups and gizmos
+    """
+
+    for node in node_walker.walk_nodes(group=nuke.root(), recursive=recursive):
         for knob in node.knobs().values():
             knob.setEnabled(True)
 
@@ -44,16 +51,11 @@ def get_linked_nodes_from_class(node, node_class, node_list):
         list -- all matching nodes
     """
 
-    for index in range(node.inputs()):
-        parent_node = node.input(index)
-        if parent_node.Class() == node_class and parent_node not in node_list:
+    found = set(node_list)
+    for parent_node in graph_query.upstream_nodes([node], node_class):
+        if parent_node not in found:
+            found.add(parent_node)
             node_list.append(parent_node)
-        else:
-            node_list = get_linked_nodes_from_class(
-                parent_node,
-                node_class,
-                node_list
-            )
     return node_list
 
 
@@ -64,11 +66,5 @@ def get_used_reads():
         list -- all read nodes
     """
 
-    all_write = nuke.allNodes('Write')
-    all_reads = []
-
-    for write in all_write:
-        all_reads += get_linked_nodes_from_class(write, "Read", all_reads)
-    all_reads = set(all_reads)
-
-    return list(all_reads)
+    # Every node is visited once, even when it feeds several writes
+    return graph_query.upstream_nodes(nuke.allNodes('Write'), 'Read')
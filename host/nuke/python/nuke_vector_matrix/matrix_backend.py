@@ -0,0 +1,458 @@
+"""
+Vectorized matrix operations working on whole frame ranges at once.
+
+All matrices are numpy arrays of shape (frames, 4, 4) in row-major order (``array[frame, row, column]``), which
+is the order used by the values of Nuke's matrix knobs. nuke.math.Matrix4 stores its values column-major, the adapter
+functions at the bottom of this module take care of the conversion.
+
+This module does not import nuke, so it can be used (and tested) outside of Nuke.
+"""
+
+from functools import reduce
+
+import numpy
+
+
+def identity(count=1):
+    """ Make a stack of identity matrices
+
+    :param int count: Number of matrices
+    :return: array of shape (count, 4, 4)
+    """
+    return numpy.tile(numpy.identity(4), (count, 1, 1))
+
+
+def as_matrices(values):
+    """ Convert matrix knob values to a stack of matrices
+
+    :param values: Sequence of 16 values, or array-like of shape (frames, 16) or (frames, 4, 4)
+    :return: array of shape (frames, 4, 4)
+    """
+    return numpy.asarray(values, dtype=numpy.float64).reshape(-1, 4, 4)
+
+
+def from_samples(values, width):
+    """ View a flat buffer of knob samples (frame after frame) as an array, without copying it
+
+    :param values: Buffer of doubles, like an array.array('d')
+    :param int width: Number of components of the knob
+    :return: array of shape (frames, width)
+    """
+    return numpy.frombuffer(values, dtype=numpy.float64).reshape(-1, width)
+
+
+def stack_points(points):
+    """ Stack the values of several XY knobs into an array of points
+
+    :param points: Sequence of array-likes of shape (frames, 2 or more), one per point
+    :return: array of shape (frames, points, 2)
+    """
+    return numpy.stack([numpy.asarray(values, dtype=numpy.float64)[:, 0:2] for values in points], axis=1)
+
+
+def multiply(*matrices):
+    """ Multiply stacks of matrices together, frame by frame, in the order given (like nuke.math.Matrix4 products).
+    Single matrices of shape (4, 4) are broadcast over all frames.
+
+    :return: array of shape (frames, 4, 4)
+    """
+    return reduce(numpy.matmul, matrices)
+
+
+def invert(matrices):
+    """ Invert a stack of matrices. Singular matrices get their pseudo-inverse rather than raising.
+
+    :param matrices: array of shape (frames, 4, 4)
+    :return: array of shape (frames, 4, 4)
+    """
+    try:
+        return numpy.linalg.inv(matrices)
+    except numpy.linalg.LinAlgError:
+        return numpy.linalg.pinv(matrices)
+
+
+def translation(x, y, z=0.0):
+    """ Make translation matrices, arguments can be scalars or 1D arrays of the same length """
+    x, y, z = numpy.broadcast_arrays(*(numpy.atleast_1d(numpy.asarray(v, dtype=numpy.float64)) for v in (x, y, z)))
+    matrices = identity(len(x))
+    matrices[:, 0, 3] = x
+    matrices[:, 1, 3] = y
+    matrices[:, 2, 3] = z
+    return matrices
+
+
+def scaling(x, y, z=1.0):
+    """ Make scale matrices, arguments can be scalars or 1D arrays of the same length """
+    x, y, z = numpy.broadcast_arrays(*(numpy.atleast_1d(numpy.asarray(v, dtype=numpy.float64)) for v in (x, y, z)))
+    matrices = identity(len(x))
+    matrices[:, 0, 0] = x
+    matrices[:, 1, 1] = y
+    matrices[:, 2, 2] = z
+    return matrices
+
+
+def rotation_z(angles):
+    """ Make rotation matrices around the Z axis
+
+    :param angles: scalar or 1D array of angles in radians
+    """
+    angles = numpy.atleast_1d(numpy.asarray(angles, dtype=numpy.float64))
+    cos = numpy.cos(angles)
+    sin = numpy.sin(angles)
+    matrices = identity(len(angles))
+    matrices[:, 0, 0] = cos
+    matrices[:, 0, 1] = -sin
+    matrices[:, 1, 0] = sin
+    matrices[:, 1, 1] = cos
+    return matrices
+
+
+def projection(lens, near, far, perspective=True):
+    """ Equivalent of nuke.math.Matrix4.projection() for a range of frames
+
+    :param lens: scalar or 1D array, focal length divided by horizontal aperture
+    :param near: scalar or 1D array, near clipping plane
+    :param far: scalar or 1D array, far clipping plane
+    :param perspective: scalar or 1D array of booleans, orthographic projection where False
+    """
+    lens, near, far, perspective = numpy.broadcast_arrays(
+        *(numpy.atleast_1d(numpy.asarray(v, dtype=numpy.float64)) for v in (lens, near, far, perspective)))
+    perspective = perspective.astype(bool)
+    depth = near - far
+    matrices = numpy.zeros((len(lens), 4, 4))
+    matrices[:, 0, 0] = lens
+    matrices[:, 1, 1] = lens
+    matrices[:, 2, 2] = numpy.where(perspective, (far + near) / depth, 2.0 / depth)
+    matrices[:, 2, 3] = numpy.where(perspective, 2.0 * far * near / depth, (far + near) / depth)
+    matrices[:, 3, 2] = numpy.where(perspective, -1.0, 0.0)
+    matrices[:, 3, 3] = numpy.where(perspective, 0.0, 1.0)
+    return matrices
+
+
+def map_unit_square_to_quad(quads):
+    """ Equivalent of nuke.math.Matrix4.mapUnitSquareToQuad() for a range of frames
+
+    :param quads: array-like of shape (frames, 4, 2), the 4 (x, y) corners of the quad for each frame
+    :return: array of shape (frames, 4, 4)
+    """
+    quads = numpy.asarray(quads, dtype=numpy.float64).reshape(-1, 4, 2)
+    x0, x1, x2, x3 = (quads[:, index, 0] for index in range(4))
+    y0, y1, y2, y3 = (quads[:, index, 1] for index in range(4))
+    dx3 = x0 - x1 + x2 - x3
+    dy3 = y0 - y1 + y2 - y3
+    dx1 = x1 - x2
+    dx2 = x3 - x2
+    dy1 = y1 - y2
+    dy2 = y3 - y2
+    determinant = dx1 * dy2 - dx2 * dy1
+    affine = (dx3 == 0) & (dy3 == 0)
+    safe_determinant = numpy.where(determinant == 0, 1.0, determinant)
+    g = numpy.where(affine, 0.0, (dx3 * dy2 - dx2 * dy3) / safe_determinant)
+    h = numpy.where(affine, 0.0, (dx1 * dy3 - dx3 * dy1) / safe_determinant)
+
+    matrices = identity(len(quads))
+    matrices[:, 0, 0] = x1 - x0 + g * x1
+    matrices[:, 0, 1] = x3 - x0 + h * x3
+    matrices[:, 0, 3] = x0
+    matrices[:, 1, 0] = y1 - y0 + g * y1
+    matrices[:, 1, 1] = y3 - y0 + h * y3
+    matrices[:, 1, 3] = y0
+    matrices[:, 3, 0] = g
+    matrices[:, 3, 1] = h
+    return matrices
+
+
+def frame_corners(frame_width, frame_height):
+    """ The 4 corners of a frame, in the order used by CornerPin2D """
+    return numpy.array([[0, 0], [frame_width, 0], [frame_width, frame_height], [0, frame_height]],
+                       dtype=numpy.float64)
+
+
+def corners_to_matrices(corners, frame_width, frame_height):
+    """ Generate matrices from 4 corner points per frame
+
+    :param corners: array-like of shape (frames, 4, 2)
+    :param int frame_width:
+    :param int frame_height:
+    :return: array of shape (frames, 4, 4)
+    """
+    to_matrices = map_unit_square_to_quad(corners)
+    from_matrix = map_unit_square_to_quad(frame_corners(frame_width, frame_height))
+    return multiply(to_matrices, invert(from_matrix))
+
+
+def cornerpin_matrices(to_corners, from_corners, extra_matrices=None, inverted=False):
+    """ Calculate the matrices of a CornerPin2D node
+
+    :param to_corners: array-like of shape (frames, 4, 2), values of the to1..to4 knobs
+    :param from_corners: array-like of shape (frames, 4, 2), values of the from1..from4 knobs
+    :param extra_matrices: array-like of shape (frames, 16), values of the transform_matrix knob
+    :param inverted: scalar or 1D array of booleans, value of the invert knob
+    :return: array of shape (frames, 4, 4)
+    """
+    matrices = multiply(map_unit_square_to_quad(to_corners), invert(map_unit_square_to_quad(from_corners)))
+    if extra_matrices is not None:
+        matrices = multiply(as_matrices(extra_matrices), matrices)
+    inverted = numpy.broadcast_to(numpy.asarray(inverted, dtype=bool), (len(matrices),))
+    if inverted.any():
+        matrices = matrices.copy()
+        matrices[inverted] = invert(matrices[inverted])
+    return matrices
+
+
+def matrices_to_corners(matrices, frame_width, frame_height):
+    """ Transform the corners of a frame by a stack of matrices
+
+    :param matrices: array of shape (frames, 4, 4)
+    :param int frame_width:
+    :param int frame_height:
+    :return: array of shape (frames, 4, 2)
+    """
+    corners = numpy.zeros((4, 4))
+    corners[:, 0:2] = frame_corners(frame_width, frame_height)
+    corners[:, 3] = 1
+    transformed = numpy.einsum('fij,cj->fci', as_matrices(matrices), corners)
+    return transformed[:, :, 0:2] / transformed[:, :, 3:4]
+
+
+def decompose_matrices(matrices, center_x=0, center_y=0):
+    """ Decompose matrices into translation, rotation, scale, skew
+
+    :return: tuple of 1D arrays (translate_x, translate_y, rotation, scale_x, scale_y, skew_x)
+    """
+    matrices = as_matrices(matrices)
+    a00 = matrices[:, 0, 0]
+    a01 = matrices[:, 0, 1]
+    a10 = matrices[:, 1, 0]
+    a11 = matrices[:, 1, 1]
+    translate_x = a00 * center_x + a01 * center_y + matrices[:, 0, 3] - center_x
+    translate_y = a10 * center_x + a11 * center_y + matrices[:, 1, 3] - center_y
+    # Skew Y is never solved, will be reflected in Rotation instead.
+    delta = a00 * a11 - a01 * a10
+    rotation = numpy.degrees(numpy.arctan2(a10, a00))
+    scale_x = numpy.sqrt(a00 ** 2 + a10 ** 2)
+    scale_y = delta / scale_x
+    skew_x = (a00 * a01 + a10 * a11) / delta
+    return translate_x, translate_y, rotation, scale_x, scale_y, skew_x
+
+
+def camera_projection_matrices(world_matrices, win_roll, win_scale, win_translate, focal, haperture, near, far,
+                               projection_mode, format_width, format_height, pixel_aspect=1.0):
+    """ Calculate a camera's projection matrices for a range of frames, see matrix_utils.get_camera_projection_matrix
+
+    :param world_matrices: array-like of shape (frames, 16), values of the world_matrix knob
+    :param win_roll: 1D array, winroll knob
+    :param win_scale: array-like of shape (frames, 2), win_scale knob
+    :param win_translate: array-like of shape (frames, 2), win_translate knob
+    :param focal: 1D array, focal knob
+    :param haperture: 1D array, haperture knob
+    :param near: 1D array, near knob
+    :param far: 1D array, far knob
+    :param projection_mode: 1D array, projection_mode knob
+    :param int format_width: width of the image format
+    :param int format_height: height of the image format
+    :param float pixel_aspect: pixel aspect of the image format
+    :return: array of shape (frames, 4, 4)
+    """
+    cam_transforms = invert(as_matrices(world_matrices))
+    win_scale = numpy.asarray(win_scale, dtype=numpy.float64).reshape(-1, 2)
+    win_translate = numpy.asarray(win_translate, dtype=numpy.float64).reshape(-1, 2)
+
+    post_matrices = multiply(rotation_z(numpy.radians(win_roll)),
+                             scaling(1.0 / win_scale[:, 0], 1.0 / win_scale[:, 1]),
+                             translation(-win_translate[:, 0], -win_translate[:, 1]))
+    projection_matrices = projection(numpy.asarray(focal, dtype=numpy.float64) / haperture, near, far,
+                                     numpy.asarray(projection_mode) == 0)
+
+    image_aspect = float(format_height) / float(format_width)
+    aspect_matrix = translation(1.0, 1.0 - (1.0 - image_aspect / float(pixel_aspect)))
+    x_scale = float(format_width) / 2.0
+    format_matrix = scaling(x_scale, x_scale * pixel_aspect)
+
+    return multiply(format_matrix, aspect_matrix, projection_matrices, post_matrices, cam_transforms)
+
+
+def card_matrices(card_values, z_distance, focal, haperture, format_width, format_height, aspect=1.0,
+                  orientation='XY'):
+    """ Calculate the matrices of a card for a range of frames, see matrix_utils.get_card_matrix
+
+    :param card_values: array-like of shape (frames, 16), values of the card's matrix knob
+    :param z_distance: 1D array, z knob of the card (0 for Card3D)
+    :param focal: 1D array, lens_in_focal knob
+    :param haperture: 1D array, lens_in_haperture knob
+    :param int format_width: width of the image format
+    :param int format_height: height of the image format
+    :param float aspect: image aspect applied to the card
+    :param str orientation: XY, YZ or ZX
+    :return: array of shape (frames, 4, 4)
+    """
+    card_values = as_matrices(card_values)
+    count = len(card_values)
+    z_distance = numpy.broadcast_to(numpy.asarray(z_distance, dtype=numpy.float64), (count,))
+    base_matrix = multiply(scaling(1, aspect),
+                           translation(-.5, -.5),
+                           scaling(1 / float(format_width), 1 / float(format_height)))
+
+    # Project internal camera, and use a transformed corner to calculate the scale factor
+    calculated_z = numpy.where(z_distance == 0, 1.0, z_distance)
+    focal_ratio = numpy.asarray(focal, dtype=numpy.float64) / haperture
+    inversed_cams = invert(projection(focal_ratio, -calculated_z, calculated_z, True))
+    corner_top_right = numpy.matmul(inversed_cams, numpy.array([1, aspect, 1, 1], dtype=numpy.float64))
+    corner_top_right = corner_top_right[:, 0:2] / corner_top_right[:, 3:4]
+    original_length = numpy.hypot(0.5, aspect / 2.0)
+    scale_factor = numpy.hypot(corner_top_right[:, 0], corner_top_right[:, 1]) / original_length
+
+    orientation_matrix = numpy.identity(4)
+    if orientation == 'YZ':
+        orientation_matrix[0, 0] = 0
+        orientation_matrix[2, 0] = 1
+        orientation_matrix[0, 2] = 1
+        orientation_matrix[2, 2] = 0
+    elif orientation == 'ZX':
+        orientation_matrix[1, 1] = 0
+        orientation_matrix[2, 1] = 1
+        orientation_matrix[1, 2] = 1
+        orientation_matrix[2, 2] = 0
+
+    return multiply(card_values,
+                    orientation_matrix,
+                    translation(0, 0, -z_distance),
+                    scaling(scale_factor, scale_factor),
+                    base_matrix)
+
+
+def flatten_to_2d(matrices):
+    """ Remove the 3D components of projected matrices and normalize them, see matrix_utils.reconcile_card
+
+    :param matrices: array of shape (frames, 4, 4)
+    :return: array of shape (frames, 4, 4)
+    """
+    matrices = as_matrices(matrices).copy()
+    matrices[:, 2, :] = 0
+    matrices[:, :, 2] = 0
+    matrices[:, 2, 2] = 1
+    scale = matrices[:, 3, 3]
+    scale = numpy.where(scale == 0, 1.0, scale)
+    return matrices / scale[:, None, None]
+
+
+def reconciled_card_matrices(card, camera):
+    """ Project the matrices of a 3D card through a camera into 2D matrices
+
+    :param dict card: keyword arguments of card_matrices()
+    :param dict camera: keyword arguments of camera_projection_matrices()
+    :return: array of shape (frames, 4, 4)
+    """
+    return flatten_to_2d(multiply(camera_projection_matrices(**camera), card_matrices(**card)))
+
+
+# Jobs, made by matrix_utils from knob values, which can be solved in worker processes.
+JOB_SOLVERS = {
+    'matrices': as_matrices,
+    'cornerpin': cornerpin_matrices,
+    'card': reconciled_card_matrices,
+}
+
+
+def solve_matrix_job(job):
+    """ Calculate the matrices described by a job, see matrix_utils.make_matrix_job()
+
+    :param dict job: {'type': key of JOB_SOLVERS, 'arguments': keyword arguments of the solver}
+    :return: array of shape (frames, 4, 4)
+    """
+    return JOB_SOLVERS[job['type']](**job['arguments'])
+
+
+def solve_conversion_job(job):
+    """ Calculate the matrices and corners of a matrix conversion, see matrix_utils.make_conversion_job()
+
+    :param dict job: {'source': matrix job, 'reference': matrix job or None, 'invert': bool,
+                      'width': frame width, 'height': frame height}
+    :return: tuple of arrays (matrices, corners) of shapes (frames, 4, 4) and (frames, 4, 2)
+    """
+    matrices = solve_matrix_job(job['source'])
+    if job['reference'] is not None:
+        matrices = multiply(matrices, invert(solve_matrix_job(job['reference'])))
+    if job['invert']:
+        matrices = invert(matrices)
+    return matrices, matrices_to_corners(matrices, job['width'], job['height'])
+
+
+def solve_conversion_jobs(jobs, python_executable=None, max_workers=None, callback=None, processes=True,
+                          error_callback=None):
+    """ Solve several conversion jobs in a pool of worker processes.
+    Falls back to solving the jobs one after the other in the current process if the pool can't be used.
+
+    :param list jobs: Jobs made by matrix_utils.make_conversion_job()
+    :param str python_executable: Python interpreter used to spawn the workers, the current one if None
+    :param int max_workers: Number of worker processes, defaults to the number of cores
+    :param callback: Optional function called with the number of jobs solved so far, after each job
+    :param bool processes: Set False to solve the jobs in the current process
+    :param error_callback: Optional function called with the error when the pool can't be used, before the jobs left
+        are solved in the current process
+    :return: list of solve_conversion_job() results, in the order of the jobs
+    """
+    results = [None] * len(jobs)
+    if processes and len(jobs) > 1:
+        results, error = _solve_in_processes(jobs, python_executable, max_workers, callback)
+        if error is not None and error_callback:
+            error_callback(error)
+
+    for index, job in enumerate(jobs):
+        if results[index] is None:
+            results[index] = solve_conversion_job(job)
+            if callback:
+                callback(len(jobs) - results.count(None))
+    return results
+
+
+def _solve_in_processes(jobs, python_executable, max_workers, callback):
+    """ Solve conversion jobs in a process pool, the jobs which could not be solved are left as None
+
+    :return: tuple of the results and the error which stopped the pool, or None
+    """
+    results = [None] * len(jobs)
+    error = None
+    try:
+        import multiprocessing
+        from concurrent import futures
+        context = multiprocessing.get_context('spawn')
+        if python_executable:
+            context.set_executable(python_executable)
+        with futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            pending = dict((executor.submit(solve_conversion_job, job), index) for index, job in enumerate(jobs))
+            for solved, future in enumerate(futures.as_completed(pending), 1):
+                results[pending[future]] = future.result()
+                if callback:
+                    callback(solved)
+    except Exception as pool_error:
+        # Missing on python 2 (get_context, the futures backport), broken pools, jobs which can't be pickled...
+        # A job failing by itself raises again when solved in the current process
+        error = pool_error
+    return results, error
+
+
+# Adapters to nuke.math, nuke is only imported when these are used.
+def from_matrix4(matrix):
+    """ Convert a nuke.math.Matrix4 to an array of shape (4, 4) """
+    return numpy.array([matrix[index] for index in range(16)], dtype=numpy.float64).reshape(4, 4).T
+
+
+def from_matrix4_list(matrices):
+    """ Convert a list of nuke.math.Matrix4 to an array of shape (frames, 4, 4) """
+    return numpy.array([from_matrix4(matrix) for matrix in matrices]).reshape(-1, 4, 4)
+
+
+def to_matrix4(array):
+    """ Convert an array of shape (4, 4) to a nuke.math.Matrix4 """
+    import nuke
+    matrix = nuke.math.Matrix4()
+    for index, value in enumerate(numpy.asarray(array, dtype=numpy.float64).T.ravel()):
+        matrix[index] = value
+    return matrix
+
+
+def to_vector2_list(points):
+    """ Convert an array of shape (points, 2) to a list of nuke.math.Vector2 """
+    import nuke
+    return [nuke.math.Vector2(float(x), float(y)) for x, y in points]
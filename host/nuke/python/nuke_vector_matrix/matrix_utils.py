@@ -3,10 +3,18 @@ Set of utility functions to perform matrix operations in Nuke
 Author: Erwan Leroy
 """
 
+import os
+import sys
 import threading
 import math
+from array import array
 import nuke
 import nukescripts
+try:
+    import matrix_backend
+except ImportError:
+    # numpy is not available, matrices are calculated one frame at a time with nuke.math
+    matrix_backend = None
 
 
 class NodeMatrixWrapper(object):
@@ -114,6 +122,73 @@ class NodeMatrixWrapper(object):
             for index, point in enumerate(points):
                 set_value_on_tracker(self.node, point, index, frame, set_animated)
 
+    def set_matrices(self, matrices, first, tolerance=None):
+        """ Set matrices on the wrapped node for a whole frame range at once (requires numpy).
+        Each curve is written in one go rather than one key at a time.
+
+        :param matrices: numpy array of shape (frames, 4, 4), row-major
+        :param int first: The frame of the first matrix, the following matrices are set on consecutive frames
+        :param float tolerance: Skip keys within tolerance of the linear interpolation of their neighbours,
+            all keys are kept if None. Roto curves always keep all their keys.
+        """
+        node = self.node
+        matrices = matrix_backend.as_matrices(matrices)
+        last = first + len(matrices) - 1
+
+        if self.type == 'Transform':
+            center = KnobSampler(node, first, last, ['center']).values('center')
+            translate_x, translate_y, rotation, scale_x, scale_y, skew_x = matrix_backend.decompose_matrices(
+                matrices, center[:, 0], center[:, 1])
+            set_knob_curves(node['translate'], first, [translate_x, translate_y], tolerance)
+            set_knob_curves(node['rotate'], first, [rotation], tolerance)
+            set_knob_curves(node['scale'], first, [scale_x, scale_y], tolerance)
+            set_knob_curves(node['skewX'], first, [skew_x], tolerance)
+
+        elif self.type in ['Roto', 'RotoPaint', 'SplineWarp3']:
+            # We assume a layer Tracked_Layer1 is present, otherwise we make it
+            layer = self._get_rp_layer('Tracked_Layer1')
+            transform = layer.getTransform()
+            for y_index in range(4):
+                for x_index in range(4):
+                    curve = transform.getExtraMatrixAnimCurve(x_index, y_index)
+                    for frame, value in enumerate(matrices[:, x_index, y_index], first):
+                        curve.addKey(frame, float(value))
+                    transform.setExtraMatrixAnimCurve(x_index, y_index, curve)
+
+        elif self.type == 'Tracker4':
+            points = matrix_backend.matrices_to_corners(matrices, self.node.width(), self.node.height())
+            self.set_points(points, first, tolerance)
+
+        elif self.type == 'CornerPin2D':
+            values = matrices.reshape(-1, 16)
+            set_knob_curves(node['transform_matrix'], first, [values[:, index] for index in range(16)], tolerance)
+
+    def set_points(self, points, first, tolerance=None):
+        """ Set points on the wrapped node for a whole frame range at once (requires numpy). Depending on the node
+        type, the points might get converted to matrices and set instead.
+
+        :param points: numpy array of shape (frames, points, 2)
+        :param int first: The frame of the first points, the following points are set on consecutive frames
+        :param float tolerance: Skip keys within tolerance of the linear interpolation of their neighbours,
+            all keys are kept if None.
+        """
+        if self.type in ['Transform', 'Roto', 'RotoPaint', 'SplineWarp3']:
+            matrices = matrix_backend.corners_to_matrices(points, self.node.width(), self.node.height())
+            self.set_matrices(matrices, first, tolerance)
+
+        elif self.type == 'CornerPin2D':
+            for index in range(4):
+                knob = self.node['to%d' % (index + 1)]
+                set_knob_curves(knob, first, [points[:, index, 0], points[:, index, 1]], tolerance)
+
+        elif self.type == "Tracker4":
+            columns = 31
+            tracks = self.node['tracks']
+            for index in range(points.shape[1]):
+                point_index = get_tracker_point_index(self.node, index)
+                set_knob_curves(tracks, first, [points[:, index, 0], points[:, index, 1]], tolerance,
+                                [point_index * columns + 2, point_index * columns + 3])
+
     def _get_rp_layer(self, name):
         """ Get (or make) the rotopaint layer of a certain name
         :param str name: Name of the layer to obtain
@@ -130,6 +205,181 @@ class NodeMatrixWrapper(object):
         return layer
 
 
+class KnobSampler(object):
+    """
+    Read the knobs of a node over a whole frame range once, and serve the values of each frame from memory.
+
+    Values are stored per knob in a contiguous array of doubles, frame after frame. Knob components which are not
+    animated and hold no expression are read once, animation curves keyed on every frame of the range (baked tracks)
+    are read from their keys, and anything else (expressions, sparse keys, knobs computed by Nuke like world_matrix) is
+    read once per frame for all the components of the knob at once.
+    Knobs or frames which were not sampled are read from the node directly.
+    """
+
+    def __init__(self, node, first, last, knob_names=()):
+        self.node = node
+        self.first = first
+        self.last = last
+        self._widths = {}
+        self._values = {}
+        for knob_name in knob_names:
+            self.sample(knob_name)
+
+    @property
+    def frames(self):
+        """ The range of frames covered by the sampler """
+        return range(self.first, self.last + 1)
+
+    def has_frame(self, frame):
+        """ Check that a frame is within the sampled range """
+        return self.first <= frame <= self.last
+
+    def sample(self, knob_name):
+        """ Read all the values of an array knob over the frame range, unless already sampled
+
+        :param str knob_name: Name of the knob to sample
+        """
+        if knob_name in self._values:
+            return
+        knob = self.node[knob_name]
+        width = knob.arraySize()
+        columns = []
+        per_frame_indices = []
+        derived = knob_name in DERIVED_KNOBS
+        for index in range(width):
+            if derived:
+                # Never animated themselves, but follow the animation of the node and its parents
+                column = None
+                per_frame_indices.append(index)
+            elif not knob.isAnimated(index) and not knob.hasExpression(index):
+                column = [knob.getValue(index)] * len(self.frames)
+            else:
+                column = self._read_keys(knob.animation(index))
+                if column is None:
+                    per_frame_indices.append(index)
+            columns.append(column)
+
+        if per_frame_indices:
+            for frame in self.frames:
+                frame_values = knob.getValueAt(frame)
+                if width == 1:
+                    frame_values = [frame_values]
+                for index in per_frame_indices:
+                    if columns[index] is None:
+                        columns[index] = []
+                    columns[index].append(frame_values[index])
+
+        values = array('d')
+        for frame_values in zip(*columns):
+            values.extend(frame_values)
+        self._widths[knob_name] = width
+        self._values[knob_name] = values
+
+    def sample_matrix(self, knob_name='matrix'):
+        """ Read a transform knob (like the 'matrix' knob of Transform and Tracker4 nodes) over the frame range.
+        These knobs can only be evaluated through an OutputContext, so they are read once per frame.
+        The matrices are stored row-major, like the values of Array matrix knobs.
+
+        :param str knob_name: Name of the knob to sample
+        """
+        if knob_name in self._values:
+            return
+        knob = self.node.knob(knob_name)
+        context = nuke.OutputContext()
+        values = array('d')
+        for frame in self.frames:
+            context.setFrame(frame)
+            matrix = knob.value(context)
+            matrix.transpose()
+            values.extend(matrix[index] for index in range(16))
+        self._widths[knob_name] = 16
+        self._values[knob_name] = values
+
+    def _read_keys(self, curve):
+        """ Read the values of an animation curve from its keys, if it has a key on every frame of the range
+
+        :param nuke.AnimationCurve curve: The curve to read
+        :return: list of values, or None if the curve can't be read from its keys
+        """
+        if curve is None or not curve.noExpression():
+            return None
+        keys = dict((key.x, key.y) for key in curve.keys())
+        try:
+            return [keys[frame] for frame in self.frames]
+        except KeyError:
+            return None
+
+    def value_at(self, knob_name, frame, index=None):
+        """ Get the value of a knob at a given frame, like Knob.getValueAt()
+
+        :param str knob_name: Name of the knob
+        :param int frame: Frame number
+        :param int index: Index of the component to get, all components are returned as a list if None
+        """
+        if knob_name not in self._values or not self.has_frame(frame):
+            knob = self.node[knob_name]
+            if index is None:
+                return knob.getValueAt(frame)
+            return knob.getValueAt(frame, index)
+        width = self._widths[knob_name]
+        start = int(frame - self.first) * width
+        if index is not None:
+            return self._values[knob_name][start + index]
+        if width == 1:
+            return self._values[knob_name][start]
+        return list(self._values[knob_name][start:start + width])
+
+    def matrix_at(self, knob_name, frame):
+        """ Get the value of a matrix knob at a given frame as a nuke.math.Matrix4
+
+        :param str knob_name: Name of the knob, either sampled with sample() or sample_matrix()
+        :param int frame: Frame number
+        """
+        knob = self.node.knob(knob_name)
+        if (knob_name not in self._values or not self.has_frame(frame)) and not isinstance(knob, nuke.Array_Knob):
+            context = nuke.OutputContext()
+            context.setFrame(frame)
+            return knob.value(context)
+        values = self.value_at(knob_name, frame)
+        matrix = nuke.math.Matrix4()
+        for index in range(16):
+            matrix[index] = values[index]
+        matrix.transpose()
+        return matrix
+
+    def values(self, knob_name, first=None, last=None):
+        """ Get the values of a knob for a range of frames as an array (requires numpy).
+        The knob is sampled first if required.
+
+        :param str knob_name: Name of the knob
+        :param int first: First Frame, defaults to the first sampled frame
+        :param int last: Last Frame, defaults to the last sampled frame
+        :return: numpy array of shape (frames, components)
+        """
+        first = self.first if first is None else first
+        last = self.last if last is None else last
+        if not (self.has_frame(first) and self.has_frame(last)):
+            raise ValueError("Frames %s-%s were not sampled on %s" % (first, last, self.node.name()))
+        self.sample(knob_name)
+        values = matrix_backend.from_samples(self._values[knob_name], self._widths[knob_name])
+        return values[first - self.first:last - self.first + 1]
+
+
+# Knobs computed by Nuke from other knobs and the parents of the node, which have to be read on every frame
+DERIVED_KNOBS = ('world_matrix', 'matrix')
+
+# Knobs read to calculate the matrix of each supported class
+MATRIX_KNOBS = {
+    'Transform': ['matrix'],
+    'Tracker4': ['matrix'],
+    'CornerPin2D': ['to1', 'to2', 'to3', 'to4', 'from1', 'from2', 'from3', 'from4', 'transform_matrix', 'invert'],
+    'Card2': ['matrix', 'z', 'lens_in_focal', 'lens_in_haperture'],
+    'Card3D': ['matrix', 'lens_in_focal', 'lens_in_haperture'],
+    'Camera': ['world_matrix', 'winroll', 'win_scale', 'win_translate', 'focal', 'haperture', 'near', 'far',
+               'projection_mode'],
+}
+
+
 # Panel Classes
 class MergeTransformsPanel(nukescripts.PythonPanel):
     """ Panel presenting options for merging transforms """
@@ -149,9 +399,10 @@ class MergeTransformsPanel(nukescripts.PythonPanel):
         self.force_matrix.setTooltip("Uses the cornerpin's extra_matrix to match the transform rather than the corners")
         self.force_matrix.setEnabled(False)
         self.force_matrix.setFlag(nuke.STARTLINE)
+        self.reduce_keys, self.tolerance = make_key_reduction_knobs()
 
         # ADD KNOBS
-        for k in (self.first, self.last, self.force_cp, self.force_matrix):
+        for k in (self.first, self.last, self.force_cp, self.force_matrix, self.reduce_keys, self.tolerance):
             self.addKnob(k)
 
     def knobChanged(self, knob):
@@ -159,12 +410,18 @@ class MergeTransformsPanel(nukescripts.PythonPanel):
         # ONLY SHOW FORCE MATRIX IF CORNERPIN IS ON
         if knob is self.force_cp:
             self.force_matrix.setEnabled(self.force_cp.value())
+        elif knob is self.reduce_keys:
+            self.tolerance.setEnabled(knob.value())
 
 
 class MatrixConversionPanel(nukescripts.PythonPanel):
     """ Panel presenting options for converting Matrices from a node class to another"""
-    def __init__(self):
+    def __init__(self, batch_nodes=None):
+        """
+        :param list batch_nodes: Nodes to convert all at once. If None, the node to convert is picked in the panel.
+        """
         nukescripts.PythonPanel.__init__(self, 'Corner Pin To Matrix')
+        self.batch_nodes = batch_nodes
 
         # ANALYZE NUKE SCRIPT TO GATHER VALUES
         camera_nodes = []
@@ -194,7 +451,11 @@ class MatrixConversionPanel(nukescripts.PythonPanel):
         self.camera = nuke.Enumeration_Knob('camera_node', 'Camera', camera_nodes)
         # In cases where no node was selected in the first place, the current node is the first entry in the list
         node = nuke.toNode(self.node.value())
-        if not node or node.Class() not in ['Card2', 'Card3D']:
+        if batch_nodes is not None:
+            self.node.setVisible(False)
+            if not any(batch_node.Class() in ['Card2', 'Card3D'] for batch_node in batch_nodes):
+                self.camera.setVisible(False)
+        elif not node or node.Class() not in ['Card2', 'Card3D']:
             self.camera.setVisible(False)
         options = ['Roto',
                    'RotoPaint',
@@ -214,10 +475,11 @@ class MatrixConversionPanel(nukescripts.PythonPanel):
         self.reference.setValue(nuke.frame())
 
         self.invert = nuke.Boolean_Knob('invert', 'Invert Matrix')
+        self.reduce_keys, self.tolerance = make_key_reduction_knobs()
 
         # ADD KNOBS
         for k in (self.first, self.last, self.node, self.camera, self.destination, self.force_ref, self.reference,
-                  self.invert):
+                  self.invert, self.reduce_keys, self.tolerance):
             self.addKnob(k)
 
     def knobChanged(self, knob):
@@ -230,9 +492,79 @@ class MatrixConversionPanel(nukescripts.PythonPanel):
                 self.camera.setVisible(False)
         elif knob is self.force_ref:
             self.reference.setEnabled(knob.value())
+        elif knob is self.reduce_keys:
+            self.tolerance.setEnabled(knob.value())
 
 
 # Defining Helper Functions
+def make_key_reduction_knobs():
+    """ Make the knobs used by the panels to control the reduction of redundant keys
+
+    :return: tuple (reduce_keys, tolerance) knobs
+    """
+    reduce_keys = nuke.Boolean_Knob('reduce_keys', 'Skip Redundant Keys')
+    reduce_keys.setTooltip("Don't set keys lying on the linear interpolation of the keys around them.\n"
+                           "Requires numpy.")
+    reduce_keys.setFlag(nuke.STARTLINE)
+    reduce_keys.setEnabled(matrix_backend is not None)
+    tolerance = nuke.Double_Knob('tolerance', 'Tolerance')
+    tolerance.setTooltip("Maximum difference between a skipped key and the interpolated curve")
+    tolerance.setValue(0.001)
+    tolerance.clearFlag(nuke.STARTLINE)
+    tolerance.setEnabled(False)
+    return reduce_keys, tolerance
+
+
+def get_conversion_class(target):
+    """ Get the node class to create for a target of the MatrixConversionPanel
+
+    :param str target: Value of the 'Convert to' knob
+    :return: tuple (new_class, matrix) where matrix is True if the matrix should be set rather than corners
+    """
+    matrix = True
+    if target == 'Roto':
+        new_class = 'Roto'
+    elif target == 'RotoPaint':
+        new_class = 'RotoPaint'
+    elif target == 'CornerPin':
+        new_class = 'CornerPin2D'
+        matrix = False
+    elif target == 'CornerPin (Matrix only)':
+        new_class = 'CornerPin2D'
+    elif target == 'Transform (No Perspective)':
+        new_class = 'Transform'
+    elif target == 'Tracker':
+        new_class = 'Tracker4'
+    elif target == 'SplineWarp':
+        new_class = 'SplineWarp3'
+    else:
+        raise ValueError('Unknown Conversion Target')
+    return new_class, matrix
+
+
+def get_python_executable():
+    """ Find a python interpreter to start worker processes with.
+    In Nuke, sys.executable is Nuke itself, but Nuke ships with a python interpreter next to it.
+
+    :return: path to the interpreter, or None if none was found
+    """
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+    executable_dir = os.path.dirname(sys.executable)
+    for name in ['python3', 'python', 'python.exe']:
+        path = os.path.join(executable_dir, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def get_panel_tolerance(panel):
+    """ Get the key reduction tolerance chosen in a panel, None if keys should not be reduced """
+    if panel.reduce_keys.value():
+        return panel.tolerance.value()
+    return None
+
+
 def check_classes(nodes, allowed_classes):
     """ Check that the classes of a given list of nodes are all allowed classes """
     valid = True
@@ -280,29 +612,28 @@ def decompose_matrix(matrix, center_x=0, center_y=0):
     return translate_x, translate_y, rotation, scale_x, scale_y, skew_x
 
 
-def get_camera_projection_matrix(camera, frame, image_format):
+def get_camera_projection_matrix(camera, frame, image_format, sampler=None):
     """ Calculate a camera's projection matrix (can be used to reconcile points)
 
     :param nuke.Node camera: Camera node
     :param int frame: frame number
     :param image_format: nuke format for aspect ratio calculations
+    :param KnobSampler sampler: Optional sampler of the camera to read the knob values from
     :return: projection matrix
     """
     # modified code from nukescripts/Snap3D
+    sampler = sampler or KnobSampler(camera, frame, frame)
 
     # Matrix to transform points into camera-relative coordinates.
-    matrix_world = nuke.math.Matrix4()
-    for index in range(16):
-        matrix_world[index] = camera['world_matrix'].getValueAt(frame, index)
-    matrix_world.transpose()
+    matrix_world = sampler.matrix_at('world_matrix', frame)
     cam_transform = matrix_world.inverse()
 
     # Matrix to take the camera projection knobs into account
-    roll = float(camera['winroll'].getValueAt(frame, 0))
-    scale_x = float(camera['win_scale'].getValueAt(frame, 0))
-    scale_y = float(camera['win_scale'].getValueAt(frame, 1))
-    translate_x = float(camera['win_translate'].getValueAt(frame, 0))
-    translate_y = float(camera['win_translate'].getValueAt(frame, 1))
+    roll = float(sampler.value_at('winroll', frame, 0))
+    scale_x = float(sampler.value_at('win_scale', frame, 0))
+    scale_y = float(sampler.value_at('win_scale', frame, 1))
+    translate_x = float(sampler.value_at('win_translate', frame, 0))
+    translate_y = float(sampler.value_at('win_translate', frame, 1))
     post_matrix = nuke.math.Matrix4()
     post_matrix.makeIdentity()
     post_matrix.rotateZ(math.radians(roll))
@@ -310,11 +641,11 @@ def get_camera_projection_matrix(camera, frame, image_format):
     post_matrix.translate(-translate_x, -translate_y, 0.0)
 
     # Projection matrix based on the focal length, aperture and clipping planes of the camera
-    focal_length = float(camera['focal'].getValueAt(frame))
-    h_aperture = float(camera['haperture'].getValueAt(frame))
-    near = float(camera['near'].getValueAt(frame))
-    far = float(camera['far'].getValueAt(frame))
-    projection_mode = int(camera['projection_mode'].getValueAt(frame))
+    focal_length = float(sampler.value_at('focal', frame))
+    h_aperture = float(sampler.value_at('haperture', frame))
+    near = float(sampler.value_at('near', frame))
+    far = float(sampler.value_at('far', frame))
+    projection_mode = int(sampler.value_at('projection_mode', frame))
     projection_matrix = nuke.math.Matrix4()
     projection_matrix.projection(focal_length / h_aperture, near, far, projection_mode == 0)
 
@@ -339,8 +670,14 @@ def get_camera_projection_matrix(camera, frame, image_format):
     return format_matrix * aspect_matrix * projection_matrix * post_matrix * cam_transform
 
 
-def get_card_matrix(card, frame):
-    """ Returns the matrix of a card, no matter the card settings (except distortion)"""
+def get_card_matrix(card, frame, sampler=None):
+    """ Returns the matrix of a card, no matter the card settings (except distortion)
+
+    :param nuke.Node card: Card node
+    :param int frame: frame number
+    :param KnobSampler sampler: Optional sampler of the card to read the knob values from
+    """
+    sampler = sampler or KnobSampler(card, frame, frame)
 
     try:
         image_format = card.input(0).format()
@@ -369,14 +706,14 @@ def get_card_matrix(card, frame):
 
     # Deal with camera built into the card node
     try:
-        z_distance = card['z'].getValueAt(frame)
+        z_distance = sampler.value_at('z', frame)
     except NameError:
         # We're in a Card3D
         z_distance = 0
     calculated_z = z_distance or 1.0
 
     # Project internal camera
-    focal_ratio = card['lens_in_focal'].getValueAt(frame) / card['lens_in_haperture'].getValueAt(frame)
+    focal_ratio = sampler.value_at('lens_in_focal', frame) / sampler.value_at('lens_in_haperture', frame)
     internal_camera_matrix = nuke.math.Matrix4()
     internal_camera_matrix.projection(focal_ratio, -calculated_z, calculated_z, True)
     inversed_cam = internal_camera_matrix.inverse()
@@ -423,62 +760,197 @@ def get_card_matrix(card, frame):
     card_matrix = orientation_matrix * card_matrix
 
     # Handle card transformation
-    values = card['matrix'].getValueAt(frame)
-    matrix = nuke.math.Matrix4()
-    for i in range(len(values)):
-        matrix[i] = values[i]
-    matrix.transpose()
+    matrix = sampler.matrix_at('matrix', frame)
 
     return matrix * card_matrix
 
 
-def get_matrix_at_frame(node, frame):
+def get_camera_projection_arguments(camera, first, last, image_format, sampler=None):
+    """ Gather the values required by matrix_backend.camera_projection_matrices() for a frame range (requires numpy)
+
+    :param nuke.Node camera: Camera node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param image_format: nuke format for aspect ratio calculations
+    :param KnobSampler sampler: Optional sampler of the camera covering the frame range
+    :return: dict of keyword arguments
+    """
+    sampler = sampler or sample_node(camera, first, last)
+    return {
+        'world_matrices': sampler.values('world_matrix', first, last),
+        'win_roll': sampler.values('winroll', first, last)[:, 0],
+        'win_scale': sampler.values('win_scale', first, last),
+        'win_translate': sampler.values('win_translate', first, last),
+        'focal': sampler.values('focal', first, last)[:, 0],
+        'haperture': sampler.values('haperture', first, last)[:, 0],
+        'near': sampler.values('near', first, last)[:, 0],
+        'far': sampler.values('far', first, last)[:, 0],
+        'projection_mode': sampler.values('projection_mode', first, last)[:, 0],
+        'format_width': image_format.width(),
+        'format_height': image_format.height(),
+        'pixel_aspect': image_format.pixelAspect(),
+    }
+
+
+def get_camera_projection_matrices(camera, first, last, image_format, sampler=None):
+    """ Calculate a camera's projection matrices for a whole frame range at once (requires numpy)
+
+    :param nuke.Node camera: Camera node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param image_format: nuke format for aspect ratio calculations
+    :param KnobSampler sampler: Optional sampler of the camera covering the frame range
+    :return: numpy array of shape (frames, 4, 4)
+    """
+    return matrix_backend.camera_projection_matrices(
+        **get_camera_projection_arguments(camera, first, last, image_format, sampler))
+
+
+def get_card_arguments(card, first, last, sampler=None):
+    """ Gather the values required by matrix_backend.card_matrices() for a frame range (requires numpy)
+
+    :param nuke.Node card: Card2 or Card3D node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param KnobSampler sampler: Optional sampler of the card covering the frame range
+    :return: dict of keyword arguments
+    """
+    sampler = sampler or sample_node(card, first, last)
+    try:
+        image_format = card.input(0).format()
+    except AttributeError:
+        image_format = nuke.root()['format'].value()
+    if card.Class() == 'Card3D' or card['image_aspect'].value():
+        aspect = float(image_format.height()) / float(image_format.width()) / image_format.pixelAspect()
+    else:
+        aspect = 1.0
+    if card.Class() == 'Card3D':
+        z_distance = 0
+    else:
+        z_distance = sampler.values('z', first, last)[:, 0]
+    try:
+        orientation = card['orientation'].value()
+    except NameError:
+        orientation = 'XY'
+    return {
+        'card_values': sampler.values('matrix', first, last),
+        'z_distance': z_distance,
+        'focal': sampler.values('lens_in_focal', first, last)[:, 0],
+        'haperture': sampler.values('lens_in_haperture', first, last)[:, 0],
+        'format_width': image_format.width(),
+        'format_height': image_format.height(),
+        'aspect': aspect,
+        'orientation': orientation,
+    }
+
+
+def get_card_matrices(card, first, last, sampler=None):
+    """ Calculate the matrices of a card for a whole frame range at once (requires numpy)
+
+    :param nuke.Node card: Card2 or Card3D node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param KnobSampler sampler: Optional sampler of the card covering the frame range
+    :return: numpy array of shape (frames, 4, 4)
+    """
+    return matrix_backend.card_matrices(**get_card_arguments(card, first, last, sampler))
+
+
+def make_matrix_job(node, first, last, camera=None, sampler=None, camera_sampler=None):
+    """ Gather all the knob values required to calculate the matrices of a node over a frame range (requires numpy).
+    Jobs only hold plain values and arrays, they are solved by matrix_backend.solve_matrix_job(), which doesn't need
+    nuke and can run in another process.
+
+    :param nuke.Node node: Transform, Tracker4, CornerPin2D, Card2 or Card3D node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param nuke.Node camera: Camera Node, only used when the node is a card
+    :param KnobSampler sampler: Optional sampler of the node covering the frame range
+    :param KnobSampler camera_sampler: Optional sampler of the camera covering the frame range
+    :return: dict
+    """
+    sampler = sampler or sample_node(node, first, last)
+    if node.Class() in ['Transform', 'Tracker4']:
+        return {'type': 'matrices',
+                'arguments': {'values': sampler.values('matrix', first, last)}}
+    elif node.Class() == 'CornerPin2D':
+        return {'type': 'cornerpin',
+                'arguments': {
+                    'to_corners': matrix_backend.stack_points(
+                        [sampler.values('to%d' % index, first, last) for index in range(1, 5)]),
+                    'from_corners': matrix_backend.stack_points(
+                        [sampler.values('from%d' % index, first, last) for index in range(1, 5)]),
+                    'extra_matrices': sampler.values('transform_matrix', first, last),
+                    'inverted': sampler.values('invert', first, last)[:, 0] != 0}}
+    elif node.Class() in ['Card2', 'Card3D']:
+        if camera is None:
+            raise RuntimeError("A camera is required to reconcile a card.")
+        try:
+            image_format = node.input(0).format()
+        except AttributeError:
+            image_format = nuke.root()['format'].value()
+        return {'type': 'card',
+                'arguments': {
+                    'card': get_card_arguments(node, first, last, sampler),
+                    'camera': get_camera_projection_arguments(camera, first, last, image_format, camera_sampler)}}
+    raise ValueError("Can not calculate matrices for %s nodes" % node.Class())
+
+
+def get_matrices_in_range(node, first, last, camera=None, sampler=None, camera_sampler=None):
+    """ Calculate the matrices of a node for a whole frame range at once (requires numpy)
+
+    :param nuke.Node node: Transform, Tracker4, CornerPin2D, Card2 or Card3D node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param nuke.Node camera: Camera Node, only used when the node is a card
+    :param KnobSampler sampler: Optional sampler of the node covering the frame range
+    :param KnobSampler camera_sampler: Optional sampler of the camera covering the frame range
+    :return: numpy array of shape (frames, 4, 4)
+    """
+    return matrix_backend.solve_matrix_job(make_matrix_job(node, first, last, camera, sampler, camera_sampler))
+
+
+def get_matrix_at_frame(node, frame, sampler=None):
     """ Calculate a matrix for a Transform, Tracker4 or CornerPin2D node at a given frame
 
     :param nuke.Node node: Node to extract the matrix from
     :param int frame: Frame number
+    :param KnobSampler sampler: Optional sampler of the node to read the knob values from
     :return: a 4x4 matrix
     """
+    sampler = sampler or KnobSampler(node, frame, frame)
     matrix = None
     if node.Class() == 'Transform' or node.Class() == 'Tracker4':
-        k = node.knob('matrix')
-        context = nuke.OutputContext()
-        context.setFrame(frame)
-        matrix = k.value(context)
+        matrix = sampler.matrix_at('matrix', frame)
     elif node.Class() == 'CornerPin2D':
         # Calculate 'to' matrix
         to_matrix = nuke.math.Matrix4()
-        to1x = node['to1'].getValueAt(frame)[0]
-        to1y = node['to1'].getValueAt(frame)[1]
-        to2x = node['to2'].getValueAt(frame)[0]
-        to2y = node['to2'].getValueAt(frame)[1]
-        to3x = node['to3'].getValueAt(frame)[0]
-        to3y = node['to3'].getValueAt(frame)[1]
-        to4x = node['to4'].getValueAt(frame)[0]
-        to4y = node['to4'].getValueAt(frame)[1]
+        to1x = sampler.value_at('to1', frame, 0)
+        to1y = sampler.value_at('to1', frame, 1)
+        to2x = sampler.value_at('to2', frame, 0)
+        to2y = sampler.value_at('to2', frame, 1)
+        to3x = sampler.value_at('to3', frame, 0)
+        to3y = sampler.value_at('to3', frame, 1)
+        to4x = sampler.value_at('to4', frame, 0)
+        to4y = sampler.value_at('to4', frame, 1)
         to_matrix.mapUnitSquareToQuad(to1x, to1y, to2x, to2y, to3x, to3y, to4x, to4y)
         # Calculate 'from' matrix
         from_matrix = nuke.math.Matrix4()
-        from1x = node['from1'].getValueAt(frame)[0]
-        from1y = node['from1'].getValueAt(frame)[1]
-        from2x = node['from2'].getValueAt(frame)[0]
-        from2y = node['from2'].getValueAt(frame)[1]
-        from3x = node['from3'].getValueAt(frame)[0]
-        from3y = node['from3'].getValueAt(frame)[1]
-        from4x = node['from4'].getValueAt(frame)[0]
-        from4y = node['from4'].getValueAt(frame)[1]
+        from1x = sampler.value_at('from1', frame, 0)
+        from1y = sampler.value_at('from1', frame, 1)
+        from2x = sampler.value_at('from2', frame, 0)
+        from2y = sampler.value_at('from2', frame, 1)
+        from3x = sampler.value_at('from3', frame, 0)
+        from3y = sampler.value_at('from3', frame, 1)
+        from4x = sampler.value_at('from4', frame, 0)
+        from4y = sampler.value_at('from4', frame, 1)
         from_matrix.mapUnitSquareToQuad(from1x, from1y, from2x, from2y, from3x, from3y, from4x, from4y)
         # Calculate the extra matrix
-        k = node.knob('transform_matrix')
-        values = k.getValueAt(frame)
-        extra_matrix = nuke.math.Matrix4()
-        for index in range(len(values)):
-            extra_matrix[index] = values[index]
-        extra_matrix.transpose()
+        extra_matrix = sampler.matrix_at('transform_matrix', frame)
 
         matrix = extra_matrix * (to_matrix * from_matrix.inverse())
 
-        if node['invert'].getValueAt(frame):
+        if sampler.value_at('invert', frame):
             matrix = matrix.inverse()
 
     return matrix
@@ -516,20 +988,22 @@ def print_matrix4(matrix):
     print(row.format(matrix[3], matrix[7], matrix[11], matrix[15]))
 
 
-def reconcile_card(card, camera, frame):
+def reconcile_card(card, camera, frame, card_sampler=None, camera_sampler=None):
     """ Reconcile the matrix of a 3D card into a 2D matrix
 
     :param nuke.Node card: Card Node
     :param nuke.Node camera: Camera Node
     :param int frame: Frame number
+    :param KnobSampler card_sampler: Optional sampler of the card to read the knob values from
+    :param KnobSampler camera_sampler: Optional sampler of the camera to read the knob values from
     :rtype: nuke.math.Vector4
     """
     try:
         image_format = card.input(0).format()
     except AttributeError:
         image_format = nuke.root()['format'].value()
-    card_matrix = get_card_matrix(card, frame)
-    cam_matrix = get_camera_projection_matrix(camera, frame, image_format)
+    card_matrix = get_card_matrix(card, frame, card_sampler)
+    cam_matrix = get_camera_projection_matrix(camera, frame, image_format, camera_sampler)
     if cam_matrix is None:
         raise RuntimeError("matrix_util.get_camera_projection() returned None for camera.")
     matrix_2d = cam_matrix * card_matrix
@@ -546,14 +1020,122 @@ def reconcile_card(card, camera, frame):
     return matrix_2d
 
 
-def set_value_on_tracker(tracker, point, point_index, frame, set_animated):
-    """ Set a value on a tracking point
+def reconcile_card_range(card, camera, first, last, card_sampler=None, camera_sampler=None):
+    """ Reconcile the matrices of a 3D card into 2D matrices for a whole frame range at once (requires numpy)
+
+    :param nuke.Node card: Card Node
+    :param nuke.Node camera: Camera Node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param KnobSampler card_sampler: Optional sampler of the card covering the frame range
+    :param KnobSampler camera_sampler: Optional sampler of the camera covering the frame range
+    :return: numpy array of shape (frames, 4, 4)
+    """
+    return get_matrices_in_range(card, first, last, camera, card_sampler, camera_sampler)
+
+
+def sample_node(node, first, last):
+    """ Make a KnobSampler with all the knobs required to calculate the matrix of a node already sampled
+
+    :param nuke.Node node: Transform, Tracker4, CornerPin2D, Card2, Card3D or Camera node
+    :param int first: First Frame
+    :param int last: Last Frame
+    :rtype: KnobSampler
+    """
+    node_class = 'Camera' if 'Camera' in node.Class() else node.Class()
+    if node_class not in MATRIX_KNOBS:
+        raise ValueError("Can not sample matrix knobs of %s nodes" % node.Class())
+    sampler = KnobSampler(node, first, last)
+    for knob_name in MATRIX_KNOBS[node_class]:
+        if node_class in ['Transform', 'Tracker4']:
+            sampler.sample_matrix(knob_name)
+        else:
+            sampler.sample(knob_name)
+    return sampler
+
+
+def is_node_animated(node):
+    """ Check if any knob of a node is animated or driven by an expression
+
+    :param nuke.Node node: Node to check
+    :rtype: bool
+    """
+    for knob in node.knobs().values():
+        is_animated = getattr(knob, 'isAnimated', None)
+        if is_animated is not None and is_animated():
+            return True
+    return False
+
+
+def get_merge_segments(transform_list, first, last):
+    """ Split a list of nodes to merge in segments, folding consecutive nodes without animation together
+
+    Each segment is a tuple (matrix, node, sampler): segments of nodes without animation only hold the
+    nuke.math.Matrix4 of all their nodes multiplied together, animated nodes hold their node and its KnobSampler.
+
+    :param list transform_list: List of Nodes to merge, first node first
+    :param int first: First Frame
+    :param int last: Last Frame
+    :rtype: list
+    """
+    segments = []
+    constant_matrix = None
+    for node in transform_list:
+        if is_node_animated(node):
+            if constant_matrix is not None:
+                segments.append((constant_matrix, None, None))
+                constant_matrix = None
+            segments.append((None, node, sample_node(node, first, last)))
+            continue
+        # The matrix is the same on every frame, it only needs to be read once
+        node_matrix = get_matrix_at_frame(node, first, sample_node(node, first, first))
+        constant_matrix = node_matrix if constant_matrix is None else node_matrix * constant_matrix
+    if constant_matrix is not None:
+        segments.append((constant_matrix, None, None))
+    return segments
+
+
+def merge_segment_matrices(segments, first, last):
+    """ Multiply the segments of a merge for the whole frame range at once (requires numpy)
+
+    :param list segments: Segments made by get_merge_segments
+    :param int first: First Frame
+    :param int last: Last Frame
+    :return: Merged matrices, one per frame
+    :rtype: numpy.ndarray
+    """
+    # Constant segments are broadcast over the frame range, so they only cost one multiplication each
+    merged_matrices = matrix_backend.identity(last - first + 1)
+    for matrix, node, sampler in segments:
+        if node is None:
+            segment_matrices = matrix_backend.from_matrix4_list([matrix])
+        else:
+            segment_matrices = get_matrices_in_range(node, first, last, sampler=sampler)
+        merged_matrices = matrix_backend.multiply(segment_matrices, merged_matrices)
+    return merged_matrices
+
+
+def merge_segments_at_frame(segments, frame):
+    """ Multiply the segments of a merge for a frame
+
+    :param list segments: Segments made by get_merge_segments
+    :param int frame: Frame
+    :rtype: nuke.math.Matrix4
+    """
+    current_matrix = None
+    for matrix, node, sampler in segments:
+        if node is not None:
+            matrix = get_matrix_at_frame(node, frame, sampler)
+        current_matrix = matrix if current_matrix is None else matrix * current_matrix
+    return current_matrix
+
+
+def get_tracker_point_index(tracker, point_index):
+    """ Get the index of a tracking point, adding a new tracking point if it doesn't exist yet
 
     :param nuke.Node tracker: Tracker4 node
-    :param nuke.math.Vector2 point: Point coordinates (as a vector2 or higher order)
-    :param int point_index: Index of the tracking point on which to set the value
-    :param int frame: frame number
-    :param bool set_animated: set a keyframe if True, just set the value on False
+    :param int point_index: Index of the tracking point wanted
+    :return: Index of the existing tracking point, or of the one that was added
     """
     tracker.showControlPanel()
     tracks = tracker['tracks']
@@ -566,6 +1148,84 @@ def set_value_on_tracker(tracker, point, point_index, frame, set_animated):
             count += 1
         tracker['add_track'].execute()
         point_index = count
+    return point_index
+
+
+def remove_redundant_keys(frames, values, tolerance=0.0):
+    """ Drop the keys lying on the linear interpolation of the keys around them.
+    A key is only dropped if every key dropped since the previous kept key stays within tolerance of the new segment.
+
+    :param list frames: Frame of each key, in increasing order
+    :param list values: Value of each key
+    :param float tolerance: Maximum distance between a dropped key and the interpolated curve
+    :return: tuple (frames, values) of the kept keys
+    """
+    frames = list(frames)
+    values = list(values)
+    if len(frames) < 3:
+        return frames, values
+
+    kept = [0]
+    # Range of slopes from the last kept key which keeps all the skipped keys within tolerance
+    min_slope = -float('inf')
+    max_slope = float('inf')
+    for index in range(1, len(frames) - 1):
+        anchor = kept[-1]
+        distance = float(frames[index] - frames[anchor])
+        min_slope = max(min_slope, (values[index] - tolerance - values[anchor]) / distance)
+        max_slope = min(max_slope, (values[index] + tolerance - values[anchor]) / distance)
+        next_slope = (values[index + 1] - values[anchor]) / float(frames[index + 1] - frames[anchor])
+        if not min_slope <= next_slope <= max_slope:
+            kept.append(index)
+            min_slope = -float('inf')
+            max_slope = float('inf')
+    kept.append(len(frames) - 1)
+    return [frames[index] for index in kept], [values[index] for index in kept]
+
+
+def set_knob_curves(knob, first, columns, tolerance=None, indices=None):
+    """ Write whole animation curves on an array knob, with one call per curve rather than one per key.
+    Existing keys in the frame range are replaced.
+
+    :param nuke.Array_Knob knob: Knob to animate
+    :param int first: Frame of the first value of each column
+    :param list columns: One sequence of consecutive per-frame values per curve
+    :param float tolerance: Skip keys within tolerance of the linear interpolation of their neighbours, the kept keys
+        are then given a linear interpolation. All keys are kept if None.
+    :param list indices: Knob index of each column, defaults to the order of the columns
+    """
+    if indices is None:
+        indices = range(len(columns))
+    for index, column in zip(indices, columns):
+        frames = range(first, first + len(column))
+        if tolerance is None:
+            key_frames, key_values = frames, column
+        else:
+            key_frames, key_values = remove_redundant_keys(frames, column, tolerance)
+        if not knob.isAnimated(index):
+            knob.setAnimated(index)
+        curve = knob.animation(index)
+        old_keys = [key for key in curve.keys() if frames[0] <= key.x <= frames[-1]]
+        if old_keys:
+            curve.removeKey(old_keys)
+        curve.addKey([nuke.AnimationKey(frame, float(value)) for frame, value in zip(key_frames, key_values)])
+        if tolerance is not None:
+            new_keys = [key for key in curve.keys() if frames[0] <= key.x <= frames[-1]]
+            curve.changeInterpolation(new_keys, nuke.LINEAR)
+
+
+def set_value_on_tracker(tracker, point, point_index, frame, set_animated):
+    """ Set a value on a tracking point
+
+    :param nuke.Node tracker: Tracker4 node
+    :param nuke.math.Vector2 point: Point coordinates (as a vector2 or higher order)
+    :param int point_index: Index of the tracking point on which to set the value
+    :param int frame: frame number
+    :param bool set_animated: set a keyframe if True, just set the value on False
+    """
+    tracks = tracker['tracks']
+    columns = 31
+    point_index = get_tracker_point_index(tracker, point_index)
 
     x_knob_index = point_index * columns + 2
     y_knob_index = point_index * columns + 3
@@ -579,31 +1239,43 @@ def set_value_on_tracker(tracker, point, point_index, frame, set_animated):
 
 
 def sort_nodes(node_list):
-    """ Sort nodes in tree order """
-    # Sorts selected nodes by number of parents of an allowed class
-    nodes_in_list = 0
-    sorted_list = []
-    for node in node_list:
-        has_parents = True
-        number_of_nodes = 1
-        list_of_nodes = [node]
-        # we count how many parents the node has
-        while has_parents:
-            parent = node.input(0)
-            if parent:
-                if parent['selected'].value():
-                    node = parent
-                    number_of_nodes += 1
-                    list_of_nodes.append(node)
-                else:
-                    has_parents = False
-            else:
-                has_parents = False
+    """ Sort nodes in tree order
 
-                # the node with the biggest number of parents is our last node
-        if number_of_nodes > nodes_in_list:
-            nodes_in_list = number_of_nodes
-            sorted_list = list_of_nodes
+    Returns the longest branch of nodes from the list connected through their first input, first node first.
+    Each node is visited once, the depth of its parents being remembered.
+    """
+    nodes_by_name = dict((node.fullName(), node) for node in node_list)
+    # Parent of each node, when the parent is in the list too
+    parents = {}
+    for name, node in nodes_by_name.items():
+        parent = node.input(0)
+        if parent is not None and parent.fullName() in nodes_by_name:
+            parents[name] = parent.fullName()
+
+    # Number of nodes of the branch ending on each node
+    depths = {}
+    for name in nodes_by_name:
+        branch = []
+        while name not in depths:
+            branch.append(name)
+            if name not in parents:
+                depths[name] = 0
+                break
+            name = parents[name]
+        depth = depths[name]
+        for branch_name in reversed(branch):
+            depth += 1
+            depths[branch_name] = depth
+
+    if not depths:
+        return []
+
+    # the node with the biggest number of parents is our last node
+    name = max(depths, key=depths.get)
+    sorted_list = [nodes_by_name[name]]
+    while name in parents:
+        name = parents[name]
+        sorted_list.append(nodes_by_name[name])
 
     # We want our first node first though, so we reverse the list
     sorted_list.reverse()
@@ -611,7 +1283,88 @@ def sort_nodes(node_list):
 
 
 # Defining core functions
-def merge_transforms(transform_list, first, last, cornerpin=False, force_matrix=False):
+def create_baked_node(old_node, new_class, image_format, reference_frame=None):
+    """ Create the node receiving the baked matrices of another node
+
+    :param nuke.Node old_node: Original Node the matrices are extracted from
+    :param str new_class: Name of the new class of node to create
+    :param image_format: Format of the original node
+    :param int reference_frame: Reference frame of the conversion, if any
+    :rtype: nuke.Node
+    """
+    new_node = nuke.createNode(new_class, inpanel=False)
+    new_node.setInput(0, old_node.input(0))
+    new_node.setXpos(old_node.xpos() + 100)
+    new_node.setYpos(old_node.ypos())
+    label_string = "Baked Matrix from {}".format(old_node.name())
+    if reference_frame is not None:
+        label_string += "\nReference Frame {}".format(reference_frame)
+    new_node['label'].setValue(label_string)
+    if new_class == "Transform":
+        new_node['center'].setValue(image_format.width() / 2, 0)
+        new_node['center'].setValue(image_format.height() / 2, 1)
+    return new_node
+
+
+def make_conversion_job(old_node, first, last, camera=None, reference_frame=None, invert=False):
+    """ Sample all the knob values required to convert the matrices of a node (requires numpy).
+    The job is solved by matrix_backend.solve_conversion_job(), which doesn't need nuke.
+
+    :param nuke.Node old_node: Original Node to extract the matrix from
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param nuke.Node camera: Camera Node, only used when converting a card
+    :param int reference_frame: Set frame as reference frame (makes the resulting matrix identity at that frame)
+    :param bool invert: Invert the matrix
+    :return: dict
+    """
+    try:
+        image_format = old_node.input(0).format()
+    except AttributeError:
+        image_format = nuke.root()['format'].value()
+
+    # Read the knobs of the nodes once, for the whole range including the reference frame
+    sample_first = first if reference_frame is None else min(first, reference_frame)
+    sample_last = last if reference_frame is None else max(last, reference_frame)
+    sampler = sample_node(old_node, sample_first, sample_last)
+    camera_sampler = None
+    if old_node.Class() in ['Card2', 'Card3D'] and camera is not None:
+        camera_sampler = sample_node(camera, sample_first, sample_last)
+
+    reference = None
+    if reference_frame is not None:
+        reference = make_matrix_job(old_node, reference_frame, reference_frame, camera, sampler, camera_sampler)
+    return {
+        'source': make_matrix_job(old_node, first, last, camera, sampler, camera_sampler),
+        'reference': reference,
+        'invert': invert,
+        'width': image_format.width(),
+        'height': image_format.height(),
+    }
+
+
+def set_baked_values(wrapped_node, matrices, corners, first, raw_matrix=False, tolerance=None):
+    """ Set the results of a conversion on a node (requires numpy)
+
+    :param NodeMatrixWrapper wrapped_node: The node receiving the values
+    :param matrices: numpy array of shape (frames, 4, 4)
+    :param corners: numpy array of shape (frames, 4, 2)
+    :param int first: First Frame
+    :param bool raw_matrix: For nodes that can have either corners or a matrix set, set True to force matrix
+    :param float tolerance: Skip keys within tolerance of the linear interpolation of their neighbours
+    """
+    if len(matrices) == 1:
+        if raw_matrix:
+            wrapped_node.set_matrix_at(matrix_backend.to_matrix4(matrices[0]), first, False)
+        else:
+            wrapped_node.set_points_at(matrix_backend.to_vector2_list(corners[0]), first, False)
+    elif raw_matrix:
+        wrapped_node.set_matrices(matrices, first, tolerance)
+    else:
+        wrapped_node.set_points(corners, first, tolerance)
+
+
+def merge_transforms(transform_list, first, last, cornerpin=False, force_matrix=False, tolerance=None):
     """ Merge multiple nodes with a 2D matrix together
 
     :param list transform_list: List of Nodes to merge
@@ -619,6 +1372,7 @@ def merge_transforms(transform_list, first, last, cornerpin=False, force_matrix=
     :param int last: Last Frame
     :param bool cornerpin: Makes a CornerPin if True, else tries to make a Transform
     :param bool force_matrix: In case of Cornerpin, use the extra matrix instead of corners
+    :param float tolerance: Skip keys within tolerance of the linear interpolation of their neighbours (requires numpy)
     """
     # Set Threading
     task = nuke.ProgressTask("Merging Transforms")
@@ -649,19 +1403,41 @@ def merge_transforms(transform_list, first, last, cornerpin=False, force_matrix=
 
     animated = first != last
 
+    task.setMessage("Sampling transforms")
+    # Read the knobs of every animated node once for the whole range, nodes without animation are folded together
+    segments = get_merge_segments(transform_list, first, last)
+
     task.setMessage("Merging transforms")
 
+    if matrix_backend:
+        # Calculate the whole frame range at once, then only set the values frame by frame
+        merged_matrices = merge_segment_matrices(segments, first, last)
+        merged_corners = matrix_backend.matrices_to_corners(merged_matrices, width, height)
+        task.setMessage("Setting keys")
+        try:
+            if task.isCancelled():
+                return
+            if not animated:
+                if force_matrix or not cornerpin:
+                    wrapped_node.set_matrix_at(matrix_backend.to_matrix4(merged_matrices[0]), first, animated)
+                else:
+                    points = matrix_backend.to_vector2_list(merged_corners[0])
+                    wrapped_node.set_points_at(points, first, animated)
+            elif force_matrix or not cornerpin:
+                wrapped_node.set_matrices(merged_matrices, first, tolerance)
+            else:
+                wrapped_node.set_points(merged_corners, first, tolerance)
+        finally:
+            task.setProgress(100)
+            del task
+        return
+
     # We need the calculation for each frame
     try:
         for frame in range(first, last + 1):
             if task.isCancelled():
                 break
-            current_matrix = get_matrix_at_frame(transform_list[0], frame)
-            # We merge the nodes 2 by two
-            for index in range(1, len(transform_list)):
-                # Access the matrix knobs of the next transformation
-                transform_matrix = get_matrix_at_frame(transform_list[index], frame)
-                current_matrix = transform_matrix * current_matrix
+            current_matrix = merge_segments_at_frame(segments, frame)
 
             if force_matrix or not cornerpin:
                 wrapped_node.set_matrix_at(current_matrix, frame, animated)
@@ -677,7 +1453,7 @@ def merge_transforms(transform_list, first, last, cornerpin=False, force_matrix=
 
 
 def do_matrix_conversion(old_node, new_class, first, last,
-                         raw_matrix=False, camera=None, reference_frame=None, invert=False):
+                         raw_matrix=False, camera=None, reference_frame=None, invert=False, tolerance=None):
     """ Create a new node with a matrix from another node, for multiple frames.
 
     :param nuke.Node old_node: Original Node to extract the matrix from
@@ -688,6 +1464,7 @@ def do_matrix_conversion(old_node, new_class, first, last,
     :param nuke.Node camera: Camera Node, only used when converting a card
     :param int reference_frame: Set frame as reference frame (makes the resulting matrix identity at that frame)
     :param bool invert: Invert the matrix
+    :param float tolerance: Skip keys within tolerance of the linear interpolation of their neighbours (requires numpy)
     """
     # Set Threading
     task = nuke.ProgressTask("Converting Matrix")
@@ -703,29 +1480,44 @@ def do_matrix_conversion(old_node, new_class, first, last,
         image_format = nuke.root()['format'].value()
 
     # Create the node to receive the baked transformations
-    new_node = nuke.createNode(new_class, inpanel=False)
-    new_node.setInput(0, old_node.input(0))
-    new_node.setXpos(old_node.xpos() + 100)
-    new_node.setYpos(old_node.ypos())
-    label_string = "Baked Matrix from {}".format(old_node.name())
-    if reference_frame is not None:
-        label_string += "\nReference Frame {}".format(reference_frame)
-    new_node['label'].setValue(label_string)
-    if new_class == "Transform":
-        new_node['center'].setValue(image_format.width() / 2, 0)
-        new_node['center'].setValue(image_format.height() / 2, 1)
+    new_node = create_baked_node(old_node, new_class, image_format, reference_frame)
 
     wrapped_node = NodeMatrixWrapper(new_node)
 
     animated = first != last
 
+    task.setMessage("Sampling Knobs")
+
+    if matrix_backend:
+        # Calculate the whole frame range at once, then set the keys of each curve in one go
+        job = make_conversion_job(old_node, first, last, camera, reference_frame, invert)
+        task.setMessage("Baking Matrix")
+        matrices, corners = matrix_backend.solve_conversion_job(job)
+        task.setMessage("Setting keys")
+        try:
+            if not task.isCancelled():
+                set_baked_values(wrapped_node, matrices, corners, first, raw_matrix, tolerance)
+        finally:
+            task.setProgress(100)
+            del task
+        return
+
+    # Read the knobs of the nodes once, for the whole range including the reference frame
+    sample_first = first if reference_frame is None else min(first, reference_frame)
+    sample_last = last if reference_frame is None else max(last, reference_frame)
+    sampler = sample_node(old_node, sample_first, sample_last)
+    camera_sampler = None
+    if old_node.Class() in ['Card2', 'Card3D'] and camera is not None:
+        camera_sampler = sample_node(camera, sample_first, sample_last)
+
     task.setMessage("Baking Matrix")
+
     ref_matrix = None
     if reference_frame is not None:
         if old_node.Class() in ['Transform', 'CornerPin2D', 'Tracker4']:
-            ref_matrix = get_matrix_at_frame(old_node, reference_frame)
+            ref_matrix = get_matrix_at_frame(old_node, reference_frame, sampler)
         elif old_node.Class() in ['Card2', 'Card3D']:
-            ref_matrix = reconcile_card(old_node, camera, reference_frame)
+            ref_matrix = reconcile_card(old_node, camera, reference_frame, sampler, camera_sampler)
 
     # We need the calculation for each frame
     try:
@@ -736,9 +1528,9 @@ def do_matrix_conversion(old_node, new_class, first, last,
             current_matrix = None
 
             if old_node.Class() in ['Transform', 'CornerPin2D', 'Tracker4']:
-                current_matrix = get_matrix_at_frame(old_node, frame)
+                current_matrix = get_matrix_at_frame(old_node, frame, sampler)
             elif old_node.Class() in ['Card2', 'Card3D']:
-                current_matrix = reconcile_card(old_node, camera, frame)
+                current_matrix = reconcile_card(old_node, camera, frame, sampler, camera_sampler)
 
             if not current_matrix:
                 raise RuntimeError("Something went wrong, could not calculate matrix")
@@ -762,6 +1554,71 @@ def do_matrix_conversion(old_node, new_class, first, last,
         del task
 
 
+def do_batch_matrix_conversion(old_nodes, new_class, first, last,
+                               raw_matrix=False, camera=None, reference_frame=None, invert=False, tolerance=None):
+    """ Create new nodes with the matrices of several other nodes, for multiple frames.
+    The knobs are sampled here, but the matrices are solved in parallel in worker processes (requires numpy).
+
+    :param list old_nodes: Original Nodes to extract the matrices from
+    :param str new_class: Name of the new class of node to create
+    :param int first: First Frame
+    :param int last: Last Frame
+    :param bool raw_matrix: For nodes that can have either corners or a matrix set, set True to force matrix
+    :param nuke.Node camera: Camera Node, only used when converting cards
+    :param int reference_frame: Set frame as reference frame (makes the resulting matrix identity at that frame)
+    :param bool invert: Invert the matrix
+    :param float tolerance: Skip keys within tolerance of the linear interpolation of their neighbours
+    """
+    if not matrix_backend:
+        for old_node in old_nodes:
+            do_matrix_conversion(old_node, new_class, first, last, raw_matrix, camera, reference_frame, invert)
+        return
+
+    task = nuke.ProgressTask("Converting Matrices")
+    try:
+        # Sampling has to happen here, nuke isn't available in worker processes
+        jobs = []
+        for index, old_node in enumerate(old_nodes):
+            if task.isCancelled():
+                return
+            task.setMessage("Sampling {}".format(old_node.name()))
+            jobs.append(make_conversion_job(old_node, first, last, camera, reference_frame, invert))
+            task.setProgress(int(30.0 * (index + 1) / len(old_nodes)))
+
+        task.setMessage("Solving {} matrices".format(len(jobs)))
+
+        # task is bound as a default, so it can still be deleted below
+        def report_progress(solved, task=task):
+            task.setProgress(30 + int(40.0 * solved / len(jobs)))
+
+        def report_error(error, task=task):
+            task.setMessage("Could not solve matrices in worker processes ({}), solving them here".format(error))
+
+        python_executable = get_python_executable()
+        results = matrix_backend.solve_conversion_jobs(jobs, python_executable, callback=report_progress,
+                                                       processes=python_executable is not None,
+                                                       error_callback=report_error)
+
+        # Deselect Nodes
+        for node in nuke.selectedNodes():
+            node.setSelected(False)
+
+        for index, (old_node, (matrices, corners)) in enumerate(zip(old_nodes, results)):
+            if task.isCancelled():
+                return
+            task.setMessage("Setting keys on {}".format(old_node.name()))
+            try:
+                image_format = old_node.input(0).format()
+            except AttributeError:
+                image_format = nuke.root()['format'].value()
+            new_node = create_baked_node(old_node, new_class, image_format, reference_frame)
+            set_baked_values(NodeMatrixWrapper(new_node), matrices, corners, first, raw_matrix, tolerance)
+            task.setProgress(70 + int(30.0 * (index + 1) / len(old_nodes)))
+    finally:
+        task.setProgress(100)
+        del task
+
+
 # Defining runner functions
 def run_merge_transforms():
     """ Show the merge transforms panel and starts the merge process"""
@@ -785,7 +1642,9 @@ def run_merge_transforms():
         last = panel.last.value()
         cornerpin = panel.force_cp.value()
         force_matrix = panel.force_matrix.value()
-        exec_thread = threading.Thread(None, merge_transforms(transform_list, first, last, cornerpin, force_matrix))
+        tolerance = get_panel_tolerance(panel)
+        exec_thread = threading.Thread(None, merge_transforms(transform_list, first, last, cornerpin, force_matrix,
+                                                              tolerance))
         exec_thread.start()
 
 
@@ -800,31 +1659,39 @@ def run_convert_matrix():
         if not node:
             raise ValueError("No node to convert")
         camera = nuke.toNode(panel.camera.value())
-        target = panel.destination.value()
-        matrix = True
-        if target == 'Roto':
-            new_class = 'Roto'
-        elif target == 'RotoPaint':
-            new_class = 'RotoPaint'
-        elif target == 'CornerPin':
-            new_class = 'CornerPin2D'
-            matrix = False
-        elif target == 'CornerPin (Matrix only)':
-            new_class = 'CornerPin2D'
-        elif target == 'Transform (No Perspective)':
-            new_class = 'Transform'
-        elif target == 'Tracker':
-            new_class = 'Tracker4'
-        elif target == 'SplineWarp':
-            new_class = 'SplineWarp3'
-        else:
-            raise ValueError('Unknown Conversion Target')
+        new_class, matrix = get_conversion_class(panel.destination.value())
         invert = panel.invert.value()
         # Force a reference number
         ref = None
         if panel.force_ref.value():
             ref = panel.reference.value()
 
+        tolerance = get_panel_tolerance(panel)
         exec_thread = threading.Thread(None, do_matrix_conversion(node, new_class, first, last,
-                                                                  matrix, camera, ref, invert))
+                                                                  matrix, camera, ref, invert, tolerance))
         exec_thread.start()
+
+
+def run_batch_convert_matrix():
+    """ Show the convert matrix panel for all the selected nodes and starts the conversion process"""
+    nodes = nuke.selectedNodes()
+    if not nodes:
+        nuke.message("Please select the nodes to convert")
+        return
+    if not check_classes(nodes, ['Transform', 'CornerPin2D', 'Tracker4', 'Card2', 'Card3D']):
+        return
+    # Display panel
+    panel = MatrixConversionPanel(nodes)
+    if panel.showModalDialog():
+        first = panel.first.value()
+        last = panel.last.value()
+        camera = nuke.toNode(panel.camera.value())
+        new_class, matrix = get_conversion_class(panel.destination.value())
+        invert = panel.invert.value()
+        # Force a reference number
+        ref = None
+        if panel.force_ref.value():
+            ref = panel.reference.value()
+
+        tolerance = get_panel_tolerance(panel)
+        do_batch_matrix_conversion(nodes, new_class, first, last, matrix, camera, ref, invert, tolerance)
@@ -96,4 +96,5 @@ populate_menu_recursive(nuke_dir, toolbar_math_tools)
 target_menu = nuke.menu('Nuke')
 transform_menu = target_menu.addMenu("Transform Utils", icon="transforms.png")
 transform_menu.addCommand("Convert Node Matrix", matrix_utils.run_convert_matrix)
+transform_menu.addCommand("Convert Selected Node Matrices", matrix_utils.run_batch_convert_matrix)
 transform_menu.addCommand("Merge Transforms", matrix_utils.run_merge_transforms)
\ No newline at end of file
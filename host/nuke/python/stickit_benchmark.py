@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the StickIt solver, replaying tracker data recorded in nuke.
+
+Record the features of a StickIt node from the script editor, the node being selected:
+    import stickit_nuke
+    stickit_nuke.RecordTrackerData('/tmp/shot.stickit')
+then time the solver outside of nuke:
+    python stickit_benchmark.py /tmp/shot.stickit
+Without a recording, a synthetic track is solved. Times are reported per solved frame.
+"""
+
+import argparse
+import time
+
+import numpy
+
+import stickit_solver
+
+# Methods timed, with the arguments of their solve
+METHODS = (
+    ('local', stickit_solver.LOCAL, None),
+    ('median', stickit_solver.MEDIAN, None),
+    ('average', stickit_solver.AVERAGE, None),
+    ('ransac similarity', stickit_solver.RANSAC, stickit_solver.SIMILARITY),
+    ('ransac affine', stickit_solver.RANSAC, stickit_solver.AFFINE),
+    ('ransac homography', stickit_solver.RANSAC, stickit_solver.HOMOGRAPHY),
+)
+
+
+def synthetic_track(features=2000, frames=200, seed=0):
+    """Make features drifting, rotating and scaling over a frame, a fifth of them moving randomly
+    :param int features: number of features
+    :param int frames: number of frames, each feature being tracked on all of them
+    :param int seed: seed of the random positions
+    :rtype: stickit_solver.CameraTrack
+    """
+    random = numpy.random.RandomState(seed)
+    start = random.uniform(0, 2000, (features, 2))
+    frame = numpy.arange(frames)
+    angle = 0.002 * frame
+    scale = 1.0 + 0.001 * frame
+    cos = (scale * numpy.cos(angle))[:, None]
+    sin = (scale * numpy.sin(angle))[:, None]
+    x = cos * start[:, 0] - sin * start[:, 1] + 3.0 * frame[:, None]
+    y = sin * start[:, 0] + cos * start[:, 1] - 2.0 * frame[:, None]
+    outliers = random.random_sample(features) < 0.2
+    x[:, outliers] += numpy.cumsum(random.normal(0, 5, (frames, outliers.sum())), axis=0)
+    y[:, outliers] += numpy.cumsum(random.normal(0, 5, (frames, outliers.sum())), axis=0)
+    # Rows are sorted by feature, then frame, like a parsed CameraTracker
+    track = numpy.repeat(numpy.arange(features), frames)
+    return stickit_solver.CameraTrack(track, numpy.tile(frame, features), x.T.ravel(), y.T.ravel())
+
+
+def default_targets(camera_track, ref_frame):
+    """Get 4 corners around the middle of the features of a frame, like a CornerPin being assisted
+    :rtype: numpy.ndarray
+    """
+    on_frame = camera_track.frame == ref_frame
+    x = camera_track.x[on_frame]
+    y = camera_track.y[on_frame]
+    low_x, high_x = numpy.percentile(x, [25, 75]) if len(x) else (0.0, 1.0)
+    low_y, high_y = numpy.percentile(y, [25, 75]) if len(y) else (0.0, 1.0)
+    return numpy.array([[low_x, low_y], [high_x, low_y], [high_x, high_y], [low_x, high_y]])
+
+
+def best_time(function, repeat, *args, **kwargs):
+    """Call a function several times
+    :returns: the shortest time in seconds
+    :rtype: float
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        function(*args, **kwargs)
+        times.append(time.time() - start)
+    return min(times)
+
+
+def run(camera_track, ref_frame=None, k=stickit_solver.DEFAULT_K, repeat=3, text=None):
+    """Time the parsing and the solve of every method over the whole track
+    :param camera_track: the features
+    :type camera_track: stickit_solver.CameraTrack
+    :param int ref_frame: the reference frame, the middle of the track if None
+    :param int k: number of nearest points of the local method
+    :param int repeat: number of runs of each step, the fastest one is kept
+    :param str text: the recorded serializeKnob, to time its parsing too
+    :returns: name, seconds and number of frames of each step
+    :rtype: list
+    """
+    first = int(camera_track.frame.min())
+    last = int(camera_track.frame.max())
+    if ref_frame is None:
+        ref_frame = (first + last) // 2
+    targets = default_targets(camera_track, ref_frame)
+    frame_count = max(1, last - first)
+
+    results = []
+    if text is not None:
+        results.append(('parse', best_time(stickit_solver.parse_camera_track, repeat, text), frame_count))
+    results.append(('index', best_time(stickit_solver.TrackStore, repeat, camera_track), frame_count))
+    store = camera_track.store()
+    for name, method, model in METHODS:
+        if method == stickit_solver.RANSAC:
+            seconds = best_time(
+                stickit_solver.solve_range_robust, repeat, store, targets, ref_frame, first, last, model=model)
+        else:
+            # The global motion is cached by the store, time it from scratch like a first solve
+            def solve():
+                store._frame_motion.clear()
+                stickit_solver.solve_range(store, method, targets, ref_frame, first, last, k)
+            seconds = best_time(solve, repeat)
+        results.append((name, seconds, frame_count))
+    return results
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('recording', nargs='?', help='serializeKnob saved by stickit_nuke.RecordTrackerData')
+    parser.add_argument('--features', type=int, default=2000, help='features of the synthetic track')
+    parser.add_argument('--frames', type=int, default=200, help='frames of the synthetic track')
+    parser.add_argument('--ref-frame', type=int, help='reference frame, the middle of the track by default')
+    parser.add_argument('-k', type=int, default=stickit_solver.DEFAULT_K, help='nearest points of the local method')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each step, the fastest is reported')
+    options = parser.parse_args(arguments)
+
+    text = None
+    if options.recording:
+        with open(options.recording) as recording:
+            text = recording.read()
+        camera_track = stickit_solver.parse_camera_track(text)
+    else:
+        camera_track = synthetic_track(options.features, options.frames)
+    if not len(camera_track.frame):
+        print('No features to solve')
+        return
+    print('%d features, frames %d to %d' % (len(camera_track), camera_track.frame.min(), camera_track.frame.max()))
+    for name, seconds, frame_count in run(camera_track, options.ref_frame, options.k, options.repeat, text):
+        print('%-20s %10.2f ms %10.3f ms/frame' % (name, seconds * 1000, seconds * 1000 / frame_count))
+
+
+if __name__ == '__main__':
+    main()
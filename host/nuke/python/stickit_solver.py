@@ -0,0 +1,811 @@
+# -*- coding: utf-8 -*-
+
+"""
+Solving core of StickIt, used by stickit_nuke.py for the gizmos of tools/StickIt and of the Nuke Survival Toolkit.
+
+This module doesn't use nuke, it works on arrays of point positions so it can be used and timed outside of nuke.
+CameraTracker features are parsed from the text of their serializeKnob into columns of NumPy arrays.
+Nearest points are found with scipy's cKDTree when scipy is available, and with a brute force NumPy search otherwise.
+The RANSAC method fits a motion model to the neighbourhood of the solved points on every frame, ignoring the
+features that don't agree with it. It can run in a separate python process with SolveWorker, this module being its
+command line: python stickit_solver.py input.npz output.npz
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+
+import numpy
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Number of nearest points moving each solved point
+DEFAULT_K = 3
+# Maximum number of distances computed at once by the NumPy search
+CHUNK_SIZE = 1 << 20
+
+# Solve methods, like the AssistType knob of StickIt
+LOCAL = 0
+MEDIAN = 1
+AVERAGE = 2
+RANSAC = 3
+
+# Motion models of the RANSAC method, and the number of point pairs defining each of them
+SIMILARITY = 0
+AFFINE = 1
+HOMOGRAPHY = 2
+MODEL_SAMPLE_SIZES = {SIMILARITY: 2, AFFINE: 3, HOMOGRAPHY: 4}
+# Defaults of the RANSAC method: features around each solved point, inlier distance in pixels, models tried per frame
+RANSAC_NEIGHBOURS = 30
+RANSAC_THRESHOLD = 2.0
+RANSAC_HYPOTHESES = 256
+
+
+class NearestPoints(object):
+    """k-nearest queries over the points of a frame"""
+
+    def __init__(self, points):
+        """
+        :param points: the x, y positions of the points
+        :type points: numpy.ndarray or list
+        """
+        self.points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+        self._tree = None
+        if cKDTree is not None and len(self.points):
+            self._tree = cKDTree(self.points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, targets, k=DEFAULT_K):
+        """Find the k nearest points of each target, all in one go
+        :param targets: the x, y positions to look around
+        :type targets: numpy.ndarray or list
+        :param int k: number of points to find, at most the number of points
+        :returns: distances and indices of the nearest points, both of shape (targets, k), closest first
+        :rtype: tuple
+        """
+        targets = numpy.asarray(targets, dtype=float).reshape(-1, 2)
+        k = min(k, len(self.points))
+        if k < 1 or not len(targets):
+            return numpy.zeros((len(targets), 0)), numpy.zeros((len(targets), 0), dtype=int)
+        if self._tree is not None:
+            distances, indices = self._tree.query(targets, k=k)
+            return distances.reshape(-1, k), indices.reshape(-1, k)
+
+        distances = numpy.empty((len(targets), k))
+        indices = numpy.empty((len(targets), k), dtype=int)
+        step = max(1, CHUNK_SIZE // len(self.points))
+        for start in range(0, len(targets), step):
+            chunk = targets[start:start + step]
+            delta = chunk[:, None, :] - self.points[None, :, :]
+            squared = numpy.einsum('ijk,ijk->ij', delta, delta)
+            if k < len(self.points):
+                nearest = numpy.argpartition(squared, k - 1, axis=1)[:, :k]
+            else:
+                nearest = numpy.tile(numpy.arange(len(self.points)), (len(chunk), 1))
+            nearest_squared = numpy.take_along_axis(squared, nearest, axis=1)
+            order = numpy.argsort(nearest_squared, axis=1)
+            indices[start:start + step] = numpy.take_along_axis(nearest, order, axis=1)
+            distances[start:start + step] = numpy.sqrt(numpy.take_along_axis(nearest_squared, order, axis=1))
+        return distances, indices
+
+
+def inverse_distance_weights(distances):
+    """Weight the nearest points of each target by their inverse distance, like StickIt always did
+    Distances are offset by one so a point right on the target gets a weight of 1, and then moves it alone.
+    :param numpy.ndarray distances: distances of shape (targets, k), closest first
+    :returns: weights of the same shape, summing to 1 for each target
+    :rtype: numpy.ndarray
+    """
+    weights = 1.0 / (numpy.asarray(distances, dtype=float) + 1.0)
+    if weights.shape[1] > 1:
+        weights[weights[:, 0] == 1.0, 1:] = 0.0
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def interpolate_offsets(start_points, end_points, targets, k=DEFAULT_K, nearest=None):
+    """Move targets with the weighted motion of their k nearest points
+    :param start_points: the x, y positions of the points, where the targets are searched
+    :type start_points: numpy.ndarray or list
+    :param end_points: the x, y positions the same points move to
+    :type end_points: numpy.ndarray or list
+    :param targets: the x, y positions to move
+    :type targets: numpy.ndarray or list
+    :param int k: number of nearest points moving each target
+    :param nearest: an index of start_points to reuse, built if None
+    :type nearest: NearestPoints
+    :returns: x, y offsets of shape (targets, 2), zero when there are less than k points
+    :rtype: numpy.ndarray
+    """
+    targets = numpy.asarray(targets, dtype=float).reshape(-1, 2)
+    start_points = numpy.asarray(start_points, dtype=float).reshape(-1, 2)
+    if k < 1 or len(start_points) < k:
+        return numpy.zeros_like(targets)
+    if nearest is None:
+        nearest = NearestPoints(start_points)
+    distances, indices = nearest.query(targets, k)
+    motion = numpy.asarray(end_points, dtype=float).reshape(-1, 2) - start_points
+    weights = inverse_distance_weights(distances)
+    return numpy.einsum('ij,ijk->ik', weights, motion[indices])
+
+
+def position_deltas(method, start_points, end_points, targets, k=DEFAULT_K):
+    """Get the motion of targets between two frames
+    :param int method: LOCAL to follow the nearest points of each target, MEDIAN or AVERAGE to follow all the points
+    :param start_points: the x, y positions of the points on the frame of the targets
+    :type start_points: numpy.ndarray or list
+    :param end_points: the x, y positions of the same points on the next frame
+    :type end_points: numpy.ndarray or list
+    :param targets: the x, y positions to move
+    :type targets: numpy.ndarray or list
+    :param int k: number of nearest points moving each target, for the LOCAL method
+    :returns: x, y offsets of shape (targets, 2)
+    :rtype: numpy.ndarray
+    """
+    targets = numpy.asarray(targets, dtype=float).reshape(-1, 2)
+    if method == LOCAL:
+        return interpolate_offsets(start_points, end_points, targets, k)
+    motion = (
+        numpy.asarray(end_points, dtype=float).reshape(-1, 2) -
+        numpy.asarray(start_points, dtype=float).reshape(-1, 2))
+    if method == MEDIAN:
+        delta = numpy.median(motion, axis=0) if len(motion) else numpy.zeros(2)
+    else:
+        delta = motion.sum(axis=0) / (len(motion) + 0.00001)
+    return numpy.tile(delta, (len(targets), 1))
+
+
+def _normalization(points):
+    """Get the matrix centering points on the origin at an average distance of sqrt(2), to fit models accurately
+    :param numpy.ndarray points: x, y positions of shape (points, 2)
+    :rtype: numpy.ndarray
+    """
+    center = points.mean(axis=0)
+    distance = numpy.sqrt(((points - center) ** 2).sum(axis=1)).mean()
+    scale = numpy.sqrt(2.0) / distance if distance > 0 else 1.0
+    return numpy.array([
+        [scale, 0.0, -scale * center[0]],
+        [0.0, scale, -scale * center[1]],
+        [0.0, 0.0, 1.0]])
+
+
+def transform_points(matrices, points):
+    """Apply 3x3 transformation matrices to points
+    :param numpy.ndarray matrices: a matrix, or matrices of shape (..., 3, 3)
+    :param points: the x, y positions of the points
+    :type points: numpy.ndarray or list
+    :returns: the transformed points, of shape (..., points, 2), inf where a homography sends them to infinity
+    :rtype: numpy.ndarray
+    """
+    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+    matrices = numpy.asarray(matrices, dtype=float)
+    x = points[:, 0]
+    y = points[:, 1]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        w = matrices[..., 2, 0, None] * x + matrices[..., 2, 1, None] * y + matrices[..., 2, 2, None]
+        transformed = numpy.stack([
+            (matrices[..., 0, 0, None] * x + matrices[..., 0, 1, None] * y + matrices[..., 0, 2, None]) / w,
+            (matrices[..., 1, 0, None] * x + matrices[..., 1, 1, None] * y + matrices[..., 1, 2, None]) / w],
+            axis=-1)
+    transformed[~numpy.isfinite(transformed)] = numpy.inf
+    return transformed
+
+
+def fit_models(start_points, end_points, model=SIMILARITY):
+    """Fit motion models to point pairs with least squares, for many sets of pairs at once
+    :param numpy.ndarray start_points: x, y positions of shape (..., points, 2)
+    :param numpy.ndarray end_points: the positions the same points move to
+    :param int model: SIMILARITY, AFFINE or HOMOGRAPHY
+    :returns: the matrices of the models, of shape (..., 3, 3)
+    :rtype: numpy.ndarray
+    """
+    x = start_points[..., 0]
+    y = start_points[..., 1]
+    u = end_points[..., 0]
+    v = end_points[..., 1]
+    zero = numpy.zeros_like(x)
+    one = numpy.ones_like(x)
+    # Each pair gives a row for its x and a row for its y, the parameters being the unknowns
+    if model == SIMILARITY:
+        rows_x = [x, -y, one, zero]
+        rows_y = [y, x, zero, one]
+    elif model == AFFINE:
+        rows_x = [x, y, one, zero, zero, zero]
+        rows_y = [zero, zero, zero, x, y, one]
+    else:
+        rows_x = [x, y, one, zero, zero, zero, -x * u, -y * u]
+        rows_y = [zero, zero, zero, x, y, one, -x * v, -y * v]
+    design = numpy.concatenate([numpy.stack(rows_x, axis=-1), numpy.stack(rows_y, axis=-1)], axis=-2)
+    values = numpy.concatenate([u, v], axis=-1)[..., None]
+    parameters = numpy.matmul(numpy.linalg.pinv(design), values)[..., 0]
+
+    matrices = numpy.zeros(parameters.shape[:-1] + (3, 3))
+    if model == SIMILARITY:
+        matrices[..., 0, 0] = matrices[..., 1, 1] = parameters[..., 0]
+        matrices[..., 0, 1] = -parameters[..., 1]
+        matrices[..., 1, 0] = parameters[..., 1]
+        matrices[..., 0, 2] = parameters[..., 2]
+        matrices[..., 1, 2] = parameters[..., 3]
+        matrices[..., 2, 2] = 1.0
+    else:
+        matrices.reshape(parameters.shape[:-1] + (9,))[..., :parameters.shape[-1]] = parameters
+        matrices[..., 2, 2] = 1.0
+    return matrices
+
+
+def ransac_transform(start_points, end_points, model=SIMILARITY, threshold=RANSAC_THRESHOLD,
+                     hypotheses=RANSAC_HYPOTHESES, random=None):
+    """Fit a motion model to point pairs, ignoring the pairs that don't follow the others
+
+    Models are fitted to random minimal samples of the pairs, all at once. The one with the lowest truncated error
+    (MSAC) wins, and is fitted again to all its inliers.
+    :param start_points: the x, y positions of the points
+    :type start_points: numpy.ndarray or list
+    :param end_points: the x, y positions the same points move to
+    :type end_points: numpy.ndarray or list
+    :param int model: SIMILARITY, AFFINE or HOMOGRAPHY
+    :param float threshold: distance in pixels under which a pair follows a model
+    :param int hypotheses: number of models tried
+    :param random: random generator, to get the same results from the same points
+    :type random: numpy.random.RandomState
+    :returns: the 3x3 matrix of the model, identity if there are not enough pairs, and the confidence of the fit,
+        the ratio of pairs following it
+    :rtype: tuple
+    """
+    start_points = numpy.asarray(start_points, dtype=float).reshape(-1, 2)
+    end_points = numpy.asarray(end_points, dtype=float).reshape(-1, 2)
+    size = MODEL_SAMPLE_SIZES[model]
+    count = len(start_points)
+    if count < size:
+        return numpy.identity(3), 0.0
+    if random is None:
+        random = numpy.random.RandomState(0)
+
+    # Fit in normalized coordinates, then bring the models back to pixels
+    start_matrix = _normalization(start_points)
+    end_matrix = _normalization(end_points)
+    normalized_start = transform_points(start_matrix, start_points)
+    normalized_end = transform_points(end_matrix, end_points)
+    end_inverse = numpy.linalg.inv(end_matrix)
+
+    def fit(indices):
+        return numpy.matmul(
+            numpy.matmul(end_inverse, fit_models(normalized_start[indices], normalized_end[indices], model)),
+            start_matrix)
+
+    def errors(matrices):
+        distances = numpy.sqrt(((transform_points(matrices, start_points) - end_points) ** 2).sum(axis=-1))
+        distances[numpy.isnan(distances)] = numpy.inf
+        return distances
+
+    if count == size:
+        samples = numpy.arange(size)[None, :]
+    else:
+        samples = numpy.argpartition(random.random_sample((hypotheses, count)), size - 1, axis=1)[:, :size]
+    matrices = fit(samples)
+    distances = errors(matrices)
+    costs = numpy.minimum(distances ** 2, threshold ** 2).sum(axis=1)
+    best = int(numpy.argmin(costs))
+    matrix = matrices[best]
+    inliers = distances[best] < threshold
+
+    if inliers.sum() > size:
+        refined = fit(numpy.flatnonzero(inliers))
+        refined_inliers = errors(refined) < threshold
+        if refined_inliers.sum() >= inliers.sum():
+            matrix = refined
+            inliers = refined_inliers
+    return matrix, float(inliers.mean())
+
+
+class CameraTrack(object):
+    """Columnar 2D features of a CameraTracker, one row per feature position
+
+    Rows are grouped by feature and sorted by frame inside each feature, rows offsets[i] to offsets[i + 1] of
+    every column belong to the feature i.
+    """
+
+    def __init__(self, track, frame, x, y):
+        """
+        :param track: feature index of each row
+        :param frame: frame of each row
+        :param x: x position of each row
+        :param y: y position of each row
+        """
+        self.track = numpy.asarray(track, dtype=int)
+        self.frame = numpy.asarray(frame, dtype=int)
+        self.x = numpy.asarray(x, dtype=float)
+        self.y = numpy.asarray(y, dtype=float)
+        counts = numpy.bincount(self.track) if len(self.track) else numpy.zeros(0, dtype=int)
+        self.offsets = numpy.concatenate([[0], numpy.cumsum(counts)]).astype(int)
+        self.first_frame = self.frame[self.offsets[:-1]] if len(counts) else numpy.zeros(0, dtype=int)
+        self.last_frame = self.frame[self.offsets[1:] - 1] if len(counts) else numpy.zeros(0, dtype=int)
+        self._store = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def store(self):
+        """Get the positions of the features indexed by frame, built once
+        :rtype: TrackStore
+        """
+        if self._store is None:
+            self._store = TrackStore(self)
+        return self._store
+
+    def to_lists(self):
+        """Get the features in the format of StickIt's ExportCameraTrack
+        :returns: a list of [[frame, x, y], ...] per feature
+        :rtype: list
+        """
+        rows = numpy.column_stack([self.frame, self.x, self.y]).tolist()
+        for row in rows:
+            row[0] = int(row[0])
+        return [rows[start:end] for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+class TrackStore(object):
+    """Positions of features on consecutive frames, indexed by frame
+
+    The pairs of a frame are stored contiguously: rows frame_offsets[i] to frame_offsets[i + 1] of start and end
+    hold the positions on frames first_frame + i and first_frame + i + 1 of every feature tracked on both.
+    """
+
+    def __init__(self, camera_track):
+        """
+        :param camera_track: the features
+        :type camera_track: CameraTrack
+        """
+        # Rows followed by a row of the same feature, which is on the next frame
+        rows = numpy.flatnonzero(camera_track.track[:-1] == camera_track.track[1:])
+        frames = camera_track.frame[rows]
+        order = numpy.argsort(frames, kind='stable')  # Keep the features in order for each frame
+        rows = rows[order]
+        frames = frames[order]
+
+        positions = numpy.column_stack([camera_track.x, camera_track.y])
+        self.start = numpy.ascontiguousarray(positions[rows])
+        self.end = numpy.ascontiguousarray(positions[rows + 1])
+        self.first_frame = int(frames[0]) if len(frames) else 0
+        counts = numpy.bincount(frames - self.first_frame) if len(frames) else numpy.zeros(0, dtype=int)
+        self.frame_offsets = numpy.concatenate([[0], numpy.cumsum(counts)]).astype(int)
+        self._frame_motion = {}
+
+    @classmethod
+    def from_arrays(cls, start, end, frame_offsets, first_frame):
+        """Make a store from the arrays of another one, like the ones saved for a SolveWorker
+        :rtype: TrackStore
+        """
+        store = cls.__new__(cls)
+        store.start = numpy.ascontiguousarray(start, dtype=float)
+        store.end = numpy.ascontiguousarray(end, dtype=float)
+        store.frame_offsets = numpy.asarray(frame_offsets, dtype=int)
+        store.first_frame = int(first_frame)
+        store._frame_motion = {}
+        return store
+
+    def frame_motion(self, method):
+        """Get the global motion of every frame, from a frame to the next one, computed once per method
+        :param int method: MEDIAN or AVERAGE
+        :returns: x, y motion of shape (frames, 2), from first_frame
+        :rtype: numpy.ndarray
+        """
+        if method in self._frame_motion:
+            return self._frame_motion[method]
+        motion = self.end - self.start
+        counts = numpy.diff(self.frame_offsets)
+        if method == MEDIAN:
+            # Sort the motion of each frame separately, then pick the middle of each frame
+            frame_index = numpy.repeat(numpy.arange(len(counts)), counts)
+            result = numpy.zeros((len(counts), 2))
+            has_points = counts > 0
+            low = (self.frame_offsets[:-1] + (counts - 1) // 2)[has_points]
+            high = (self.frame_offsets[:-1] + counts // 2)[has_points]
+            for axis in range(2):
+                values = motion[numpy.lexsort((motion[:, axis], frame_index)), axis]
+                result[has_points, axis] = (values[low] + values[high]) / 2.0
+        else:
+            sums = numpy.concatenate([numpy.zeros((1, 2)), numpy.cumsum(motion, axis=0)])
+            result = (sums[self.frame_offsets[1:]] - sums[self.frame_offsets[:-1]]) / (counts[:, None] + 0.00001)
+        self._frame_motion[method] = result
+        return result
+
+    def frame_deltas(self, method, first, last):
+        """Get the global motion of the frames first to last - 1, see frame_motion
+        :param int method: MEDIAN or AVERAGE
+        :param int first: the first frame
+        :param int last: the frame after the last one
+        :returns: x, y motion of shape (last - first, 2), zero for the frames without points
+        :rtype: numpy.ndarray
+        """
+        motion = self.frame_motion(method)
+        index = numpy.arange(first, last) - self.first_frame
+        valid = (index >= 0) & (index < len(motion))
+        deltas = numpy.zeros((len(index), 2))
+        deltas[valid] = motion[index[valid]]
+        return deltas
+
+    def pairs(self, frame, reverse=False):
+        """Get the positions of the features tracked on a frame and the next one
+        :param int frame: the frame
+        :param bool reverse: swap the frames, to solve backwards
+        :returns: start and end positions, of shape (features, 2), in feature order
+        :rtype: tuple
+        """
+        index = int(frame) - self.first_frame
+        if index < 0 or index >= len(self.frame_offsets) - 1:
+            start = end = numpy.zeros((0, 2))
+        else:
+            start = self.start[self.frame_offsets[index]:self.frame_offsets[index + 1]]
+            end = self.end[self.frame_offsets[index]:self.frame_offsets[index + 1]]
+        if reverse:
+            return end, start
+        return start, end
+
+
+def solve_range(store, method, targets, ref_frame, first, last, k=DEFAULT_K):
+    """Move targets from the reference frame to every frame of a range, forwards and backwards
+
+    The global methods don't depend on the positions of the targets, so their motion is summed up from the reference
+    frame in one go. The local method follows the nearest points of the targets frame after frame, all the targets
+    of a frame being searched at once.
+    :param store: the positions of the features
+    :type store: TrackStore
+    :param int method: LOCAL, MEDIAN or AVERAGE
+    :param targets: the x, y positions to move, on the reference frame
+    :type targets: numpy.ndarray or list
+    :param int ref_frame: the reference frame
+    :param int first: the first frame, solved backwards from the reference frame
+    :param int last: the last frame, solved forwards from the reference frame
+    :param int k: number of nearest points moving each target, for the LOCAL method
+    :returns: the frames, from min(first, ref_frame) to max(last, ref_frame), and the positions of the targets on
+        each of them, of shape (frames, targets, 2)
+    :rtype: tuple
+    """
+    targets = numpy.asarray(targets, dtype=float).reshape(-1, 2)
+    first = min(first, ref_frame)
+    last = max(last, ref_frame)
+    frames = numpy.arange(first, last + 1)
+    positions = numpy.empty((len(frames), len(targets), 2))
+    ref_index = ref_frame - first
+    positions[ref_index] = targets
+
+    if method != LOCAL:
+        deltas = store.frame_deltas(method, first, last)
+        # Forwards, the motion from each frame to the next one is added up
+        positions[ref_index + 1:] = targets + numpy.cumsum(deltas[ref_index:], axis=0)[:, None, :]
+        # Backwards, the motion of the reversed pairs is its opposite
+        backwards = numpy.cumsum(deltas[:ref_index][::-1], axis=0)[::-1]
+        positions[:ref_index] = targets - backwards[:, None, :]
+        return frames, positions
+
+    for index in range(ref_index - 1, -1, -1):
+        start_points, end_points = store.pairs(frames[index], reverse=True)
+        positions[index] = positions[index + 1] + interpolate_offsets(
+            start_points, end_points, positions[index + 1], k)
+    for index in range(ref_index, len(frames) - 1):
+        start_points, end_points = store.pairs(frames[index])
+        positions[index + 1] = positions[index] + interpolate_offsets(
+            start_points, end_points, positions[index], k)
+    return frames, positions
+
+
+def solve_range_robust(store, targets, ref_frame, first, last, model=SIMILARITY, neighbours=RANSAC_NEIGHBOURS,
+                       threshold=RANSAC_THRESHOLD, hypotheses=RANSAC_HYPOTHESES, seed=0, progress=None):
+    """Move targets from the reference frame to every frame of a range with the RANSAC method
+
+    On every frame, a model is fitted to the features around the targets, their nearest neighbours, and moves all
+    the targets. Features moving differently from most of their neighbours are left out of the fit.
+    :param store: the positions of the features
+    :type store: TrackStore
+    :param targets: the x, y positions to move, on the reference frame
+    :type targets: numpy.ndarray or list
+    :param int ref_frame: the reference frame
+    :param int first: the first frame, solved backwards from the reference frame
+    :param int last: the last frame, solved forwards from the reference frame
+    :param int model: SIMILARITY, AFFINE or HOMOGRAPHY
+    :param int neighbours: number of nearest features of each target used for the fit
+    :param float threshold: distance in pixels under which a feature follows a model
+    :param int hypotheses: number of models tried on each frame
+    :param int seed: seed of the random samples
+    :param progress: called with the number of frames solved and the total after each frame
+    :type progress: callable
+    :returns: the frames, from min(first, ref_frame) to max(last, ref_frame), the positions of the targets on each
+        of them, of shape (frames, targets, 2), and the confidence of each frame, the ratio of features following
+        the motion that led to it, 1 on the reference frame
+    :rtype: tuple
+    """
+    targets = numpy.asarray(targets, dtype=float).reshape(-1, 2)
+    first = min(first, ref_frame)
+    last = max(last, ref_frame)
+    frames = numpy.arange(first, last + 1)
+    positions = numpy.empty((len(frames), len(targets), 2))
+    confidence = numpy.ones(len(frames))
+    ref_index = ref_frame - first
+    positions[ref_index] = targets
+    random = numpy.random.RandomState(seed)
+
+    def step(frame, reverse, current):
+        start_points, end_points = store.pairs(frame, reverse)
+        if len(start_points) < MODEL_SAMPLE_SIZES[model]:
+            return current, 0.0
+        indices = numpy.unique(NearestPoints(start_points).query(current, neighbours)[1])
+        matrix, frame_confidence = ransac_transform(
+            start_points[indices], end_points[indices], model, threshold, hypotheses, random)
+        return transform_points(matrix, current), frame_confidence
+
+    solved = 0
+    for index in range(ref_index - 1, -1, -1):
+        positions[index], confidence[index] = step(frames[index], True, positions[index + 1])
+        solved += 1
+        if progress is not None:
+            progress(solved, len(frames) - 1)
+    for index in range(ref_index, len(frames) - 1):
+        positions[index + 1], confidence[index + 1] = step(frames[index], False, positions[index])
+        solved += 1
+        if progress is not None:
+            progress(solved, len(frames) - 1)
+    return frames, positions, confidence
+
+
+def parse_camera_track(text):
+    """Parse the serializeKnob of a CameraTracker into its 2D features
+
+    The text is tokenized once, then read with the same rules StickIt always used, based on the number of
+    tokens of the lines around each feature: the layout of the archive changes after some features.
+    :param str text: the serializeKnob script
+    :rtype: CameraTrack
+    """
+    rows = [line.split(' ') for line in text.split('\n')]
+    track, frame, x, y = [], [], [], []
+    feature = -1
+    last_frame = 0
+    for index, tokens in enumerate(rows):
+        length = len(tokens)
+        if length > 4 and tokens[-1] == '10':  # Header of a feature
+            # The first feature always has 2 unknown ints
+            offset_key = 2 if length > 6 and tokens[6] == '10' else 0
+            # The header is the line after the first position
+            header = rows[index + 1]
+            second = rows[index + 2]
+            back_offset = 0
+            last_offset = 0
+            first_offset = 0
+            second_offset = 0
+            if len(header) == 3:
+                header = second
+                offset_key = 2
+                if len(second) in (7, 11):
+                    first_offset = 1
+                    back_offset = 1 if len(second) == 11 else 0
+            key_count = int(header[4 + offset_key])
+
+            feature += 1
+            track.append(feature)
+            frame.append(last_frame)
+            x.append(float(tokens[2]))
+            y.append(float(tokens[3]))
+            for key in range(2, key_count + 1):
+                current = rows[index + key + first_offset - 1]
+                if 7 < len(current) < 10 and int(current[5]) > 0:
+                    position = rows[int(current[7]) + 1]
+                    second_offset = 1
+                elif key == key_count and back_offset == 1:
+                    position = rows[int(last_offset)]
+                else:
+                    position = rows[index + key + first_offset - second_offset]
+                track.append(feature)
+                frame.append(last_frame + key - 1)
+                x.append(float(position[2]))
+                y.append(float(position[3]))
+
+                following = rows[index + key + first_offset + second_offset]
+                if 5 < len(following) < 16:
+                    last_offset = following[5]
+                else:
+                    last_offset = index + key + 1
+        elif length > 8 and tokens[1] == '0' and tokens[2] == '1':  # Frame
+            last_frame = int(tokens[3])
+    return CameraTrack(track, frame, x, y)
+
+
+_camera_tracks = {}
+
+
+def get_camera_track(key, text):
+    """Get the parsed 2D features of a CameraTracker, parsing them only when its serializeKnob changed
+    :param key: identifies the tracker, like its full name
+    :param str text: the serializeKnob script
+    :rtype: CameraTrack
+    """
+    text_hash = hash(text)
+    cached = _camera_tracks.get(key)
+    if cached is None or cached[0] != text_hash:
+        cached = (text_hash, parse_camera_track(text))
+        _camera_tracks[key] = cached
+    return cached[1]
+
+
+def get_track_store(key, text):
+    """Get the positions of the features of a CameraTracker indexed by frame, see get_camera_track
+    :param key: identifies the tracker, like its full name
+    :param str text: the serializeKnob script
+    :rtype: TrackStore
+    """
+    return get_camera_track(key, text).store()
+
+
+def clear_camera_tracks():
+    """Forget all the parsed CameraTrackers"""
+    _camera_tracks.clear()
+
+
+# Names of the python interpreters looked for next to the executable of nuke, to run the workers
+PYTHON_NAMES = ('python', 'python3', 'python.exe', 'python3.exe')
+# Options of solve_range_robust passed to the workers
+WORKER_OPTIONS = ('model', 'neighbours', 'threshold', 'hypotheses', 'seed')
+
+
+def find_python():
+    """Find a python interpreter to run the workers
+    The STICKIT_PYTHON environment variable is used first, then the interpreter running this module if it's a
+    python, then one shipped next to the executable of nuke.
+    :returns: the path of the interpreter, None if there is none
+    :rtype: str
+    """
+    if os.environ.get('STICKIT_PYTHON'):
+        return os.environ['STICKIT_PYTHON']
+    executable = sys.executable or ''
+    if os.path.basename(executable).lower().startswith('python'):
+        return executable
+    directory = os.path.dirname(executable)
+    for name in PYTHON_NAMES:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class SolveWorker(object):
+    """Runs solve_range_robust in a separate python process, so solving doesn't freeze nuke
+
+    The arrays are exchanged through .npz files in a temporary directory, where the output of the process is written
+    too so it can't fill a pipe and block it. Without a python interpreter, the solve
+    runs in a thread instead, and if the process fails it runs again in this process when the result is asked.
+    An exception raised by the solve in this process is raised again by result, its traceback being kept in error.
+    """
+
+    def __init__(self, store, targets, ref_frame, first, last, python=None, **options):
+        """
+        :param store: the positions of the features
+        :type store: TrackStore
+        :param targets: the x, y positions to move, on the reference frame
+        :type targets: numpy.ndarray or list
+        :param int ref_frame: the reference frame
+        :param int first: the first frame
+        :param int last: the last frame
+        :param str python: the interpreter running the worker, see find_python if None
+        :param options: the options of solve_range_robust
+        """
+        self.arguments = (store, targets, ref_frame, first, last)
+        self.options = options
+        self.error = None
+        self._result = None
+        self._exception = None
+        self._process = None
+        self._thread = None
+        self._log = None
+        self._directory = tempfile.mkdtemp(prefix='stickit_solver_')
+        self._output = os.path.join(self._directory, 'output.npz')
+
+        python = python or find_python()
+        if python is None:
+            self._thread = threading.Thread(target=self._solve)
+            self._thread.daemon = True
+            self._thread.start()
+            return
+        source = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+        input_path = os.path.join(self._directory, 'input.npz')
+        numpy.savez(
+            input_path, start=store.start, end=store.end, frame_offsets=store.frame_offsets,
+            first_frame=store.first_frame, targets=numpy.asarray(targets, dtype=float).reshape(-1, 2),
+            frame_range=numpy.array([ref_frame, first, last]),
+            **dict(('option_' + name, value) for name, value in options.items()))
+        # The worker imports numpy from the same places as this process
+        environment = dict(os.environ)
+        environment['PYTHONPATH'] = os.pathsep.join(path for path in sys.path if path)
+        self._log = open(os.path.join(self._directory, 'worker.log'), 'w+b')
+        self._process = subprocess.Popen(
+            [python, source, input_path, self._output],
+            stdout=self._log, stderr=subprocess.STDOUT, env=environment)
+
+    def _solve(self):
+        # Also run in a thread, where an exception would be lost
+        try:
+            self._result = solve_range_robust(*self.arguments, **self.options)
+        except Exception as exception:
+            self._exception = exception
+            self.error = (self.error or '') + traceback.format_exc()
+
+    def _read_log(self):
+        """Close the output of the process, and get what it wrote
+        :rtype: str
+        """
+        if self._log is None:
+            return ''
+        self._log.seek(0)
+        output = self._log.read().decode('utf-8', 'replace')
+        self._log.close()
+        self._log = None
+        return output
+
+    def done(self):
+        """Check if the solve finished, without waiting
+        :rtype: bool
+        """
+        if self._process is not None:
+            return self._process.poll() is not None
+        return not self._thread.is_alive()
+
+    def result(self):
+        """Wait for the solve, see solve_range_robust for the result
+        If the process failed, its output is kept in error and the range is solved here.
+        :rtype: tuple
+        :raises Exception: what the solve raised in this process
+        """
+        try:
+            if self._process is not None:
+                self._process.wait()
+                output = self._read_log()
+                if self._process.returncode == 0 and os.path.isfile(self._output):
+                    with numpy.load(self._output) as data:
+                        self._result = (data['frames'], data['positions'], data['confidence'])
+                else:
+                    self.error = output
+                    self._solve()
+            else:
+                self._thread.join()
+            if self._exception is not None:
+                raise self._exception
+            return self._result
+        finally:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def cancel(self):
+        """Stop the solve, its result is lost"""
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._read_log()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+
+def main(arguments):
+    """Solve the range saved by a SolveWorker
+    :param list arguments: the input and output .npz paths
+    :returns: the exit code
+    :rtype: int
+    """
+    if len(arguments) != 2:
+        sys.stderr.write('usage: python stickit_solver.py input.npz output.npz\n')
+        return 2
+    data = numpy.load(arguments[0])
+    store = TrackStore.from_arrays(data['start'], data['end'], data['frame_offsets'], data['first_frame'])
+    ref_frame, first, last = [int(value) for value in data['frame_range']]
+    options = dict(
+        (name, data['option_' + name].item()) for name in WORKER_OPTIONS if 'option_' + name in data.files)
+    frames, positions, confidence = solve_range_robust(store, data['targets'], ref_frame, first, last, **options)
+    numpy.savez(arguments[1], frames=frames, positions=positions, confidence=confidence)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+"""
+Stand-in for the nuke module, so the modules importing it can be tested without nuke.
+It has no functions of its own, the tests set the ones they need.
+"""
+
+import sys
+import types
+
+
+def install():
+    """Make nuke and nuke.splinewarp importable, when nuke itself isn't
+    :returns: the nuke module
+    :rtype: module
+    """
+    try:
+        import nuke
+        import nuke.splinewarp  # noqa: F401
+        return nuke
+    except ImportError:
+        pass
+    nuke = types.ModuleType('nuke')
+    nuke.splinewarp = types.ModuleType('nuke.splinewarp')
+    sys.modules['nuke'] = nuke
+    sys.modules['nuke.splinewarp'] = nuke.splinewarp
+    return nuke
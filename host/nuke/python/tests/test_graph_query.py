@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the walks up the inputs of nodes, in graph_query and in the copy multimixer holds in get_top_nodes.
+
+The nodes are stubs counting how often their class is read, which graph_query does once per visited node.
+multimixer imports nuke, which is replaced by the module of fake_nuke when it can't be imported.
+Run with: python -m unittest discover host/nuke/python/tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import graph_query  # noqa: E402
+import fake_nuke  # noqa: E402
+fake_nuke.install()
+import multimixer  # noqa: E402
+
+
+class StubNode(object):
+    """A node with a class and inputs, some of them empty"""
+
+    def __init__(self, name, node_class='Dot', inputs=()):
+        self.name = name
+        self.node_class = node_class
+        self.connected = list(inputs)
+        self.class_reads = 0
+
+    def __repr__(self):
+        return self.name
+
+    def Class(self):
+        self.class_reads += 1
+        return self.node_class
+
+    def inputs(self):
+        return len(self.connected)
+
+    def input(self, index):
+        return self.connected[index]
+
+
+def diamond():
+    """top <- left, right <- bottom, left and right both reading top"""
+    top = StubNode('top', 'Read')
+    left = StubNode('left', 'Grade', [top])
+    right = StubNode('right', 'Read', [top])
+    bottom = StubNode('bottom', 'Merge2', [left, right])
+    return top, left, right, bottom
+
+
+class NodeInputsTest(unittest.TestCase):
+
+    def test_empty_inputs(self):
+        read = StubNode('read', 'Read')
+        merge = StubNode('merge', 'Merge2', [None, read, None])
+        self.assertEqual(graph_query.node_inputs(merge), [read])
+        self.assertEqual(graph_query.node_inputs(merge, first_only=True), [])
+        self.assertEqual(graph_query.node_inputs(StubNode('empty'), first_only=True), [])
+
+
+class UpstreamNodesTest(unittest.TestCase):
+
+    def test_diamond_visits_each_node_once(self):
+        top, left, right, bottom = diamond()
+        self.assertEqual(graph_query.upstream_nodes([bottom], 'Read', include_roots=True), [top, right])
+        for node in (top, left, right, bottom):
+            self.assertEqual(node.class_reads, 1)
+
+    def test_node_class(self):
+        top, left, right, bottom = diamond()
+        self.assertEqual(graph_query.upstream_nodes([bottom]), [left, top, right])
+        self.assertEqual(graph_query.upstream_nodes([bottom], 'Read'), [top, right])
+        self.assertEqual(graph_query.upstream_nodes([bottom], ['Grade', 'Read']), [left, top, right])
+
+    def test_include_roots(self):
+        top, left, right, bottom = diamond()
+        self.assertEqual(graph_query.upstream_nodes([right], 'Read'), [top])
+        self.assertEqual(graph_query.upstream_nodes([right], 'Read', include_roots=True), [right, top])
+        # A root upstream of another root is found through it
+        self.assertEqual(graph_query.upstream_nodes([bottom, right], 'Read'), [top, right])
+
+    def test_empty_inputs(self):
+        read = StubNode('read', 'Read')
+        merge = StubNode('merge', 'Merge2', [None, read])
+        self.assertEqual(graph_query.upstream_nodes([merge]), [read])
+        self.assertEqual(graph_query.upstream_nodes([merge], first_only=True), [])
+
+
+class UpstreamByRootTest(unittest.TestCase):
+
+    def test_diamond_visits_each_node_once(self):
+        top, left, right, bottom = diamond()
+        found = graph_query.upstream_by_root([bottom, left], 'Read')
+        self.assertEqual(found, {bottom: frozenset([top, right]), left: frozenset([top])})
+        for node in (top, left, right, bottom):
+            self.assertEqual(node.class_reads, 1)
+
+    def test_roots_are_included(self):
+        top, left, right, bottom = diamond()
+        self.assertEqual(graph_query.upstream_by_root([right], 'Read'), {right: frozenset([right, top])})
+
+    def test_shared_memo(self):
+        top, left, right, bottom = diamond()
+        memo = {}
+        self.assertEqual(graph_query.upstream_by_root([left], 'Read', memo), {left: frozenset([top])})
+        self.assertEqual(top.class_reads, 1)
+        # The second query only visits what the first one didn't
+        self.assertEqual(graph_query.upstream_by_root([bottom], 'Read', memo), {bottom: frozenset([top, right])})
+        self.assertEqual((top.class_reads, left.class_reads, right.class_reads, bottom.class_reads), (1, 1, 1, 1))
+        self.assertEqual(set(memo), set([top, left, right, bottom]))
+
+    def test_empty_inputs(self):
+        read = StubNode('read', 'Read')
+        merge = StubNode('merge', 'Merge2', [None, read, None])
+        self.assertEqual(graph_query.upstream_by_root([merge], 'Read'), {merge: frozenset([read])})
+        self.assertEqual(graph_query.upstream_by_root([merge], 'Read', first_only=True), {merge: frozenset()})
+
+
+class TopNodesTest(unittest.TestCase):
+
+    def test_first_inputs(self):
+        top, left, right, bottom = diamond()
+        other = StubNode('other', 'Read')
+        bottom.connected.append(other)
+        found = multimixer.get_top_nodes([bottom, right, top, other])
+        self.assertEqual(found, {bottom: top, right: top, top: top, other: other})
+
+    def test_empty_first_input(self):
+        read = StubNode('read', 'Read')
+        merge = StubNode('merge', 'Merge2', [None, read])
+        self.assertEqual(multimixer.get_top_nodes([merge]), {merge: merge})
+
+    def test_shared_memo(self):
+        top, left, right, bottom = diamond()
+        memo = {}
+        multimixer.get_top_nodes([left], memo)
+        self.assertEqual(memo, {left: top, top: top})
+        self.assertEqual(multimixer.get_top_nodes([bottom], memo), {bottom: top})
+        self.assertEqual(memo[bottom], top)
+
+    def test_cycle(self):
+        first = StubNode('first')
+        second = StubNode('second', inputs=[first])
+        first.connected.append(second)
+        below = StubNode('below', inputs=[first])
+        # The walk stops on the node whose first input it already went through
+        self.assertEqual(multimixer.get_top_nodes([below]), {below: second})
+        # Found in the same call, second already has its top node when it is reached
+        self.assertEqual(multimixer.get_top_nodes([first, second]), {first: second, second: second})
+
+
+if __name__ == '__main__':
+    unittest.main()
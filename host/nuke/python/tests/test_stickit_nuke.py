@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the points StickIt reads from the track store of stickit_solver, against the lists it used before.
+
+stickit_nuke imports nuke, which is replaced by the module of fake_nuke, giving the CameraTracker of the fixture to
+GrabListData.
+Run with: python -m unittest discover host/nuke/python/tests
+"""
+
+import os
+import sys
+import unittest
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_nuke  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class FakeKnob(object):
+
+    def __init__(self, script):
+        self.script = script
+
+    def toScript(self):
+        return self.script
+
+
+class FakeCameraTracker(object):
+
+    def __init__(self, script):
+        self.serialize = FakeKnob(script)
+
+    def fullName(self):
+        return 'si_ct'
+
+    def knob(self, name):
+        return self.serialize if name == 'serializeKnob' else None
+
+
+def import_stickit_nuke(tracker):
+    """Import stickit_nuke with a nuke module whose toNode gives the tracker"""
+    fake_nuke.install().toNode = lambda name: tracker
+    import stickit_nuke
+    return stickit_nuke
+
+
+class FramePointsTest(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(FIXTURES, 'camera_tracker_serialize.txt')) as fixture:
+            tracker = FakeCameraTracker(fixture.read())
+        self.stickit_nuke = import_stickit_nuke(tracker)
+        self.solver = self.stickit_nuke.stickit_solver
+        self.solver.clear_camera_tracks()
+        self.store = self.stickit_nuke.GrabListData()
+        # The lists read without numpy
+        self.stickit_nuke.stickit_solver = None
+        try:
+            self.lists = self.stickit_nuke.GrabListData()
+        finally:
+            self.stickit_nuke.stickit_solver = self.solver
+
+    def tearDown(self):
+        self.solver.clear_camera_tracks()
+
+    def frame_points(self, point_data, frame, rev, ofs, solver):
+        self.stickit_nuke.stickit_solver = solver
+        try:
+            frame_points = self.stickit_nuke.GetFramePoints(point_data, frame, rev, ofs)
+            return frame_points, self.stickit_nuke.GetStartPositions(frame_points)
+        finally:
+            self.stickit_nuke.stickit_solver = self.solver
+
+    def test_matches_get_animtion_list(self):
+        for rev, ofs in ((False, False), (True, False), (False, True)):
+            for frame in range(995, 1015):
+                (start, end), positions = self.frame_points(self.store, frame, rev, ofs, self.solver)
+                animation, expected_positions = self.frame_points(self.lists, frame, rev, ofs, None)
+                expected_start = numpy.array([item[0][1:] for item in animation]).reshape(-1, 2)
+                expected_end = numpy.array([item[1][1:] for item in animation]).reshape(-1, 2)
+                numpy.testing.assert_allclose(start, expected_start, atol=1e-4)
+                numpy.testing.assert_allclose(end, expected_end, atol=1e-4)
+                numpy.testing.assert_allclose(
+                    numpy.array(positions).reshape(-1, 2), numpy.array(expected_positions).reshape(-1, 2), atol=1e-4)
+
+    def test_start_positions_with_offset(self):
+        # The pins of StickIT start from the next frame of the features, moved by the offset fix
+        positions = self.frame_points(self.store, 1001, False, True, self.solver)[1]
+        numpy.testing.assert_allclose(positions, self.store.pairs(1001)[1] + [1, 0.01], atol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
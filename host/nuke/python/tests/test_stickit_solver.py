@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the CameraTracker parser and track store of stickit_solver, without nuke.
+
+fixtures/camera_tracker_serialize.txt is serializeKnob text written with the four feature layouts read by StickIt:
+the first feature of the archive, a header on the second line, a key stored further in the archive and a last key
+read back from an offset. fixtures/camera_tracker_features.json is what the ExportCameraTrack of StickIt returned for
+it before it used stickit_solver.
+Run with: python -m unittest discover host/nuke/python/tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stickit_solver  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as fixture:
+        return fixture.read()
+
+
+class CameraTrackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.text = read_fixture('camera_tracker_serialize.txt')
+        self.features = json.loads(read_fixture('camera_tracker_features.json'))
+        self.track = stickit_solver.parse_camera_track(self.text)
+
+    def test_matches_export_camera_track(self):
+        self.assertEqual(self.track.to_lists(), self.features)
+
+    def test_columns(self):
+        rows = [(index, key[0], key[1], key[2]) for index, feature in enumerate(self.features) for key in feature]
+        track, frame, x, y = [numpy.array(column) for column in zip(*rows)]
+        numpy.testing.assert_array_equal(self.track.track, track)
+        numpy.testing.assert_array_equal(self.track.frame, frame)
+        numpy.testing.assert_array_equal(self.track.x, x)
+        numpy.testing.assert_array_equal(self.track.y, y)
+
+    def test_first_and_last_frames(self):
+        self.assertEqual(len(self.track), len(self.features))
+        self.assertEqual(self.track.first_frame.tolist(), [feature[0][0] for feature in self.features])
+        self.assertEqual(self.track.last_frame.tolist(), [feature[-1][0] for feature in self.features])
+
+    def test_empty_text(self):
+        track = stickit_solver.parse_camera_track('')
+        self.assertEqual(len(track), 0)
+        self.assertEqual(track.to_lists(), [])
+
+    def test_cached_until_the_text_changes(self):
+        stickit_solver.clear_camera_tracks()
+        first = stickit_solver.get_camera_track('CameraTracker1', self.text)
+        self.assertIs(stickit_solver.get_camera_track('CameraTracker1', self.text), first)
+        changed = stickit_solver.get_camera_track('CameraTracker1', self.text.replace('12.75', '13.75'))
+        self.assertIsNot(changed, first)
+        self.assertEqual(changed.x[2], 13.75)
+        stickit_solver.clear_camera_tracks()
+
+
+class TrackStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.features = json.loads(read_fixture('camera_tracker_features.json'))
+        self.store = stickit_solver.parse_camera_track(read_fixture('camera_tracker_serialize.txt')).store()
+
+    def expected_pairs(self, frame):
+        """Positions of the features on a frame and the next one, from the lists of ExportCameraTrack"""
+        start, end = [], []
+        for feature in self.features:
+            for key, next_key in zip(feature[:-1], feature[1:]):
+                if key[0] == frame and next_key[0] == frame + 1:
+                    start.append(key[1:])
+                    end.append(next_key[1:])
+        return numpy.array(start).reshape(-1, 2), numpy.array(end).reshape(-1, 2)
+
+    def test_pairs(self):
+        for frame in range(995, 1015):
+            start, end = self.store.pairs(frame)
+            expected_start, expected_end = self.expected_pairs(frame)
+            numpy.testing.assert_array_equal(start, expected_start)
+            numpy.testing.assert_array_equal(end, expected_end)
+
+    def test_reversed_pairs(self):
+        start, end = self.store.pairs(1010, reverse=True)
+        expected_start, expected_end = self.expected_pairs(1010)
+        numpy.testing.assert_array_equal(start, expected_end)
+        numpy.testing.assert_array_equal(end, expected_start)
+
+    def test_frame_motion(self):
+        for method, reduce_motion in ((stickit_solver.MEDIAN, numpy.median), (stickit_solver.AVERAGE, numpy.mean)):
+            motion = self.store.frame_motion(method)
+            for index, frame_motion in enumerate(motion):
+                start, end = self.expected_pairs(self.store.first_frame + index)
+                expected = reduce_motion(end - start, axis=0) if len(start) else numpy.zeros(2)
+                numpy.testing.assert_allclose(frame_motion, expected, atol=1e-4)
+
+    def test_frame_deltas_outside_the_track(self):
+        deltas = self.store.frame_deltas(stickit_solver.AVERAGE, 999, 1002)
+        numpy.testing.assert_allclose(deltas[:2], numpy.zeros((2, 2)))
+        numpy.testing.assert_allclose(deltas[2], [1.125, 1.25], atol=1e-4)
+
+
+class BrokenStore(object):
+    """A track store failing as soon as the solve reads it"""
+
+    def pairs(self, frame, reverse=False):
+        raise ValueError('broken store')
+
+
+class SolveWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.find_python = stickit_solver.find_python
+        stickit_solver.find_python = lambda: None
+
+    def tearDown(self):
+        stickit_solver.find_python = self.find_python
+
+    def test_thread_exception_is_raised(self):
+        worker = stickit_solver.SolveWorker(BrokenStore(), [[0, 0]], 0, 0, 5)
+        with self.assertRaises(ValueError):
+            worker.result()
+        self.assertIn('broken store', worker.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
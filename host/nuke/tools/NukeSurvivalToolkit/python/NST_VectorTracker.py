@@ -6,7 +6,46 @@ nuke.load('VectorTracker.py')
 nuke.menu("Nodes").addCommand('user/VectorTracker', "nuke.createNode('VectorTracker.gizmo')")
 '''
 
+import hashlib
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#cached walk of the script, from the nuke python folder
+try:
+    import node_walker
+except ImportError:
+    node_walker = None
+
+#curve simplification, from the nuke python folder
+try:
+    import keyframe_reducer
+except ImportError:
+    keyframe_reducer = None
+
+#sampling modes of the sampling knob
+VTT_BOX = 0
+VTT_BILINEAR = 1
+VTT_GAUSSIAN = 2
+#frames of vectors kept in memory, so tracking back and forth doesn't render them again
+VTT_BUFFER_FRAMES = 8
+#pixels rendered around the trackers, so they can move for a while in the same buffer
+VTT_BUFFER_MARGIN = 32
+
+#rendered vectors, (vectors node, u, v, frame) -> (knobs of the vectors node, x, y, u/v array)
+J_VTT_Buffers = OrderedDict()
+
 def allScriptNodes():
+    #nodes of all levels, listed once until nodes are created or deleted
+    if node_walker is not None:
+        return node_walker.all_nodes(group=nuke.root())
+
     #collect all nodes in the root node graph
     nodes = nuke.allNodes()
     groups = [node for node in nodes if node.Class() == 'Group' ]
@@ -23,10 +62,237 @@ def allScriptNodes():
     #return all nodes on all levels
     return nodes
 
-def J_VTT_Track(first, last, pb = True):
+def J_VTT_Parent(node):
+    #get the node graph a node is in
+    fnn = node.fullName().split('.')
+    if len(fnn) > 1:
+        return nuke.toNode('root.' + '.'.join(fnn[:-1]))
+    return nuke.root()
+
+def J_VTT_UpstreamNodes(node):
+    #get a node and all the nodes it is rendered from, each once
+    #the inputs of a group come from the nodes inside it, the Input nodes of a group from the inputs of the group
+    nodes = []
+    visited = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current in visited:
+            continue
+        visited.add(current)
+        nodes.append(current)
+        for i in range(current.inputs()):
+            if current.input(i) is not None:
+                stack.append(current.input(i))
+        if current.Class() == 'Input':
+            group = J_VTT_Parent(current)
+            if group is not nuke.root() and group.input(int(current['number'].value())) is not None:
+                stack.append(group.input(int(current['number'].value())))
+        elif hasattr(current, 'nodes'):
+            stack.extend(current.nodes())
+    return nodes
+
+def J_VTT_ReadTiff(path):
+    #read an uncompressed float tiff, like the ones rendered by J_VTT_VectorBuffer
+    #returns an array of shape (height, width, channels), the first row being the bottom one like in nuke
+    with open(path, 'rb') as tiff:
+        data = tiff.read()
+    order = '<' if data[:2] == b'II' else '>'
+    ifd = struct.unpack(order + 'I', data[4:8])[0]
+    tags = {}
+    for entry in range(struct.unpack(order + 'H', data[ifd:ifd+2])[0]):
+        start = ifd + 2 + entry*12
+        tag, kind, count = struct.unpack(order + 'HHI', data[start:start+8])
+        size = {3: 2, 4: 4}.get(kind, 0)
+        if not size:
+            continue
+        code = order + ('H' if kind == 3 else 'I')*count
+        if size*count > 4:
+            offset = struct.unpack(order + 'I', data[start+8:start+12])[0]
+            tags[tag] = struct.unpack(code, data[offset:offset + size*count])
+        else:
+            tags[tag] = struct.unpack(code, data[start+8:start+8 + size*count])
+    width = tags[256][0]
+    height = tags[257][0]
+    channels = tags.get(277, (1,))[0]
+    if tags.get(259, (1,))[0] != 1 or tags.get(339, (1,))[0] != 3 or tags.get(258, (32,))[0] != 32:
+        raise RuntimeError('VectorTracker can only read uncompressed 32 bit float tiffs')
+    pixels = b''.join(data[offset:offset + count] for offset, count in zip(tags[273], tags[279]))
+    image = numpy.frombuffer(pixels, dtype=order + 'f4', count=width*height*channels)
+    return image.reshape(height, width, channels)[::-1]
+
+class J_VTT_VectorBuffer(object):
+    #u/v planes of the vectors rendered once per frame, in a numpy array
+    #regions around the trackers are rendered to a temporary tiff by a Copy, Crop and Write made next to the vectors
+    #the last VTT_BUFFER_FRAMES frames are kept in J_VTT_Buffers, shared by all VectorTrackers
+    #they are rendered again when a knob of the vectors node or of a node upstream of it changed
+
+    def __init__(self, node, vectors, u, v):
+        self.node = node
+        self.vectors = vectors
+        self.u = u
+        self.v = v
+        self.nodes = None
+        self.path = None
+        self._signature = None
+
+    def signature(self):
+        #hash of the knobs of the vectors node and of all the nodes upstream of it, to render again when they change
+        #the graph doesn't change while tracking, so it is only hashed once per buffer
+        if self._signature is None:
+            knobs = hashlib.sha1()
+            for upstream in J_VTT_UpstreamNodes(self.vectors):
+                try:
+                    text = upstream.fullName() + '\n' + upstream.writeKnobs(nuke.WRITE_NON_DEFAULT_ONLY | nuke.TO_SCRIPT)
+                except (AttributeError, RuntimeError):
+                    text = upstream.fullName()
+                knobs.update(text if isinstance(text, bytes) else text.encode('utf-8'))
+            self._signature = knobs.hexdigest()
+        return self._signature
+
+    def render(self, frame, box):
+        #render the u/v planes inside box (x, y, r, t) of a frame
+        if self.nodes is None:
+            handle, self.path = tempfile.mkstemp(suffix='.tif', prefix='VectorTracker_')
+            os.close(handle)
+            with J_VTT_Parent(self.node):
+                copy = nuke.nodes.Copy(from0=self.u, to0='rgba.red', from1=self.v, to1='rgba.green')
+                copy.setInput(0, self.vectors)
+                copy.setInput(1, self.vectors)
+                crop = nuke.nodes.Crop(reformat=True)
+                crop.setInput(0, copy)
+                write = nuke.nodes.Write(file=self.path.replace('\\', '/'), file_type='tiff', channels='rgb')
+                write['datatype'].setValue('32 bit float')
+                write['compression'].setValue('none')
+                write.setInput(0, crop)
+            self.nodes = [copy, crop, write]
+        self.nodes[1]['box'].setValue(box)
+        nuke.execute(self.nodes[2], frame, frame)
+        return numpy.array(J_VTT_ReadTiff(self.path)[:, :, :2], dtype=float)
+
+    def get(self, frame, left, bottom, right, top):
+        #get a buffer covering the pixels left to right and bottom to top of a frame
+        #returns the x and y of its first pixel and the u/v array, of shape (height, width, 2)
+        key = (self.vectors.fullName(), self.u, self.v, frame)
+        signature = self.signature()
+        cached = J_VTT_Buffers.pop(key, None)
+        if cached is not None and cached[0] == signature:
+            x, y, buffer = cached[1:]
+            if x <= left and y <= bottom and x + buffer.shape[1] > right and y + buffer.shape[0] > top:
+                J_VTT_Buffers[key] = cached
+                return x, y, buffer
+            #also keep what was rendered before, for trackers going back
+            left, bottom = min(left, x), min(bottom, y)
+            right, top = max(right, x + buffer.shape[1] - 1), max(top, y + buffer.shape[0] - 1)
+
+        x = int(left) - VTT_BUFFER_MARGIN
+        y = int(bottom) - VTT_BUFFER_MARGIN
+        box = [x, y, int(right) + VTT_BUFFER_MARGIN + 1, int(top) + VTT_BUFFER_MARGIN + 1]
+        buffer = self.render(frame, box)
+        J_VTT_Buffers[key] = (signature, x, y, buffer)
+        while len(J_VTT_Buffers) > VTT_BUFFER_FRAMES:
+            J_VTT_Buffers.popitem(last=False)
+        return x, y, buffer
+
+    def sample(self, mode, xpos, ypos, xsize, ysize, frame):
+        #sample the vectors under all trackers, averaged over their sample area, bilinear or gaussian weighted by it
+        #returns the x and y offsets of each tracker
+        xpos = numpy.asarray(xpos, dtype=float)
+        ypos = numpy.asarray(ypos, dtype=float)
+        if mode == VTT_BOX:
+            #the area of node.sample, centered on the middle of the tracker pixel
+            halfx = numpy.maximum(numpy.asarray(xsize, dtype=float), 1) / 2.0
+            halfy = numpy.maximum(numpy.asarray(ysize, dtype=float), 1) / 2.0
+            radiusx = numpy.ceil(halfx) + 1
+            radiusy = numpy.ceil(halfy) + 1
+        elif mode == VTT_GAUSSIAN:
+            #a gaussian as wide as the sample area, cut at 2 sigmas
+            sigmax = numpy.maximum(numpy.asarray(xsize, dtype=float), 1) / 2.0
+            sigmay = numpy.maximum(numpy.asarray(ysize, dtype=float), 1) / 2.0
+            radiusx = numpy.ceil(2*sigmax)
+            radiusy = numpy.ceil(2*sigmay)
+        else:
+            radiusx = radiusy = numpy.ones(len(xpos))
+        x, y, buffer = self.get(
+            frame, numpy.floor(xpos - radiusx).min(), numpy.floor(ypos - radiusy).min(),
+            numpy.ceil(xpos + radiusx).max(), numpy.ceil(ypos + radiusy).max())
+        #pixel centers are at .5, so buffer coordinates are the tracker positions
+        bx = xpos - x
+        by = ypos - y
+
+        if mode == VTT_BILINEAR:
+            ix = numpy.floor(bx).astype(int)
+            iy = numpy.floor(by).astype(int)
+            fx = (bx - ix)[:, None]
+            fy = (by - iy)[:, None]
+            return (
+                buffer[iy, ix]*(1-fx)*(1-fy) + buffer[iy, ix+1]*fx*(1-fy) +
+                buffer[iy+1, ix]*(1-fx)*fy + buffer[iy+1, ix+1]*fx*fy).tolist()
+
+        offsets = []
+        for i in range(len(xpos)):
+            cols = numpy.arange(int(numpy.floor(bx[i] - radiusx[i])), int(numpy.ceil(bx[i] + radiusx[i])) + 1)
+            rows = numpy.arange(int(numpy.floor(by[i] - radiusy[i])), int(numpy.ceil(by[i] + radiusy[i])) + 1)
+            if mode == VTT_BOX:
+                #pixel n covers n to n+1, weighted by how much of it is inside the area
+                bottom, top = by[i] + .5 - halfy[i], by[i] + .5 + halfy[i]
+                left, right = bx[i] + .5 - halfx[i], bx[i] + .5 + halfx[i]
+                weights = numpy.outer(
+                    numpy.clip(numpy.minimum(rows + 1, top) - numpy.maximum(rows, bottom), 0, 1),
+                    numpy.clip(numpy.minimum(cols + 1, right) - numpy.maximum(cols, left), 0, 1))
+            else:
+                weights = numpy.outer(
+                    numpy.exp(-(rows - by[i])**2 / (2*sigmay[i]**2)), numpy.exp(-(cols - bx[i])**2 / (2*sigmax[i]**2)))
+            window = buffer[rows[0]:rows[-1]+1, cols[0]:cols[-1]+1]
+            offsets.append((numpy.einsum('ij,ijk->k', weights, window) / weights.sum()).tolist())
+        return offsets
+
+    def close(self):
+        #delete the render nodes and their tiff, the buffers stay in J_VTT_Buffers
+        if self.nodes is not None:
+            for tempNode in reversed(self.nodes):
+                nuke.delete(tempNode)
+            self.nodes = None
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+def J_VTT_SampleFrame(vectors, u, v, xpos, ypos, xsize, ysize, frame, buffer = None, mode = VTT_BOX):
+    #sample the vectors under all trackers for one frame, from one render of the buffer
+    #without a buffer, when numpy is missing, the vectors node is sampled for each tracker
+    #returns the x and y offsets of each tracker
+    if buffer is not None:
+        return buffer.sample(mode, xpos, ypos, xsize, ysize, frame)
+    offsets = []
+    for i in range(len(xpos)):
+        x = vectors.sample(u, xpos[i]+.5, ypos[i]+.5, xsize[i], ysize[i], frame)
+        y = vectors.sample(v, xpos[i]+.5, ypos[i]+.5, xsize[i], ysize[i], frame)
+        offsets.append((x, y))
+    return offsets
+
+def J_VTT_WriteKeys(node, trackers, keys):
+    #write the buffered keys of each tracker, one call per curve
+    for tracker, trackerKeys in zip(trackers, keys):
+        for curve in [0,1]:
+            if trackerKeys[curve]:
+                node[tracker].animation(curve).addKey(trackerKeys[curve])
+            del trackerKeys[curve][:]
+
+def J_VTT_Track(first, last, pb = True, preview = None):
     node = nuke.thisNode()
     vectors = node.input(1)
 
+    #update the viewer on every frame only with live preview
+    if preview is None:
+        preview = 'livePreview' in node.knobs() and node['livePreview'].value()
+
+    #the vectors are read from buffers, which need numpy, bilinear and gaussian sampling only work on them
+    mode = VTT_BOX
+    if 'sampling' in node.knobs():
+        mode = int(node['sampling'].getValue())
+    if mode != VTT_BOX and numpy is None:
+        print('VectorTracker: numpy is needed for bilinear and gaussian sampling, using box sampling')
+        mode = VTT_BOX
+
     #bool to check track direction
     forward = last > first
 
@@ -70,6 +336,8 @@ def J_VTT_Track(first, last, pb = True):
         ypos = []
         xsize = []
         ysize = []
+        #keys of the x and y curves of each tracker, written at the end
+        keys = []
         for tracker in trackers:
             #Append initial positions
             trackerVal = node[tracker].valueAt(first)
@@ -78,6 +346,7 @@ def J_VTT_Track(first, last, pb = True):
             #append sample area sizes
             xsize.append(node['sampleArea_'+tracker].value(0))
             ysize.append(node['sampleArea_'+tracker].value(1))
+            keys.append(([], []))
 
             #make tracker knobs keyable
             node[tracker].setAnimated()
@@ -93,47 +362,72 @@ def J_VTT_Track(first, last, pb = True):
             task = nuke.ProgressTask("VectorTracker")
             count = 0
 
-        #cycle through frames
-        for frame in rangeList:
+        buffer = None
+        if numpy is not None:
+            buffer = J_VTT_VectorBuffer(node, vectors, u, v)
 
-            #stop tracking if process is cancelled
-            if pb:
-                if task.isCancelled():
-                    break
+        try:
+            #cycle through frames
+            for frame in rangeList:
 
-            #update process window
-            if frame != last and pb:
-                count += 1
-                task.setMessage("sampling frame " + str(frame) + ' (frame ' + str(count) +' of ' + str(totalFrames) + ')')
-                task.setProgress(count*100/totalFrames)
+                #stop tracking if process is cancelled
+                if pb:
+                    if task.isCancelled():
+                        break
 
-            #execute for each tracker
-            for i, tracker in enumerate(trackers):
-                #get current position from list
-                curx = xpos[i]
-                cury = ypos[i]
+                #update process window
+                if frame != last and pb:
+                    count += 1
+                    task.setMessage("sampling frame " + str(frame) + ' (frame ' + str(count) +' of ' + str(totalFrames) + ')')
+                    task.setProgress(count*100/totalFrames)
 
-                #set keyframe
-                node[tracker].animations()[0].setKey(frame, curx)
-                node[tracker].animations()[1].setKey(frame, cury)
+                #buffer keyframes
+                for i in range(len(trackers)):
+                    keys[i][0].append(nuke.AnimationKey(frame, xpos[i]))
+                    keys[i][1].append(nuke.AnimationKey(frame, ypos[i]))
 
                 if frame != last:
-                    #sample vectors
-                    x = vectors.sample(u, curx+.5, cury+.5, xsize[i],ysize[i], frame)
-                    y = vectors.sample(v, curx+.5, cury+.5, xsize[i],ysize[i], frame)
-
-                    #set new position
-                    xpos[i] = curx + x
-                    ypos[i] = cury + y
+                    #sample vectors of all trackers and set new positions
+                    offsets = J_VTT_SampleFrame(vectors, u, v, xpos, ypos, xsize, ysize, frame, buffer, mode)
+                    for i, (x, y) in enumerate(offsets):
+                        xpos[i] += x
+                        ypos[i] += y
+
+                #show the keys of this frame in the viewer
+                if preview:
+                    J_VTT_WriteKeys(node, trackers, keys)
+                    nuke.frame(frame)
+        finally:
+            #set keyframes, also the ones tracked before a cancel
+            J_VTT_WriteKeys(node, trackers, keys)
+            if buffer is not None:
+                buffer.close()
+            if pb:
+                del task
 
-            #jump to frame
-            nuke.frame(frame)
-        if pb:
-            del task
+        #the single frame buttons step the timeline to the tracked frame
+        if not pb and not preview:
+            nuke.frame(last)
     #message when there is no vector data
     else:
         nuke.message('No vectors found!')
 
+def J_VTT_ReduceKeys(first = None, last = None):
+    #only the keys from first to last are reduced and made linear, like the tracked range
+    node = nuke.thisNode()
+    if keyframe_reducer is None:
+        nuke.message('Reducing keys needs numpy')
+        return
+
+    #reduce the x and y curves of all trackers together
+    trackers = [i for i in node.allKnobs() if i.Class() == 'XY_Knob' and 'tracker' in i.name()]
+    curves = []
+    for tracker in trackers:
+        if tracker.isAnimated():
+            curves.extend(tracker.animations())
+    removed = keyframe_reducer.reduce_curves(curves, node['reduceTolerance'].value(), first = first, last = last)
+    print('VectorTracker: removed ' + str(removed) + ' keys')
+
 def J_VTT_AddTracker():
     node = nuke.thisNode()
 
@@ -180,16 +474,8 @@ def J_VTT_Export():
     #select VectorTracker node
     node['selected'].setValue(True)
 
-    #find group name if node is in group
-    fnn = node.fullName().split('.')
-    groupName = 'root.'
-    for i in range(len(fnn)-1):
-        groupName += fnn[i] + '.'
     #get parent
-    if groupName != 'root.':
-        parent = nuke.toNode(groupName[:-1])
-    else:
-        parent = nuke.root()
+    parent = J_VTT_Parent(node)
 
     #create node in parent root
     with parent:
@@ -38,11 +38,15 @@ if 'Stamps_LastCreated' not in globals():
 if 'Stamps_MenusLoaded' not in globals():
     Stamps_MenusLoaded = False
 
+if 'Stamps_CallbacksLoaded' not in globals():
+    Stamps_CallbacksLoaded = False
+
 Stamps_LockCallbacks = False
 
 import nuke
 import nukescripts
 import re
+import bisect
 from functools import partial
 import sys
 import os
@@ -50,6 +54,20 @@ import os
 if sys.version_info[0] >= 3:
     unicode = str
 
+# Shared backdrop spatial index, node serializer and node walker, from the nuke python folder
+try:
+    import backdrop_index
+except ImportError:
+    backdrop_index = None
+try:
+    import node_serializer
+except ImportError:
+    node_serializer = None
+try:
+    import node_walker
+except ImportError:
+    node_walker = None
+
 # PySide import switch
 try:
     if nuke.NUKE_VERSION_MAJOR < 11:
@@ -141,7 +159,7 @@ def wiredTagsAndBackdrops(n, updateSimilar=False):
         a_bd = backdropTags(a)
         an = n.knob("anchor").value()
         if updateSimilar:
-            ns = [i for i in allWireds() if i.knob("anchor").value() == an]
+            ns = Stamps_Registry.findWireds(an)
         else:
             ns = [n]
         
@@ -172,6 +190,8 @@ def wiredKnobChanged():
     if kn in ["xpos","ypos","reconnect_by_selection_this","reconnect_by_selection_similar"]:
         return
     n = nuke.thisNode()
+    if kn in ["name","title","anchor"]:
+        Stamps_Registry.add(n)
     if Stamps_LockCallbacks == True:
         return
     ni = n.inputs()
@@ -179,13 +199,13 @@ def wiredKnobChanged():
         if not ni:
             if n.knob("auto_reconnect_by_title") and n.knob("auto_reconnect_by_title").value() and n.knob("title"):
                 n.knob("auto_reconnect_by_title").setValue(0)
-                for a in allAnchors():
-                    if a.knob("title") and a["title"].value() == n["title"].value():
-                        n.knob("auto_reconnect_by_title").setValue(False)
-                        nuke.thisNode().setInput(0,a)
-                        n["anchor"].setValue(a.name())
-                        wiredStyle(n)
-                        return
+                for a in findAnchorsByTitle(n["title"].value()):
+                    n.knob("auto_reconnect_by_title").setValue(False)
+                    nuke.thisNode().setInput(0,a)
+                    n["anchor"].setValue(a.name())
+                    Stamps_Registry.invalidate(n)
+                    wiredStyle(n)
+                    return
             try:
                 inp = n.knob("anchor").value()
                 a = nuke.toNode(inp)
@@ -212,6 +232,7 @@ def wiredKnobChanged():
                         n.setInput(0,None)
             except:
                 pass
+            Stamps_Registry.invalidate(n)
         n.knob("toReconnect").setValue(False)
     elif not ni:
         if nodeType(n)=="Particle" and not nuke.env["nukex"]:
@@ -241,6 +262,7 @@ def wiredKnobChanged():
             nuke.message("Please set a valid title.")
         try:
             n["title"].setValue(n["prev_title"].value())
+            Stamps_Registry.invalidate(n)
         except:
             pass
     else:
@@ -260,6 +282,7 @@ def wiredKnobChanged():
                             n.setInput(0,nuke.toNode(n.knob("anchor").value()))
                         except:
                             pass
+                    Stamps_Registry.invalidate(n)
             wiredGetStyle(n)
         except:
             pass
@@ -269,6 +292,7 @@ def wiredKnobChanged():
 
 def wiredOnCreate():
     n = nuke.thisNode()
+    Stamps_Registry.add(n)
     n.knob("toReconnect").setValue(1)
     for k in n.allKnobs():
         if k.name() not in ['wired_tab','identifier','lockCallbacks','toReconnect','title','prev_title','tags','backdrops','anchor','line1','anchor_label','show_anchor','zoom_anchor','stamps_label','zoomNext','selectSimilar','space_1','reconnect_label','reconnect_this','reconnect_similar','reconnect_all','space_2','advanced_reconnection','reconnect_by_title_label','reconnect_by_title_this','reconnect_by_title_similar', 'reconnect_by_title_selected', 'reconnect_by_selection_label','reconnect_by_selection_this','reconnect_by_selection_similar','reconnect_by_selection_selected','auto_reconnect_by_title','advanced_reconnection','line2','buttonHelp','version','postageStamp_show']:
@@ -280,6 +304,8 @@ def anchorKnobChanged():
     if kn in ["xpos","ypos"]:
         return
     n = nuke.thisNode()
+    if kn in ["name","title","tags"]:
+        Stamps_Registry.add(n)
     if kn == "title":
         kv = k.value()
         if titleIsLegal(kv):
@@ -293,22 +319,19 @@ def anchorKnobChanged():
         except:
             pass
     elif kn == "name":
-        try:
-            nn = anchor["prev_name"].value()
-        except:
-            nn = anchor.name()
         children = anchorWireds(n)
         for i in children:
-            i.knob("anchor").setValue(nn)
-        anchor["prev_name"].setValue(anchor.name())
+            i.knob("anchor").setValue(n.name())
+        n["prev_name"].setValue(n.name())
+        Stamps_Registry.invalidate(n)
     elif kn == "tags":
-        for ni in allWireds():
-            if ni.knob("anchor").value() == n.name():
-                wiredTagsAndBackdrops(ni, updateSimilar=True)
-                return
+        for ni in Stamps_Registry.findWireds(n.name()):
+            wiredTagsAndBackdrops(ni, updateSimilar=True)
+            return
 
 def anchorOnCreate():
     n = nuke.thisNode()
+    Stamps_Registry.add(n)
     for k in n.allKnobs():
         if k.name() not in ['anchor_tab','identifier','title','prev_title','prev_name','showing','tags','stamps_label','selectStamps','reconnectStamps','zoomNext','createStamp','buttonHelp','line1','line2','version']:
             k.setFlag(0x0000000000000400)
@@ -338,6 +361,7 @@ def retitleAnchor(ref = ""):
         for kn in ["title","prev_title"]:
             na[kn].setValue(ref_title)
         ref["prev_title"].setValue(ref_title)
+        Stamps_Registry.invalidate(na)
         return na
     except:
         return None
@@ -351,10 +375,10 @@ def retitleWired(anchor = ""):
     try:
         anchor_title = anchor["title"].value()
         anchor_name = anchor.name()
-        for nw in allWireds():
-            if nw["anchor"].value() == anchor_name:
-                nw["title"].setValue(anchor_title)
-                nw["prev_title"].setValue(anchor_title)
+        for nw in Stamps_Registry.findWireds(anchor_name):
+            nw["title"].setValue(anchor_title)
+            nw["prev_title"].setValue(anchor_title)
+        Stamps_Registry.invalidate(anchor)
         return True
     except:
         pass
@@ -362,9 +386,8 @@ def retitleWired(anchor = ""):
 def wiredSelectSimilar(anchor_name = ""):
     if anchor_name=="":
         anchor_name = nuke.thisNode().knob("anchor").value()
-    for i in allWireds():
-        if i.knob("anchor").value() == anchor_name:
-            i.setSelected(True)
+    for i in Stamps_Registry.findWireds(anchor_name):
+        i.setSelected(True)
 
 def wiredReconnect(n=""):
     succeeded=True
@@ -386,39 +409,81 @@ def wiredReconnect(n=""):
 def wiredReconnectSimilar(anchor_name = ""):
     if anchor_name=="":
         anchor_name = nuke.thisNode().knob("anchor").value()
-    for i in nuke.allNodes():
-        if isWired(i) and i.knob("anchor").value() == anchor_name:
-            reconnectErrors = 0
-            try:
-                i.knob("reconnect_this").execute()
-            except:
-                reconnectErrors += 1
-            finally:
-                if reconnectErrors > 0:
-                    nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
+    for i in Stamps_Registry.findWireds(anchor_name):
+        reconnectErrors = 0
+        try:
+            i.knob("reconnect_this").execute()
+        except:
+            reconnectErrors += 1
+        finally:
+            if reconnectErrors > 0:
+                nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
         wiredGetStyle(i)
 
-def wiredReconnectAll():
-    for i in nuke.allNodes():
-        if isWired(i):
-            reconnectErrors = 0
-            try:
-                i.knob("reconnect_this").execute()
-            except:
-                reconnectErrors += 1
-            finally:
-                if reconnectErrors > 0:
-                    nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
+def wiredReconnectMany(wireds, dry_run=False):
+    '''
+    Reconnects the given wired stamps to their anchors by their stored anchor names, all at once and in a single undo step.
+    Anchor names are resolved through a name->node map built once, instead of running each stamp's reconnect_this button.
+    dry_run=True: Doesn't change anything, only finds what would change.
+    returns: list of (wired, anchor) reconnected (or to reconnect), list of wireds whose anchor wasn't found
+    '''
+    global Stamps_LockCallbacks
+    anchors_by_name = dict((a.name(), a) for a in allAnchors())
+    reconnected = []
+    failed = []
+    for n in wireds:
+        anchor = anchors_by_name.get(n["anchor"].value())
+        if anchor is None:
+            failed.append(n)
+            continue
+        current = n.input(0)
+        if current is None or current.name() != anchor.name():
+            reconnected.append((n, anchor))
+
+    if dry_run:
+        return reconnected, failed
+
+    undo = nuke.Undo()
+    undo.begin("Reconnect Stamps")
+    Stamps_LockCallbacks = True
+    try:
+        for n, anchor in reconnected:
+            n.setInput(0,anchor)
+        for n in failed:
+            n.setInput(0,None)
+    finally:
+        Stamps_LockCallbacks = False
+        undo.end()
+    for n in wireds:
+        try:
+            wiredGetStyle(n)
+        except:
+            pass
+    return reconnected, failed
+
+def wiredReconnectAll(dry_run=False):
+    ''' Reconnects all the wired stamps to their anchors, reporting the ones that failed at the end. '''
+    wireds = allWireds()
+    reconnected, failed = wiredReconnectMany(wireds, dry_run)
+    failed_names = ", ".join([i.name() for i in failed])
+    if dry_run:
+        reconnected_names = "\n".join(["{} -> {}".format(n.name(), a.name()) for n, a in reconnected])
+        msg = "Dry run: {0} of {1} Stamps would be reconnected.".format(str(len(reconnected)), str(len(wireds)))
+        if reconnected:
+            msg += "\n\n" + reconnected_names
+        if failed:
+            msg += "\n\nAnchors not found for {0} Stamps:\n{1}".format(str(len(failed)), failed_names)
+        nuke.message(msg)
+    elif failed:
+        nuke.message("Couldn't reconnect {0} Stamps:\n\n{1}".format(str(len(failed)), failed_names))
+    return reconnected, failed
 
 def wiredReconnectByTitle(title=""):
     #1. Find matching nodes.
     n = nuke.thisNode()
     if title=="":
         title = n.knob("title").value()
-    matches = []
-    for i in nuke.allNodes():
-        if isAnchor(i) and i.knob("title").value() == title:
-            matches.append(i)
+    matches = findAnchorsByTitle(title)
 
     #2. Do what's necessary
     num_matches = len(matches)
@@ -426,6 +491,7 @@ def wiredReconnectByTitle(title=""):
         anchor = matches[0]
         n["anchor"].setValue(anchor.name())
         n.setInput(0,anchor)
+        Stamps_Registry.invalidate(n)
     elif num_matches > 1:
         # More than one match...
         ns = nuke.selectedNodes()
@@ -434,6 +500,7 @@ def wiredReconnectByTitle(title=""):
             if ns[0].knob("title").value() == title:
                 n["anchor"].setValue(ns[0].name())
                 n.setInput(0,ns[0])
+                Stamps_Registry.invalidate(n)
                 n.knob("reconnect_this").execute()
         else:
             # Selection not matching -> Message asking to select a specific anchor.
@@ -446,10 +513,7 @@ def wiredReconnectByTitleSimilar(title=""):
     n = nuke.thisNode()
     if title=="":
         title = n.knob("title").value()
-    matches = []
-    for i in allAnchors():
-        if i.knob("title").value() == title:
-            matches.append(i)
+    matches = findAnchorsByTitle(title)
 
     #2. Do what's necessary
     num_matches = len(matches)
@@ -459,7 +523,7 @@ def wiredReconnectByTitleSimilar(title=""):
         return
 
     anchor_name = n.knob("anchor").value()
-    siblings = [i for i in nuke.allNodes() if isWired(i) and i.knob("anchor").value() == anchor_name]
+    siblings = Stamps_Registry.findWireds(anchor_name)
 
     if num_matches == 1: # One match -> Connect
         anchor = matches[0]
@@ -468,6 +532,7 @@ def wiredReconnectByTitleSimilar(title=""):
             s.setInput(0,anchor)
             wiredStyle(s,0)
             s.knob("reconnect_this").execute()
+        Stamps_Registry.invalidate(n)
     elif num_matches > 1:
         # More than one match...
         ns = nuke.selectedNodes()
@@ -479,6 +544,7 @@ def wiredReconnectByTitleSimilar(title=""):
                     s.setInput(0,ns[0])
                     wiredStyle(s,0)
                     s.knob("reconnect_this").execute()
+                Stamps_Registry.invalidate(n)
         else:
             # Selection not matching -> Message asking to select a specific anchor.
             nuke.message("More than one Anchor Stamp found with the same title. Please select the one you like in the Node Graph and click this button again.")
@@ -490,10 +556,7 @@ def wiredReconnectByTitleSelected():
 
     for n in ns:
         title = n.knob("title").value()
-        matches = []
-        for i in allAnchors():
-            if i.knob("title").value() == title:
-                matches.append(i)
+        matches = findAnchorsByTitle(title)
 
         #2. Do what's necessary only for the one match cases
         anchor_name = n.knob("anchor").value()
@@ -502,6 +565,7 @@ def wiredReconnectByTitleSelected():
             n["anchor"].setValue(anchor.name())
             n.setInput(0,anchor)
             wiredStyle(n,0)
+            Stamps_Registry.invalidate(n)
             n.knob("reconnect_this").execute()
 
 def wiredReconnectBySelection():
@@ -522,6 +586,7 @@ def wiredReconnectBySelection():
             n["title"].setValue(ns[0]["title"].value())
             n.setInput(0,ns[0])
             wiredGetStyle(n)
+            Stamps_Registry.invalidate(n)
             Stamps_LockCallbacks = False
             n.knob("reconnect_this").execute()
 
@@ -538,7 +603,7 @@ def wiredReconnectBySelectionSimilar():
         nuke.message("Please select an Anchor Stamp.")
     else:
         anchor_name = n.knob("anchor").value()
-        siblings = [i for i in nuke.allNodes() if isWired(i) and i.knob("anchor").value() == anchor_name]
+        siblings = Stamps_Registry.findWireds(anchor_name)
         for s in siblings:
             Stamps_LockCallbacks = True
             s["anchor"].setValue(ns[0].name())
@@ -547,6 +612,7 @@ def wiredReconnectBySelectionSimilar():
             wiredStyle(s,0)
             Stamps_LockCallbacks = False
             s.knob("reconnect_this").execute()
+        Stamps_Registry.invalidate(n)
 
 def wiredReconnectBySelectionSelected():
     global Stamps_LockCallbacks
@@ -582,21 +648,21 @@ def wiredReconnectBySelectionSelected():
         wiredStyle(s,0)
         Stamps_LockCallbacks = False
         s.knob("reconnect_this").execute()
+    Stamps_Registry.invalidate(anchor)
 
 def anchorReconnectWired(anchor = ""):
     if anchor=="":
         anchor = nuke.thisNode()
     anchor_name = anchor.name()
-    for i in allWireds():
-        if i.knob("anchor").value() == anchor_name:
-            reconnectErrors = 0
-            try:
-                i.setInput(0,anchor)
-            except:
-                reconnectErrors += 1
-            finally:
-                if reconnectErrors > 0:
-                    nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
+    for i in Stamps_Registry.findWireds(anchor_name):
+        reconnectErrors = 0
+        try:
+            i.setInput(0,anchor)
+        except:
+            reconnectErrors += 1
+        finally:
+            if reconnectErrors > 0:
+                nuke.message("Couldn't reconnect {} nodes".format(str(reconnectErrors)))
 
 def wiredZoomNext(anchor_name = ""):
     if anchor_name=="":
@@ -605,13 +671,12 @@ def wiredZoomNext(anchor_name = ""):
     showing_knob = anchor.knob("showing")
     showing_value = showing_knob.value()
     i = 0
-    for ni in allWireds():
-        if ni.knob("anchor").value() == anchor_name:
-            if i == showing_value:
-                nuke.zoom(1.5,[ni.xpos()+ni.screenWidth()/2,ni.ypos()+ni.screenHeight()/2])
-                showing_knob.setValue(i+1)
-                return
-            i+=1
+    for ni in Stamps_Registry.findWireds(anchor_name):
+        if i == showing_value:
+            nuke.zoom(1.5,[ni.xpos()+ni.screenWidth()/2,ni.ypos()+ni.screenHeight()/2])
+            showing_knob.setValue(i+1)
+            return
+        i+=1
     showing_knob.setValue(0)
     nuke.message("Couldn't find any more similar wired stamps.")
 
@@ -637,7 +702,7 @@ def anchorWireds(anchor = ""):
             nn = anchor["prev_name"].value()
         except:
             nn = anchor.name()
-        children = [i for i in allWireds() if i.knob("anchor").value() == nn]
+        children = Stamps_Registry.findWireds(nn)
         return children
 
 wiredOnCreate_code = """if nuke.GUI:
@@ -746,6 +811,7 @@ def anchor(title = "", tags = "", input_node = "", node_type = "2D"):
         n.addKnob(k)
     n["help"].setValue(STAMPS_HELP)
 
+    Stamps_Registry.add(n)
     return n
 
 def wired(anchor):
@@ -909,6 +975,7 @@ def wired(anchor):
 
     wiredTagsAndBackdrops(n)
 
+    Stamps_Registry.add(n)
     return n
     Stamps_LastCreated = anchor.name()
 
@@ -1034,24 +1101,11 @@ class AnchorSelector(QtWidgets.QDialog):
 
             anchors_dropdown = QtWidgets.QComboBox()
             anchors_dropdown.setMinimumWidth(200)
-            for i, cur_name in enumerate(self._all_anchors_names):
-                cur_title = self._all_anchors_titles[i]
-                title_repeated = self.titleRepeatedForTag(cur_title, tag, mode)
-                if mode == "tag":
-                    tag_dict = self._anchors_and_tags_tags
-                elif mode == "backdrop":
-                    tag_dict = self._anchors_and_tags_backdrops
+            for cur_name, cur_title in self.anchorsForTag(tag, mode):
+                if self.titleRepeatedForTag(cur_title, tag, mode):
+                    anchors_dropdown.addItem("{0} ({1})".format(cur_title, cur_name), cur_name)
                 else:
-                    tag_dict = self._anchors_and_tags
-
-                if cur_name not in tag_dict.keys():
-                    continue
-                
-                if tag in tag_dict[cur_name]:
-                    if title_repeated:
-                        anchors_dropdown.addItem("{0} ({1})".format(cur_title, cur_name), cur_name)
-                    else:
-                        anchors_dropdown.addItem(cur_title, cur_name)
+                    anchors_dropdown.addItem(cur_title, cur_name)
 
             ok_btn = QtWidgets.QPushButton("OK")
             ok_btn.clicked.connect(partial(self.okPressed,dropdown=anchors_dropdown))
@@ -1189,77 +1243,25 @@ class AnchorSelector(QtWidgets.QDialog):
             return QtWidgets.QDialog.keyPressEvent(self, e)
 
     def findAnchorsAndTags(self):
-        # Lets find anchors
-        self._all_anchors_titles = []
-        self._all_anchors_names = []
-
-        self._all_tags = set()
-        self._all_backdrops = set()
-        self._backdrop_item_count = {} # Number of anchors per backdrop
-        self._all_tags_and_backdrops = set()
-        self._anchors_and_tags = {} # Name:tags. Not title.
-        self._anchors_and_tags_tags = {} # Name:tags. Not title.
-        self._anchors_and_tags_backdrops = {} # Name:tags. Not title.
-        for ni in allAnchors():
-            try:
-                title_value = ni["title"].value()
-                name_value = ni.name()
-                tags_value = ni["tags"].value()
-                tags = re.split(" *, *",tags_value.strip()) # Remove leading/trailing spaces and separate by commas (with or without spaces)
-                #backdrop_tags = ["$b$"+x for x in backdropTags(ni)]
-                backdrop_tags = backdropTags(ni)
-                for t in backdrop_tags:
-                    if t not in self._backdrop_item_count:
-                        self._backdrop_item_count[t] = 0
-                    self._backdrop_item_count[t] += 1
-                tags_and_backdrops = list(set(tags + backdrop_tags))
-                self._all_anchors_titles.append(title_value.strip())
-                self._all_anchors_names.append(name_value)
-                self._all_tags.update(tags)
-                self._all_backdrops.update(backdrop_tags)
-                self._all_tags_and_backdrops.update(tags_and_backdrops)
-                self._anchors_and_tags[name_value] = set(tags_and_backdrops)
-                self._anchors_and_tags_tags[name_value] = set(tags)
-                self._anchors_and_tags_backdrops[name_value] = set(backdrop_tags)
-            except:
-                pass
-
-        self._all_backdrops = sorted(list(self._all_backdrops), key = lambda x: -self._backdrop_item_count[x])
-        self._all_tags = sorted(list(self._all_tags),key=str.lower)
-        self._all_tags_and_backdrops = self._all_tags + self._all_backdrops
-
-        #titles_upper = [x.upper() for x in self._all_anchors_titles]
-
-        titles_and_names = list(zip(self._all_anchors_titles, self._all_anchors_names))
-        titles_and_names.sort(key=lambda tup: tup[0].upper())
-        self._all_anchors_titles = [x for x, y in titles_and_names]
-        self._all_anchors_names = [y for x, y in titles_and_names]
+        # The registry keeps these indexes between openings, only rebuilding them when anchors or backdrops changed
+        selector_index = Stamps_Registry.getSelectorIndex()
+        self._all_anchors_titles = selector_index["titles"]
+        self._all_anchors_names = selector_index["names"]
+        self._all_tags = selector_index["tags"]
+        self._all_backdrops = selector_index["backdrops"]
+        self._all_tags_and_backdrops = selector_index["tags_and_backdrops"]
+        self._anchors_and_tags = selector_index["anchors_and_tags"]
+        self._tag_anchors = selector_index["tag_anchors"]
+        self._tag_title_count = selector_index["tag_title_count"]
         return self._anchors_and_tags
 
-    def titleRepeatedForTag(self, title, tag, mode=""):
-        if self._all_anchors_titles.count(title) <= 1:
-            return False
-
-        # Get list of all names that have that tag, and list of related titles
-        names_with_tag = []
-        titles_with_tag = []
-        for i, name in enumerate(self._all_anchors_names):
-            if mode == "tag":
-                if tag in self._anchors_and_tags_tags[name]:
-                    names_with_tag.append(name)
-                    titles_with_tag.append(self._all_anchors_titles[i])
-            elif mode == "backdrop":
-                if tag in self._anchors_and_tags_backdrops[name]:
-                    names_with_tag.append(name)
-                    titles_with_tag.append(self._all_anchors_titles[i])
-            else:
-                if tag in self._anchors_and_tags[name]:
-                    names_with_tag.append(name)
-                    titles_with_tag.append(self._all_anchors_titles[i])
+    def anchorsForTag(self, tag, mode=""):
+        ''' Returns the list of (name, title) of the anchors with the given tag, sorted by title '''
+        return self._tag_anchors[mode].get(tag, [])
 
+    def titleRepeatedForTag(self, title, tag, mode=""):
         # Count titles repetition
-        title_repetitions = titles_with_tag.count(title)
-        return (title_repetitions > 1)
+        return self._tag_title_count[mode].get((tag, title), 0) > 1
 
     def okPressed(self, dropdown, close=True):
         ''' Runs after an ok button is pressed '''
@@ -1357,13 +1359,16 @@ class TagsCompleter(QtWidgets.QCompleter):
     insertText = QtCore.Signal(str)
     def __init__(self, all_tags):
         QtWidgets.QCompleter.__init__(self, all_tags)
-        self.all_tags = set(all_tags)
+        self.tags_model = QtCore.QStringListModel(all_tags, self)
+        self.setModel(self.tags_model)
         self.activated.connect(self.activated_text)
 
     def update(self, text_tags, completion_prefix):
-        tags = list(self.all_tags-set(text_tags))
-        model = QtCore.QStringListModel(tags, self)
-        self.setModel(model)
+        text_tags = set(text_tags)
+        # Prefix search on the sorted tags of the registry
+        tags = [t for t in Stamps_Registry.findTags(completion_prefix) if t not in text_tags]
+        # Reuse the same model, only its list changes on each keystroke
+        self.tags_model.setStringList(tags)
         self.setCompletionPrefix(completion_prefix)
         self.complete()
 
@@ -1623,6 +1628,332 @@ class RenameTagPanel(QtWidgets.QDialog):
         '''Abort mission'''
         self.reject()
 
+#################################
+### REGISTRY
+#################################
+
+class StampsRegistry(object):
+    '''
+    In-memory index of the Anchor and Wired Stamps of each node graph (root or group), so stamp operations don't need to scan nuke.allNodes().
+    Stamps register themselves from their onCreate and knobChanged callbacks, and the whole index is rebuilt on script load.
+    Titles, tags and the Wired Stamps of each anchor are derived from the registered stamps: updated one stamp at a time when a stamp
+    is added or changes, and recalculated as a whole when marked as outdated.
+    Tags are also kept sorted (case insensitive) for prefix lookups.
+    '''
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        ''' Forgets every stamp. Groups are scanned again on their next query. '''
+        self.anchorNodes = {} # group -> {anchor name: node}
+        self.wiredNodes = {} # group -> {wired name: node}
+        self.anchorRecords = {} # group -> {anchor name: (title, [tags])}
+        self.anchorTitles = {} # group -> {title: [anchor names]}
+        self.anchorTags = {} # group -> {tag: [anchor names]}
+        self.sortedTags = {} # group -> ([tags sorted case insensitive], [same tags lowercase])
+        self.wiredRecords = {} # group -> {wired name: anchor name}
+        self.wiredChildren = {} # group -> {anchor name: [wired names]}
+        self.versions = {} # group -> number of changes to its anchor records
+        self.anchorBackdrops = {} # group -> {anchor name: ((xpos, ypos, backdrop index), [backdrops])}
+        self.selectorIndexes = {} # group -> (signature, indexes used by the AnchorSelector)
+        self.outdated = set() # groups whose titles, tags and children need to be recalculated
+
+    def rebuild(self):
+        ''' Forgets every stamp and scans the current node graph again. '''
+        self.clear()
+        self.build()
+
+    def groupKey(self, node=None):
+        ''' Returns the full name of the group containing the given node (or the current group), or "" for the root. '''
+        if node is None:
+            group = nuke.thisGroup()
+            if group.Class() == "Root":
+                return ""
+            return group.fullName()
+        return node.fullName().rpartition(".")[0]
+
+    def build(self):
+        ''' Scans the current node graph to register all of its stamps. Returns its group key. '''
+        key = self.groupKey()
+        anchors = {}
+        wireds = {}
+        for n in nuke.allNodes():
+            if isAnchor(n):
+                anchors[n.name()] = n
+            elif isWired(n):
+                wireds[n.name()] = n
+        self.anchorNodes[key] = anchors
+        self.wiredNodes[key] = wireds
+        self.outdated.add(key)
+        return key
+
+    def add(self, node):
+        ''' Registers a stamp, i.e. when created or renamed. '''
+        key = self.groupKey(node)
+        if key not in self.anchorNodes:
+            return # Not scanned yet, the stamp will be found on the first query of its group
+        name = node.name()
+        if isAnchor(node):
+            self.anchorNodes[key][name] = node
+            if key not in self.outdated:
+                self.unindexAnchor(key, name)
+                self.indexAnchor(key, name, node)
+        elif isWired(node):
+            self.wiredNodes[key][name] = node
+            if key not in self.outdated:
+                self.unindexWired(key, name)
+                self.indexWired(key, name, node)
+
+    def indexAnchor(self, key, name, node):
+        ''' Adds the title and tags of an anchor to the derived indexes of its group. '''
+        title = node["title"].value()
+        tags = []
+        if node.knob("tags"):
+            tags = [t for t in re.split(" *, *", node["tags"].value().strip()) if t]
+        self.anchorRecords[key][name] = (title, tags)
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self.anchorTitles[key].setdefault(title, []).append(name)
+        sorted_tags, sorted_lower = self.sortedTags[key]
+        for tag in set(tags):
+            if tag not in self.anchorTags[key]:
+                self.anchorTags[key][tag] = []
+                position = bisect.bisect(sorted_lower, tag.lower())
+                sorted_tags.insert(position, tag)
+                sorted_lower.insert(position, tag.lower())
+            self.anchorTags[key][tag].append(name)
+
+    def unindexAnchor(self, key, name):
+        ''' Removes the title and tags of an anchor from the derived indexes of its group. '''
+        record = self.anchorRecords[key].pop(name, None)
+        if record is None:
+            return
+        self.versions[key] = self.versions.get(key, 0) + 1
+        title, tags = record
+        names = self.anchorTitles[key].get(title, [])
+        if name in names:
+            names.remove(name)
+        sorted_tags, sorted_lower = self.sortedTags[key]
+        for tag in set(tags):
+            names = self.anchorTags[key].get(tag, [])
+            if name in names:
+                names.remove(name)
+            if not names and tag in self.anchorTags[key]:
+                del self.anchorTags[key][tag]
+                position = bisect.bisect_left(sorted_lower, tag.lower())
+                while sorted_tags[position] != tag:
+                    position += 1
+                del sorted_tags[position]
+                del sorted_lower[position]
+
+    def indexWired(self, key, name, node):
+        ''' Adds a wired stamp to the children of its anchor. '''
+        if not node.knob("anchor"):
+            return
+        anchor_name = node["anchor"].value()
+        self.wiredRecords[key][name] = anchor_name
+        self.wiredChildren[key].setdefault(anchor_name, []).append(name)
+
+    def unindexWired(self, key, name):
+        ''' Removes a wired stamp from the children of its anchor. '''
+        anchor_name = self.wiredRecords[key].pop(name, None)
+        names = self.wiredChildren[key].get(anchor_name, [])
+        if name in names:
+            names.remove(name)
+
+    def invalidate(self, node=None):
+        ''' Marks the titles, tags and children of the group of the given node (or the current group) as outdated. '''
+        self.outdated.add(self.groupKey(node))
+
+    def update(self):
+        ''' Makes sure the current node graph is indexed and up to date. Returns its group key. '''
+        key = self.groupKey()
+        if key not in self.anchorNodes or not nuke.GUI:
+            # Without GUI the onCreate callbacks don't run, so the index can't be trusted
+            self.build()
+        if key in self.outdated:
+            self.outdated.discard(key)
+            self.anchorRecords[key] = {}
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.anchorTitles[key] = {}
+            self.anchorTags[key] = {}
+            self.sortedTags[key] = ([], [])
+            self.wiredRecords[key] = {}
+            self.wiredChildren[key] = {}
+            for name, n in self.validNodes(self.anchorNodes[key]):
+                self.indexAnchor(key, name, n)
+            for name, n in self.validNodes(self.wiredNodes[key]):
+                self.indexWired(key, name, n)
+        return key
+
+    def validNodes(self, nodes, names=None):
+        '''
+        Returns a list of (name, node) from a {name: node} dict, for the given names or all of them.
+        Deleted nodes get removed from the dict, and renamed ones moved to their new name.
+        '''
+        if names is None:
+            names = list(nodes.keys())
+        valid = []
+        for name in names:
+            n = nodes.get(name)
+            if n is None:
+                continue
+            try:
+                current_name = n.name()
+            except ValueError:
+                del nodes[name] # Deleted node
+                continue
+            if current_name != name:
+                del nodes[name]
+                nodes[current_name] = n
+                self.invalidate(n)
+                name = current_name
+            valid.append((name, n))
+        return valid
+
+    def getAnchors(self):
+        ''' Returns the list of anchors in the current node graph. '''
+        key = self.update()
+        return [n for name, n in self.validNodes(self.anchorNodes[key])]
+
+    def getWireds(self):
+        ''' Returns the list of wired stamps in the current node graph. '''
+        key = self.update()
+        return [n for name, n in self.validNodes(self.wiredNodes[key])]
+
+    def getTags(self):
+        ''' Returns the list of tags of the anchors in the current node graph, sorted case insensitive. '''
+        key = self.update()
+        return list(self.sortedTags[key][0])
+
+    def findTags(self, prefix=""):
+        ''' Returns the sorted list of tags of the current node graph starting with prefix, case insensitive. '''
+        key = self.update()
+        sorted_tags, sorted_lower = self.sortedTags[key]
+        prefix = prefix.lower()
+        position = bisect.bisect_left(sorted_lower, prefix)
+        found = []
+        while position < len(sorted_lower) and sorted_lower[position].startswith(prefix):
+            found.append(sorted_tags[position])
+            position += 1
+        return found
+
+    def getAnchorRecords(self):
+        ''' Returns a list of (anchor name, title, [tags]) of the anchors in the current node graph. '''
+        key = self.update()
+        records = self.anchorRecords[key]
+        return [(name, records[name][0], records[name][1]) for name, n in self.validNodes(self.anchorNodes[key]) if name in records]
+
+    def getBackdropTags(self):
+        '''
+        Returns {anchor name: [backdrop tags]} for the anchors of the current node graph.
+        The backdrops of an anchor are only searched again when it moved or the backdrop index was rebuilt,
+        backdrop labels are read on each call, once per backdrop.
+        '''
+        key = self.update()
+        index = backdrop_index.get_index() if backdrop_index else None
+        cache = self.anchorBackdrops.setdefault(key, {})
+        records = self.anchorRecords[key]
+        label_tags = {}
+        found = {}
+        for name, n in self.validNodes(self.anchorNodes[key]):
+            if name not in records:
+                continue
+            position = (n.xpos(), n.ypos(), index)
+            cached = cache.get(name)
+            if cached is None or cached[0] != position or index is None:
+                cached = (position, findBackdrops(n))
+                cache[name] = cached
+            tags = []
+            for b in cached[1]:
+                if b not in label_tags:
+                    label_tags[b] = backdropTag(b)
+                if label_tags[b] is not None:
+                    tags.append(label_tags[b])
+            found[name] = tags
+        return found
+
+    def getSelectorIndex(self):
+        '''
+        Returns the anchors and tags listed by the AnchorSelector, as a dict of sorted lists and inverted indexes.
+        They are kept until the anchors or their backdrop tags change. The returned lists must not be modified.
+        '''
+        key = self.update()
+        backdrop_tags = self.getBackdropTags()
+        signature = (self.versions.get(key, 0), sorted((name, tuple(tags)) for name, tags in backdrop_tags.items()))
+        cached = self.selectorIndexes.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        titles_and_names = []
+        all_tags = set()
+        backdrop_item_count = {} # Number of anchors per backdrop
+        anchors_and_tags = {"tag": {}, "backdrop": {}, "": {}} # For each mode, name:tags. Not title.
+        for name_value, title_value, tags in self.getAnchorRecords():
+            anchor_backdrop_tags = backdrop_tags.get(name_value, [])
+            for t in anchor_backdrop_tags:
+                backdrop_item_count[t] = backdrop_item_count.get(t, 0) + 1
+            titles_and_names.append((title_value.strip(), name_value))
+            all_tags.update(tags)
+            anchors_and_tags["tag"][name_value] = set(tags)
+            anchors_and_tags["backdrop"][name_value] = set(anchor_backdrop_tags)
+            anchors_and_tags[""][name_value] = set(tags + anchor_backdrop_tags)
+
+        all_backdrops = sorted(backdrop_item_count, key = lambda x: -backdrop_item_count[x])
+        all_tags = sorted(all_tags, key=str.lower)
+        titles_and_names.sort(key=lambda tup: tup[0].upper())
+
+        # Inverted indexes, for each mode: {tag: [(name, title)]} sorted by title, and {(tag, title): number of anchors}
+        tag_anchors = {}
+        tag_title_count = {}
+        for mode, tag_dict in anchors_and_tags.items():
+            tag_anchors[mode] = {}
+            tag_title_count[mode] = {}
+            for title, name in titles_and_names:
+                for tag in tag_dict.get(name, ()):
+                    tag_anchors[mode].setdefault(tag, []).append((name, title))
+                    tag_title_count[mode][(tag, title)] = tag_title_count[mode].get((tag, title), 0) + 1
+
+        selector_index = {
+            "titles": [x for x, y in titles_and_names],
+            "names": [y for x, y in titles_and_names],
+            "tags": all_tags,
+            "backdrops": all_backdrops,
+            "tags_and_backdrops": all_tags + all_backdrops,
+            "anchors_and_tags": anchors_and_tags[""],
+            "tag_anchors": tag_anchors,
+            "tag_title_count": tag_title_count,
+        }
+        self.selectorIndexes[key] = (signature, selector_index)
+        return selector_index
+
+    def findAnchorsByTitle(self, title):
+        ''' Returns the list of anchors with the given title in the current node graph. '''
+        key = self.update()
+        anchors = self.validNodes(self.anchorNodes[key], self.anchorTitles[key].get(title, []))
+        found = [n for name, n in anchors if n["title"].value() == title]
+        if len(found) != len(anchors):
+            self.outdated.add(key)
+        return found
+
+    def findWireds(self, anchor_name):
+        ''' Returns the list of wired stamps whose stored anchor name is anchor_name, in the current node graph. '''
+        key = self.update()
+        wireds = self.validNodes(self.wiredNodes[key], self.wiredChildren[key].get(anchor_name, []))
+        found = [n for name, n in wireds if n["anchor"].value() == anchor_name]
+        if len(found) != len(wireds):
+            self.outdated.add(key)
+        return found
+
+Stamps_Registry = StampsRegistry()
+
+def registryRebuild():
+    ''' Rebuilds the stamps registry. Called on script load. '''
+    Stamps_Registry.rebuild()
+
+def registryClear():
+    ''' Clears the stamps registry. Called on script close. '''
+    Stamps_Registry.clear()
+
 #################################
 ### FUNCTIONS
 #################################
@@ -1634,9 +1965,11 @@ def getDefaultTitle(node = None):
 
     # Default defaults here
      # cam
-    if "Camera" in node.Class() and not any([(i.knob("title") and i["title"].value() == "cam") for i in nuke.allNodes("NoOp")]):
-        title = "cam"
-        return title
+    if "Camera" in node.Class():
+        noOps = node_walker.walk_nodes("NoOp", recursive=False) if node_walker else nuke.allNodes("NoOp")
+        if not any((i.knob("title") and i["title"].value() == "cam") for i in noOps):
+            title = "cam"
+            return title
 
     if node.Class() in ["Dot","NoOp"] and node["label"].value().strip() != "":
         return node["label"].value().strip()
@@ -1663,24 +1996,30 @@ def getDefaultTitle(node = None):
 
     return title
 
+def backdropTag(b):
+    ''' Returns the tag of a backdrop from the first line of its label, or None if it isn't shown to stamps '''
+    if b.knob("visible_for_stamps"):
+        if not b["visible_for_stamps"].value():
+            return None
+    elif not b["bookmark"].value():
+        return None
+    label = b["label"].value()
+    if len(label) and len(label) < 50 and not label.startswith("\\"):
+        label = label.split("\n")[0].strip()
+        label = re.sub("<[^<>]>","",label)
+        label = re.sub("[\s]+"," ",label)
+        label = re.sub("\.$","",label)
+        label = label.strip()
+        return label
+    return None
+
 def backdropTags(node = None):
     ''' Returns the list of words belonging to the backdrop/s label/s'''
-    backdrops = findBackdrops(node)
     tags = []
-    for b in backdrops:
-        if b.knob("visible_for_stamps"):
-            if not b["visible_for_stamps"].value():
-                continue
-        elif not b["bookmark"].value():
-            continue
-        label = b["label"].value()
-        if len(label) and len(label) < 50 and not label.startswith("\\"):
-            label = label.split("\n")[0].strip()
-            label = re.sub("<[^<>]>","",label)
-            label = re.sub("[\s]+"," ",label)
-            label = re.sub("\.$","",label)
-            label = label.strip()
-            tags.append(label)
+    for b in findBackdrops(node):
+        tag = backdropTag(b)
+        if tag is not None:
+            tags.append(tag)
     return tags
 
 def stampCreateAnchor(node = None, extra_tags = [], no_default_tag = False):
@@ -1825,10 +2164,9 @@ def stampCreateByTitle(title = ""):
     global Stamps_LastCreated
 
     anchor = None
-    for a in allAnchors():
-        if a.knob("title") and a["title"].value() == title:
-            anchor = a
-            break
+    for a in findAnchorsByTitle(title):
+        anchor = a
+        break
     if anchor == None:
         return
 
@@ -1838,6 +2176,8 @@ def stampCreateByTitle(title = ""):
 
 def stampDuplicateWired(wired = ""):
     ''' Create a duplicate of a wired stamp '''
+    if node_serializer:
+        return stampDuplicateWireds([wired])[0]
     ns = nuke.selectedNodes()
     for n in ns:
         n.setSelected(False)
@@ -1857,6 +2197,27 @@ def stampDuplicateWired(wired = ""):
     for n in ns:
         n.setSelected(True)
     wired.setSelected(False)
+    return new_wired
+
+def stampDuplicateWireds(wireds):
+    ''' Create duplicates of several wired stamps, pasted all at once. Returns the list of duplicates. '''
+    if not node_serializer:
+        return [stampDuplicateWired(w) for w in wireds]
+    ns = nuke.selectedNodes()
+    new_wireds = node_serializer.duplicate_nodes(wireds)
+    for wired, new_wired in zip(wireds, new_wireds):
+        new_wired.setXYpos(wired.xpos()-110,wired.ypos()+55)
+        try:
+            new_wired.setInput(0,wired.input(0))
+        except:
+            pass
+        new_wired.setSelected(False)
+        Stamps_Registry.add(new_wired)
+    for n in ns:
+        n.setSelected(True)
+    for wired in wireds:
+        wired.setSelected(False)
+    return new_wireds
 
 def stampType(n = ""):
     ''' Returns the identifier value if it exists, otherwise False. '''
@@ -1889,19 +2250,17 @@ def nodeType(n=""):
         return "2D"
 
 def allAnchors(selection=""):
-    nodes = nuke.allNodes()
-    if selection == "":
-        anchors = [a for a in nodes if isAnchor(a)]
-    else:
-        anchors = [a for a in nodes if a in selection and isAnchor(a)]    
+    anchors = Stamps_Registry.getAnchors()
+    if selection != "":
+        selected_names = set([i.fullName() for i in selection])
+        anchors = [a for a in anchors if a.fullName() in selected_names]
     return anchors
 
 def allWireds(selection=""):
-    nodes = nuke.allNodes()
-    if selection == "":
-        wireds = [a for a in nodes if isWired(a)]
-    else:
-        wireds = [a for a in nodes if a in selection and isWired(a)]   
+    wireds = Stamps_Registry.getWireds()
+    if selection != "":
+        selected_names = set([i.fullName() for i in selection])
+        wireds = [a for a in wireds if a.fullName() in selected_names]
     return wireds
 
 def totalAnchors(selection=""):
@@ -1909,27 +2268,18 @@ def totalAnchors(selection=""):
     return num_anchors
 
 def allTags(selection=""):
-    all_tags = set()
-    for ni in allAnchors():
-        try:
-            tags_value = ni["tags"].value()
-            tags = re.split(" *, *",tags_value.strip()) # Remove leading/trailing spaces and separate by commas (with or without spaces)
-            all_tags.update(tags)
-        except:
-            pass
-
-    all_tags = [i for i in list(all_tags) if i]
+    all_tags = Stamps_Registry.getTags()
     all_tags.sort(key=str.lower)
     return all_tags
 
 def findAnchorsByTitle(title = "", selection=""):
     ''' Returns list of nodes '''
     if title == "":
-        return None
+        return []
     if selection == "":
-        found_anchors = [a for a in allAnchors() if a.knob("title") and a.knob("title").value() == title]
+        found_anchors = Stamps_Registry.findAnchorsByTitle(title)
     else:
-        found_anchors = [a for a in selection if a in allAnchors() and a.knob("title") and a.knob("title").value() == title]
+        found_anchors = [a for a in selection if isAnchor(a) and a.knob("title").value() == title]
     return found_anchors
 
 def titleIsLegal(title=""):
@@ -1958,6 +2308,9 @@ def findBackdrops(node = ""):
     w = node.screenWidth()
     h = node.screenHeight()
 
+    if backdrop_index:
+        return backdrop_index.get_index().containing((x, y, x+w, y+h))
+
     backdrops = []
     for b in nuke.allNodes("BackdropNode"):
         bx = int(b['xpos'].value())
@@ -1997,6 +2350,8 @@ def nodeToScript(node = ""):
         node = nuke.selectedNode()
     if not node:
         return ""
+    if node_serializer:
+        return node_serializer.nodes_to_script([node])
     for i in orig_sel_nodes:
         i.setSelected(False)
     node.setSelected(True)
@@ -2011,9 +2366,14 @@ def nodeToScript(node = ""):
     return node_as_script
 
 def nodesFromScript(script = ""):
-    ''' Returns string as a node, similar as nodepaste without messing with the clipboard '''
-    if script == "":
+    ''' Returns string as a node, similar as nodepaste without messing with the clipboard. Also accepts a list of strings, pasted at once. '''
+    if script == "" or script == []:
         return
+    if node_serializer:
+        node_serializer.nodes_from_script(script)
+        return True
+    if isinstance(script, list):
+        script = "\n".join(script)
     clipboard = QtWidgets.QApplication.clipboard()
     ctext = clipboard.text()
     clipboard.setText(script)
@@ -2024,8 +2384,7 @@ def nodesFromScript(script = ""):
 def stampCount(anchor_name=""):
     if anchor_name=="":
         return len(allWireds())
-    stamps = [s for s in allWireds() if s["anchor"].value() == anchor_name]
-    return len(stamps)
+    return len(Stamps_Registry.findWireds(anchor_name))
 
 def toNoOp(node=""):
     '''Turns a given node into a NoOp that shares everything else'''
@@ -2078,8 +2437,8 @@ def toNoOp(node=""):
 
 def allToNoOp():
     ''' Turns all the stamps into NoOps '''
-    for n in nuke.allNodes():
-        if stampType(n) and n.Class() != "NoOp":
+    for n in allAnchors() + allWireds():
+        if n.Class() != "NoOp":
             toNoOp(n)
 
 def createWHotboxButtons():
@@ -2105,19 +2464,11 @@ def createWHotboxButtons():
 
 def refreshStamps(ns=""):
     '''Refresh all the wired Stamps in the script, to spot any wrong styles or connections.'''
+    if ns == "":
+        Stamps_Registry.rebuild()
     stamps = allWireds(ns)
-    x = 0
-    failed = []
-    failed_names = []
-    for s in stamps:
-        if not wiredReconnect(s):
-            x += 1 # Errors
-            failed.append(s)
-        else:
-            try:
-                s["reconnect_this"].execute()
-            except:
-                pass
+    reconnected, failed = wiredReconnectMany(stamps)
+    x = len(failed) # Errors
     failed_names = ", ".join([i.name() for i in failed])
     if x==0:
         if ns == "":
@@ -2171,6 +2522,7 @@ def addTags(ns=""):
             i += 1
             continue
         if i>0:
+            Stamps_Registry.invalidate()
             if all_nodes:
                 nuke.message("Added the specified tag/s to {} nodes.".format(str(i)))
             else:
@@ -2224,6 +2576,7 @@ def renameTag(ns=""):
                 i += 1
             continue
         if i>0:
+            Stamps_Registry.invalidate()
             nuke.message("Renamed the specified tag on {} nodes.".format(str(i)))
     return
 
@@ -2314,6 +2667,7 @@ def stampBuildMenus():
         m.addCommand('Edit/Stamps/Selected/Toggle auto-rec... by title ', 'stamps.selectedToggleAutorec()')
 
         m.addCommand('Edit/Stamps/Advanced/Convert all Stamps to NoOp', 'stamps.allToNoOp()')
+        m.addCommand('Edit/Stamps/Advanced/Reconnect all Stamps (dry run)', 'stamps.wiredReconnectAll(dry_run=True)')
         m.menu('Edit').menu('Stamps').addSeparator()
         m.addCommand('Edit/Stamps/GitHub', 'stamps.showInGithub()')
         m.addCommand('Edit/Stamps/Nukepedia', 'stamps.showInNukepedia()')
@@ -2324,6 +2678,13 @@ def stampBuildMenus():
 
         createWHotboxButtons()
 
+def stampAddCallbacks():
+    global Stamps_CallbacksLoaded
+    if not Stamps_CallbacksLoaded:
+        Stamps_CallbacksLoaded = True
+        nuke.addOnScriptLoad(registryRebuild)
+        nuke.addOnScriptClose(registryClear)
+
 def addIncludesPath():
     includes_dir = os.path.join(os.path.dirname(__file__),"includes")
     if os.path.isdir(includes_dir):
@@ -2356,13 +2717,14 @@ def goStamp(ns=""):
             return
         # Main loop
         extra_tags = []
+        wireds = []
         for n in ns:
             if n in NodeExceptionClasses:
                 continue
             elif isAnchor(n):
                 stampCreateWired(n) # Make a child to n
             elif isWired(n):
-                stampDuplicateWired(n) # Make a copy of n next to it
+                wireds.append(n) # Make a copy of n next to it, all at once after the loop
             else:
                 if n.knob("stamp_tags"):
                     stampCreateAnchor(n, extra_tags = n.knob("stamp_tags").value().split(","), no_default_tag = True)
@@ -2370,6 +2732,9 @@ def goStamp(ns=""):
                     extra_tags = stampCreateAnchor(n, extra_tags = extra_tags) # Create anchor via anchor creation panel
                 if "Cryptomatte" in n.Class() and n.knob("matteOnly"):
                     n['matteOnly'].setValue(1)
+        if wireds:
+            stampDuplicateWireds(wireds)
 
 stampBuildMenus()
+stampAddCallbacks()
 addIncludesPath()
\ No newline at end of file